@@ -0,0 +1,210 @@
+import json
+import asyncio
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from dataclasses import asdict
+from pathlib import Path
+from typing import Dict, List, Literal, Optional
+
+from fastapi import FastAPI, File, HTTPException, UploadFile
+from fastapi.responses import StreamingResponse
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+from pydantic import BaseModel
+
+from exception.custom_exception import ProjectCustomException
+from logger import GLOBAL_LOGGER as logger
+from src.data_ingestion import DataIngestion
+from src.qa_rag import ConversationalRAG
+from utils.config_loader import get_settings
+from utils.metrics import dump_metrics
+from utils.model_loader import ModelLoader
+from utils.qdrant_vector_db import QdrantVDB
+from utils.session_store import SessionManager
+
+
+class ChatMessage(BaseModel):
+    role: Literal["human", "ai"]
+    content: str
+
+
+class QueryRequest(BaseModel):
+    user_name: str
+    question: str
+    session_id: Optional[str] = None
+    # Only needed for stateless calls; with a session_id the server keeps the history
+    chat_history: Optional[List[ChatMessage]] = None
+
+
+class QueryResponse(BaseModel):
+    user_name: str
+    answer: str
+
+
+def to_messages(chat_history: Optional[List[ChatMessage]]) -> Optional[List[BaseMessage]]:
+    if chat_history is None:
+        return None
+    return [HumanMessage(m.content) if m.role == "human" else AIMessage(m.content) for m in chat_history]
+
+
+class RAGPool:
+    """
+    Bounded LRU pool of warm ConversationalRAG instances, one per user.
+    All instances share a single embeddings model and LLM, so a new user only costs a
+    Qdrant vector-store view and a chain build.
+    """
+
+    def __init__(self, max_size: int, embeddings, llm, sessions: Optional[SessionManager] = None):
+        self.max_size = max_size
+        self.embeddings = embeddings
+        self.llm = llm
+        self.sessions = sessions
+        self._pool: "OrderedDict[str, ConversationalRAG]" = OrderedDict()
+        self._building: Dict[str, asyncio.Task] = {}
+        self._lock = asyncio.Lock()
+
+    async def get(self, user_name: str) -> ConversationalRAG:
+        async with self._lock:
+            rag = self._pool.get(user_name)
+            if rag is not None:
+                self._pool.move_to_end(user_name)
+                return rag
+            building = self._building.get(user_name)
+            if building is None:
+                # Construction runs as its own task, so it outlives a cancelled first request
+                building = asyncio.create_task(self._build(user_name))
+                building.add_done_callback(lambda task: task.cancelled() or task.exception())
+                self._building[user_name] = building
+        # shield: a request that is cancelled stops waiting without cancelling the shared build
+        return await asyncio.shield(building)
+
+    async def _build(self, user_name: str) -> ConversationalRAG:
+        try:
+            rag = await asyncio.to_thread(ConversationalRAG, user_name, self.embeddings, self.llm, self.sessions)
+            async with self._lock:
+                self._pool[user_name] = rag
+                self._pool.move_to_end(user_name)
+                while len(self._pool) > self.max_size:
+                    evicted, _ = self._pool.popitem(last=False)
+                    logger.info("RAG pool evicted user", user_name=evicted)
+            return rag
+        finally:
+            async with self._lock:
+                self._building.pop(user_name, None)
+
+    def __len__(self) -> int:
+        return len(self._pool)
+
+
+class AppState:
+    rag_pool: RAGPool = None
+    ingestion: DataIngestion = None
+    ingest_locks: Dict[str, asyncio.Lock] = {}
+    upload_dir: str = "uploads"
+
+
+state = AppState()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    settings = get_settings()
+    state.upload_dir = settings.api.upload_dir
+    model_loader = ModelLoader.get_instance()
+    llm = model_loader.load_llm()
+    embeddings = model_loader.load_embeddings()
+    sessions = SessionManager.from_config(settings.session, llm=llm) if settings.session.enabled else None
+    state.rag_pool = RAGPool(
+        max_size=settings.api.rag_pool_size,
+        embeddings=embeddings,
+        llm=llm,
+        sessions=sessions,
+    )
+    # One ingestion pipeline (manifest, BM25 handle, parse pool) shared by every /ingest request
+    state.ingestion = await asyncio.to_thread(DataIngestion, embeddings)
+    logger.info("API started", rag_pool_size=state.rag_pool.max_size)
+    yield
+    await QdrantVDB.aclose_clients()
+
+
+app = FastAPI(title="Personal ChatGPT", lifespan=lifespan)
+
+
+@app.get("/health")
+async def health():
+    return {"status": "ok", "rag_pool_users": len(state.rag_pool), "qdrant": await QdrantVDB().ahealth_check()}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Aggregated per-stage latency histograms, token counters and cache hit counts."""
+    return dump_metrics()
+
+
+@app.post("/query", response_model=QueryResponse)
+async def query(request: QueryRequest):
+    try:
+        rag = await state.rag_pool.get(request.user_name)
+        answer = await rag.ainvoke(
+            request.question, chat_history=to_messages(request.chat_history), session_id=request.session_id
+        )
+        return QueryResponse(user_name=request.user_name, answer=answer)
+    except ProjectCustomException as e:
+        logger.error("Query failed", user_name=request.user_name, error=e.error_message)
+        raise HTTPException(status_code=500, detail=e.error_message)
+
+
+@app.post("/query/stream")
+async def query_stream(request: QueryRequest):
+    """Newline-delimited JSON events: sources, then tokens, then end."""
+    try:
+        rag = await state.rag_pool.get(request.user_name)
+    except ProjectCustomException as e:
+        raise HTTPException(status_code=500, detail=e.error_message)
+
+    async def events():
+        try:
+            async for event in rag.astream(
+                request.question, chat_history=to_messages(request.chat_history), session_id=request.session_id
+            ):
+                yield json.dumps(event) + "\n"
+        except ProjectCustomException as e:
+            yield json.dumps({"type": "error", "error": e.error_message}) + "\n"
+
+    return StreamingResponse(events(), media_type="application/x-ndjson")
+
+
+@app.delete("/sessions/{user_name}/{session_id}")
+async def clear_session(user_name: str, session_id: str):
+    if state.rag_pool.sessions is None:
+        raise HTTPException(status_code=404, detail="Session storage is disabled")
+    await asyncio.to_thread(state.rag_pool.sessions.clear, user_name, session_id)
+    return {"status": "cleared"}
+
+
+@app.post("/ingest/{user_name}")
+async def ingest(user_name: str, files: List[UploadFile] = File(...)):
+    names = [Path(upload.filename or "").name for upload in files]
+    invalid = [upload.filename for upload, name in zip(files, names) if not name.strip(".")]
+    if invalid:
+        raise HTTPException(status_code=400, detail=f"Uploads need a file name, got: {invalid}")
+    lock = state.ingest_locks.setdefault(user_name, asyncio.Lock())
+    async with lock:
+        # Stable per-user paths keep incremental ingestion's manifest keys meaningful across uploads
+        user_dir = Path(state.upload_dir) / Path(user_name).name
+        user_dir.mkdir(parents=True, exist_ok=True)
+        paths = []
+        for upload, name in zip(files, names):
+            path = user_dir / name
+            await asyncio.to_thread(path.write_bytes, await upload.read())
+            paths.append(path)
+        try:
+            result = await asyncio.to_thread(state.ingestion.ingest_files, paths, user_name)
+        except ProjectCustomException as e:
+            logger.error("Ingestion failed", user_name=user_name, error=e.error_message)
+            raise HTTPException(status_code=500, detail=e.error_message)
+    return asdict(result)
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run("api.main:app", host="0.0.0.0", port=8000)
@@ -0,0 +1,143 @@
+"""
+Recall-vs-size evaluation for reduced embedding dimensions, over chunks already ingested into a
+user's collection (which must hold full-size vectors, i.e. ingested with embedding_model.dimensions
+unset). For each candidate size, chunk and query vectors are truncated and renormalised exactly as
+TruncatedEmbeddings does, and their top-k is compared with the full-size top-k. No embedding API
+calls are made unless --questions is given.
+
+    python -m benchmark.dimension_eval --collection Arindam --dims 256 512 768 1024 1536
+    python -m benchmark.dimension_eval --collection Arindam --questions questions.txt --target 0.95
+
+Without --questions, sampled chunks act as queries (their own chunk is excluded from the results).
+Recall is also reported with float16 storage of the reduced vectors.
+"""
+import os
+import sys
+import json
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+MB = 1024 * 1024
+
+
+def load_chunk_vectors(vdb, collection: str, limit: int) -> np.ndarray:
+    """Stored dense vectors of up to limit points of the collection."""
+    client = vdb.get_client()
+    vectors, offset = [], None
+    while len(vectors) < limit:
+        points, offset = client.scroll(collection, limit=min(256, limit - len(vectors)), offset=offset,
+                                       with_vectors=True, with_payload=False)
+        vectors.extend(p.vector if not isinstance(p.vector, dict) else next(iter(p.vector.values())) for p in points)
+        if offset is None:
+            break
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def top_k(corpus: np.ndarray, queries: np.ndarray, k: int, exclude=None) -> np.ndarray:
+    """Exact cosine top-k ids; exclude[i] (a corpus row) is never returned for query i."""
+    scores = queries @ corpus.T
+    if exclude is not None:
+        scores[np.arange(len(queries)), exclude] = -np.inf
+    k = min(k, corpus.shape[0] - (1 if exclude is not None else 0))
+    ids = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    order = np.argsort(-np.take_along_axis(scores, ids, axis=1), axis=1)
+    return np.take_along_axis(ids, order, axis=1)
+
+
+def _recall(found: np.ndarray, expected: np.ndarray) -> float:
+    return float(np.mean([len(set(f) & set(e)) / len(e) for f, e in zip(found, expected)]))
+
+
+def evaluate(corpus: np.ndarray, queries: np.ndarray, dims, k: int, exclude=None) -> dict:
+    """Recall@k and top-1 agreement of each reduced size against the full-size ranking."""
+    from utils.embedding_truncation import truncate_normalize
+
+    full_dim = corpus.shape[1]
+    corpus_full = truncate_normalize(corpus, full_dim)
+    queries_full = truncate_normalize(queries, full_dim)
+    expected = top_k(corpus_full, queries_full, k, exclude)
+
+    results = {}
+    for dim in sorted({d for d in dims if 0 < d <= full_dim} | {full_dim}):
+        reduced_corpus = truncate_normalize(corpus, dim)
+        reduced_queries = truncate_normalize(queries, dim)
+        found = top_k(reduced_corpus, reduced_queries, k, exclude)
+        found_f16 = top_k(reduced_corpus.astype(np.float16).astype(np.float32), reduced_queries, k, exclude)
+        results[dim] = {
+            f"recall_at_{k}": round(_recall(found, expected), 4),
+            f"recall_at_{k}_float16": round(_recall(found_f16, expected), 4),
+            "top1_agreement": round(float(np.mean(found[:, 0] == expected[:, 0])), 4),
+            "bytes_per_vector": {"float32": dim * 4, "float16": dim * 2},
+            "collection_mb": {"float32": round(len(corpus) * dim * 4 / MB, 2),
+                              "float16": round(len(corpus) * dim * 2 / MB, 2)},
+            "size_vs_full": round(dim / full_dim, 4),
+        }
+    return results
+
+
+def smallest_passing(results: dict, k: int, target: float):
+    passing = [dim for dim, r in results.items() if r[f"recall_at_{k}"] >= target]
+    return min(passing) if passing else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall vs embedding dimension over ingested chunks")
+    parser.add_argument("--collection", required=True, help="user collection with full-size vectors")
+    parser.add_argument("--dims", type=int, nargs="+", default=[128, 256, 512, 768, 1024, 1536, 2048])
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--max-chunks", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=500, help="sampled chunks used as queries")
+    parser.add_argument("--questions", help="file with one real question per line (embedded at full size)")
+    parser.add_argument("--target", type=float, default=0.95, help="recall@k the chosen size must keep")
+    parser.add_argument("--output", default="benchmark/results/dimension_eval.json")
+    args = parser.parse_args()
+
+    sys.path.insert(0, str(ROOT))
+    os.chdir(ROOT)
+    from utils.qdrant_vector_db import QdrantVDB
+
+    corpus = load_chunk_vectors(QdrantVDB(), args.collection, args.max_chunks)
+    if len(corpus) < 2:
+        sys.exit(f"Collection '{args.collection}' has too few points to evaluate")
+
+    exclude = None
+    if args.questions:
+        from utils.model_loader import ModelLoader
+        questions = [q.strip() for q in Path(args.questions).read_text().splitlines() if q.strip()]
+        queries = np.asarray(ModelLoader.get_instance().load_embeddings().embed_documents(questions), dtype=np.float32)
+        if queries.shape[1] != corpus.shape[1]:
+            sys.exit(f"Question vectors are {queries.shape[1]}-dim but the collection holds {corpus.shape[1]}-dim "
+                     "vectors; unset embedding_model.dimensions for the evaluation")
+    else:
+        rng = np.random.default_rng(7)
+        exclude = rng.choice(len(corpus), size=min(args.queries, len(corpus)), replace=False)
+        queries = corpus[exclude]
+
+    results = evaluate(corpus, queries, args.dims, args.k, exclude)
+    recommended = smallest_passing(results, args.k, args.target)
+    for dim, row in results.items():
+        print(f"{dim:>6}  recall@{args.k}={row[f'recall_at_{args.k}']:.4f}  "
+              f"float16={row[f'recall_at_{args.k}_float16']:.4f}  top1={row['top1_agreement']:.4f}  "
+              f"{row['collection_mb']['float16']:>9.2f} MB (float16)")
+    print(f"Smallest size with recall@{args.k} >= {args.target}: {recommended}")
+
+    report = {
+        "meta": {"timestamp": datetime.now(timezone.utc).isoformat(), "collection": args.collection,
+                 "chunks": len(corpus), "full_dim": int(corpus.shape[1]), "queries": len(queries),
+                 "query_source": "questions" if args.questions else "sampled_chunks", "k": args.k},
+        "target_recall": args.target,
+        "recommended_dimensions": recommended,
+        "dimensions": {str(dim): row for dim, row in results.items()},
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
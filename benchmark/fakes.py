@@ -0,0 +1,189 @@
+"""
+Local stand-ins for the external services, so benchmarks run offline and deterministically:
+a fake chat model with configurable latency, a feature-hashing embedder and a directory-backed
+S3 stub. Qdrant runs in-process via QDRANT_URL=":memory:" (see QdrantVDB).
+"""
+import re
+import time
+import shutil
+import asyncio
+import hashlib
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from pathlib import Path
+from typing import AsyncIterator, Dict, Iterator, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+
+
+def _approx_tokens(text: str) -> int:
+    return max(1, len(text) // 4)
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic chat model: the reply is built from words of the prompt, seeded by its hash,
+    after latency_seconds (time to first token) plus token_delay_seconds per streamed word.
+    Reports usage_metadata like the real providers so token accounting can be exercised.
+    """
+
+    latency_seconds: float = 0.05
+    token_delay_seconds: float = 0.0
+    answer_words: int = 40
+
+    @property
+    def _llm_type(self) -> str:
+        return "benchmark-fake"
+
+    def _reply(self, messages: List[BaseMessage]) -> str:
+        prompt = "\n".join(str(m.content) for m in messages)
+        words = TOKEN_PATTERN.findall(prompt) or ["ok"]
+        seed = int.from_bytes(hashlib.sha256(prompt.encode("utf-8")).digest()[:8], "big")
+        rng = np.random.default_rng(seed)
+        return " ".join(words[i] for i in rng.integers(0, len(words), self.answer_words))
+
+    def _usage(self, messages: List[BaseMessage], reply: str) -> Dict[str, int]:
+        input_tokens = sum(_approx_tokens(str(m.content)) for m in messages)
+        output_tokens = _approx_tokens(reply)
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens,
+                "total_tokens": input_tokens + output_tokens}
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        time.sleep(self.latency_seconds + self.token_delay_seconds * self.answer_words)
+        reply = self._reply(messages)
+        message = AIMessage(content=reply, usage_metadata=self._usage(messages, reply))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        await asyncio.sleep(self.latency_seconds + self.token_delay_seconds * self.answer_words)
+        reply = self._reply(messages)
+        message = AIMessage(content=reply, usage_metadata=self._usage(messages, reply))
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        time.sleep(self.latency_seconds)
+        reply = self._reply(messages)
+        for word in reply.split(" "):
+            time.sleep(self.token_delay_seconds)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, reply)))
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        await asyncio.sleep(self.latency_seconds)
+        reply = self._reply(messages)
+        for word in reply.split(" "):
+            await asyncio.sleep(self.token_delay_seconds)
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=word + " "))
+            if run_manager:
+                await run_manager.on_llm_new_token(chunk.text, chunk=chunk)
+            yield chunk
+        yield ChatGenerationChunk(message=AIMessageChunk(content="", usage_metadata=self._usage(messages, reply)))
+
+
+class HashEmbeddings(Embeddings):
+    """
+    Feature-hashing embedder: each token adds +-1 to a hashed dimension, then the vector is
+    L2-normalised. Texts sharing words get similar vectors, so retrieval quality is meaningful.
+    latency_seconds is added per embed call to mimic an API round trip.
+    """
+
+    def __init__(self, size: int = 256, latency_seconds: float = 0.0):
+        self.size = size
+        self.latency_seconds = latency_seconds
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def _embed(self, text: str) -> List[float]:
+        vector = np.zeros(self.size, dtype=np.float32)
+        for token in TOKEN_PATTERN.findall(text.lower()):
+            digest = hashlib.blake2b(token.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "big")
+            vector[value % self.size] += 1.0 if value & (1 << 63) else -1.0
+        norm = np.linalg.norm(vector)
+        if norm == 0:
+            vector[0] = 1.0
+            norm = 1.0
+        return (vector / norm).tolist()
+
+    def _call(self):
+        with self._lock:
+            self.calls += 1
+        if self.latency_seconds:
+            time.sleep(self.latency_seconds)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        self._call()
+        return [self._embed(t) for t in texts]
+
+    def embed_query(self, text: str) -> List[float]:
+        self._call()
+        return self._embed(text)
+
+
+class LocalS3Stub:
+    """
+    Directory-backed replacement for S3ReadUpload with the same public methods.
+    Objects are stored as root/<bucket>/<key>; latency_seconds is added per transfer.
+    """
+
+    def __init__(self, root: str, latency_seconds: float = 0.0, transfer_workers: int = 8):
+        self.root = Path(root)
+        self.latency_seconds = latency_seconds
+        self._executor = ThreadPoolExecutor(max_workers=transfer_workers, thread_name_prefix="s3-stub")
+
+    def _path(self, bucket_name: str, object_name: str) -> Path:
+        return self.root / bucket_name / object_name
+
+    def upload_file_to_s3(self, file_name, bucket_name, object_name=None):
+        object_name = object_name or Path(file_name).name
+        time.sleep(self.latency_seconds)
+        target = self._path(bucket_name, object_name)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.copyfile(file_name, target)
+        return True
+
+    def read_file_from_s3(self, bucket_name, object_name) -> Optional[bytes]:
+        time.sleep(self.latency_seconds)
+        path = self._path(bucket_name, object_name)
+        return path.read_bytes() if path.exists() else None
+
+    def submit_upload(self, file_name, bucket_name, object_name=None) -> Future:
+        return self._executor.submit(self.upload_file_to_s3, str(file_name), bucket_name, object_name)
+
+    def upload_files_batch(self, items, bucket_name) -> Dict[str, Optional[str]]:
+        futures = {object_name: self.submit_upload(file_name, bucket_name, object_name)
+                   for file_name, object_name in items}
+        return {name: (str(future.exception()) if future.exception() else None) for name, future in futures.items()}
+
+    def download_files_batch(self, object_names, bucket_name) -> Dict[str, Optional[bytes]]:
+        futures = {name: self._executor.submit(self.read_file_from_s3, bucket_name, name) for name in object_names}
+        return {name: future.result() for name, future in futures.items()}
+
+    def list_objects(self, bucket_name, prefix: str) -> Iterator[Dict]:
+        base = self.root / bucket_name
+        for path in sorted(p for p in base.rglob("*") if p.is_file()):
+            key = path.relative_to(base).as_posix()
+            if key.startswith(prefix):
+                stat = path.stat()
+                yield {"key": key, "etag": hashlib.md5(path.read_bytes()).hexdigest(), "size": stat.st_size,
+                       "last_modified": str(stat.st_mtime)}
+
+    def list_prefixes(self, bucket_name, prefix: str) -> List[str]:
+        base = self.root / bucket_name / prefix
+        return sorted(f"{prefix}{p.name}/" for p in base.iterdir() if p.is_dir()) if base.is_dir() else []
+
+    def move_object(self, bucket_name, source_key, dest_key):
+        time.sleep(self.latency_seconds)
+        target = self._path(bucket_name, dest_key)
+        target.parent.mkdir(parents=True, exist_ok=True)
+        shutil.move(self._path(bucket_name, source_key), target)
+        return True
@@ -0,0 +1,166 @@
+"""
+Collection layout benchmark: recall@k, query latency and vector-index memory of each
+`qdrant.profiles` entry in config.yaml, on the same synthetic clustered vectors.
+
+Run it against a local Qdrant server (e.g. `docker run -p 6333:6333 qdrant/qdrant`):
+
+    python -m benchmark.qdrant_profiles --url http://localhost:6333 --points 20000 --dim 3072
+    python -m benchmark.qdrant_profiles --profiles default scalar --queries 500
+
+Ground truth is exact cosine top-k computed with NumPy. RAM is an estimate from the layout
+(original vectors in their datatype, quantized copies and HNSW links kept in memory); the
+in-process ":memory:" mode does exact search and ignores layouts, so it only exercises the code path.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+MB = 1024 * 1024
+
+
+def make_vectors(points: int, dim: int, queries: int, clusters: int, seed: int = 7):
+    """Unit vectors around random cluster centres, and queries perturbed from held-out members."""
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((clusters, dim)).astype(np.float32)
+    data = centres[rng.integers(0, clusters, points)] + 0.6 * rng.standard_normal((points, dim)).astype(np.float32)
+    data /= np.linalg.norm(data, axis=1, keepdims=True)
+    probes = data[rng.integers(0, points, queries)] + 0.3 * rng.standard_normal((queries, dim)).astype(np.float32)
+    probes /= np.linalg.norm(probes, axis=1, keepdims=True)
+    return data, probes
+
+
+def exact_top_k(data: np.ndarray, queries: np.ndarray, k: int, block: int = 4096) -> np.ndarray:
+    """Exact cosine top-k ids per query (vectors are unit length, so dot product == cosine)."""
+    best_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+    best_ids = np.zeros((len(queries), k), dtype=np.int64)
+    for start in range(0, len(data), block):
+        scores = queries @ data[start:start + block].T
+        ids = np.broadcast_to(np.arange(start, start + scores.shape[1]), scores.shape)
+        merged_scores = np.concatenate([best_scores, scores], axis=1)
+        merged_ids = np.concatenate([best_ids, ids], axis=1)
+        order = np.argsort(-merged_scores, axis=1)[:, :k]
+        best_scores = np.take_along_axis(merged_scores, order, axis=1)
+        best_ids = np.take_along_axis(merged_ids, order, axis=1)
+    return best_ids
+
+
+def estimated_ram_mb(layout, points: int, dim: int) -> dict:
+    bytes_per_component = {"float32": 4, "float16": 2, "uint8": 1}[layout.datatype]
+    originals = 0 if layout.on_disk else points * dim * bytes_per_component
+    quantized = {"scalar": points * dim, "binary": points * dim / 8}.get(layout.quantization, 0)
+    if not layout.always_ram and layout.on_disk:
+        quantized = 0
+    links = 0 if layout.hnsw_on_disk else points * layout.hnsw_m * 2 * 4  # layer-0 links dominate
+    return {"originals": round(originals / MB, 1), "quantized": round(quantized / MB, 1),
+            "hnsw": round(links / MB, 1), "total": round((originals + quantized + links) / MB, 1)}
+
+
+def _wait_until_indexed(client, collection: str, timeout: float) -> float:
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if str(client.get_collection(collection).status).lower().endswith("green"):
+            break
+        time.sleep(0.5)
+    return time.perf_counter() - start
+
+
+def bench_profile(name: str, data, probes, truth, k: int, batch_size: int, index_timeout: float, keep: bool) -> dict:
+    from qdrant_client.http.models import PointStruct
+    from utils.qdrant_vector_db import QdrantVDB
+
+    vdb = QdrantVDB(profile=name)
+    client = vdb.get_client()
+    collection = f"bench_profile_{name}"
+    if client.collection_exists(collection):
+        client.delete_collection(collection)
+    vdb.ensure_collection(collection, data.shape[1])
+
+    start = time.perf_counter()
+    for offset in range(0, len(data), batch_size):
+        client.upsert(collection, wait=True, points=[
+            PointStruct(id=offset + i, vector=vector.tolist(), payload={"metadata": {"source": f"doc-{(offset + i) % 97}"}})
+            for i, vector in enumerate(data[offset:offset + batch_size])
+        ])
+    upload_seconds = time.perf_counter() - start
+    index_seconds = _wait_until_indexed(client, collection, index_timeout)
+    info = client.get_collection(collection)
+
+    search_params = vdb.search_params()
+    for probe in probes[:5]:  # warm-up
+        client.query_points(collection, query=probe.tolist(), limit=k, search_params=search_params)
+    latencies, hits = [], 0
+    for probe, expected in zip(probes, truth):
+        start = time.perf_counter()
+        points = client.query_points(collection, query=probe.tolist(), limit=k, search_params=search_params,
+                                     with_payload=False).points
+        latencies.append((time.perf_counter() - start) * 1000)
+        hits += len({p.id for p in points} & set(expected.tolist()))
+
+    if not keep:
+        client.delete_collection(collection)
+    values = np.asarray(latencies)
+    return {
+        "layout": vdb.layout.model_dump(),
+        f"recall_at_{k}": round(hits / (len(probes) * k), 4),
+        "latency_ms": {"mean": round(float(values.mean()), 2),
+                       **{f"p{p}": round(float(np.percentile(values, p)), 2) for p in (50, 95, 99)}},
+        "upload_seconds": round(upload_seconds, 2),
+        "index_wait_seconds": round(index_seconds, 2),
+        "indexed_vectors": info.indexed_vectors_count,
+        "estimated_ram_mb": estimated_ram_mb(vdb.layout, *data.shape),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare Qdrant collection layout profiles")
+    parser.add_argument("--url", default=os.getenv("QDRANT_URL", "http://localhost:6333"))
+    parser.add_argument("--api-key", default=os.getenv("QDRANT_API_KEY", "local"))
+    parser.add_argument("--profiles", nargs="*", help="qdrant.profiles entries (default: all)")
+    parser.add_argument("--points", type=int, default=20000)
+    parser.add_argument("--dim", type=int, default=3072)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--clusters", type=int, default=64)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--batch-size", type=int, default=256)
+    parser.add_argument("--index-timeout", type=float, default=600, help="seconds to wait for HNSW/quantization")
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark collections")
+    parser.add_argument("--output", default="benchmark/results/qdrant_profiles.json")
+    args = parser.parse_args()
+
+    os.environ["QDRANT_URL"] = args.url
+    os.environ["QDRANT_API_KEY"] = args.api_key
+    sys.path.insert(0, str(ROOT))
+    os.chdir(ROOT)
+    from utils.config_loader import get_settings
+
+    if args.url == ":memory:":
+        print("warning: in-process Qdrant ignores layouts (exact search); use a Qdrant server for real numbers")
+    profiles = args.profiles or list(get_settings().qdrant.profiles)
+    data, probes = make_vectors(args.points, args.dim, args.queries, args.clusters)
+    truth = exact_top_k(data, probes, args.k)
+
+    results = {}
+    for name in profiles:
+        results[name] = bench_profile(name, data, probes, truth, args.k, args.batch_size, args.index_timeout, args.keep)
+        print(name, json.dumps({key: value for key, value in results[name].items() if key != "layout"}))
+
+    report = {
+        "meta": {"timestamp": datetime.now(timezone.utc).isoformat(), "url": args.url,
+                 **{key: getattr(args, key) for key in ("points", "dim", "queries", "clusters", "k")}},
+        "profiles": results,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Report written to {output}")
+
+
+if __name__ == "__main__":
+    main()
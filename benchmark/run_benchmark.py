@@ -0,0 +1,268 @@
+"""
+Offline end-to-end benchmark: ingestion throughput and query latency with local stand-ins for
+every external service (benchmark.fakes + in-process Qdrant), over the sample files in data/.
+
+    python -m benchmark.run_benchmark --copies 5 --queries 50 --llm-latency 0.05
+    python -m benchmark.run_benchmark --baseline benchmark/results/previous.json
+
+The JSON report (meta, ingestion, query) is written under benchmark/results/ so runs can be
+compared; --baseline prints the relative change of every numeric metric.
+"""
+import os
+import sys
+import json
+import time
+import shutil
+import asyncio
+import argparse
+import platform
+import resource
+import tempfile
+import subprocess
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+
+DEFAULT_QUESTIONS = [
+    "What is this document about?",
+    "Summarize the key findings of the case study.",
+    "What are the setup steps?",
+    "When is the next vaccine due?",
+    "Which tools are required for the installation?",
+    "What were the main risks identified?",
+    "List the important dates mentioned.",
+    "Who is responsible for the project?",
+]
+FOLLOW_UP = "Can you tell me more about that?"
+
+
+def _configure_environment(workdir: Path, args) -> None:
+    """Point every service and on-disk store at local stand-ins. Must run before repo imports."""
+    defaults = {
+        "QDRANT_URL": ":memory:",
+        "QDRANT_API_KEY": "local",
+        "APP__INGESTION__PARALLEL": str(args.parallel).lower(),
+        "APP__INGESTION__PARALLEL_MIN_MB": "0",  # --parallel measures the pool whatever the input size
+        "APP__INGESTION__MANIFEST_PATH": str(workdir / "manifest.db"),
+        "APP__RETRIEVAL__HYBRID": str(args.hybrid).lower(),
+        "APP__RETRIEVAL__BM25_PATH": str(workdir / "bm25.db"),
+        "APP__RETRIEVAL__RERANK__ENABLED": "false",
+        "APP__RAG__ANSWER_CACHE__ENABLED": str(args.answer_cache).lower(),
+        "APP__RAG__ANSWER_CACHE__VERSION_DIR": str(workdir / "answer_cache_versions"),
+        "APP__SESSION__ENABLED": "false",
+        "APP__LOGGING__LOG_DIR": str(workdir / "logs"),
+    }
+    for key, value in defaults.items():
+        os.environ.setdefault(key, value)
+
+
+def _peak_rss_mb() -> dict:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return {
+        "self": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1),
+        "children": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale, 1),
+    }
+
+
+def _percentiles(samples_ms) -> dict:
+    if not samples_ms:
+        return {}
+    values = np.asarray(samples_ms)
+    return {
+        "count": len(values),
+        "mean_ms": round(float(values.mean()), 2),
+        **{f"p{p}_ms": round(float(np.percentile(values, p)), 2) for p in (50, 90, 95, 99)},
+        "max_ms": round(float(values.max()), 2),
+    }
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except Exception:
+        return "unknown"
+
+
+def build_corpus(data_dir: Path, target: Path, copies: int):
+    """Copies of the sample files under distinct names, so each copy is ingested as a new file."""
+    from src.data_ingestion import SUPPORTED_FILE_TYPES
+    target.mkdir(parents=True, exist_ok=True)
+    files = []
+    for source in sorted(p for p in data_dir.iterdir() if p.suffix.lower() in SUPPORTED_FILE_TYPES):
+        for i in range(copies):
+            path = target / f"{source.stem}-{i}{source.suffix}"
+            shutil.copyfile(source, path)
+            files.append(path)
+    return files
+
+
+def bench_ingestion(files, embeddings, s3_root: Path, user_name: str) -> dict:
+    from benchmark.fakes import LocalS3Stub
+    from src.data_ingestion import DataIngestion
+
+    ingestion = DataIngestion(embeddings=embeddings, s3_ops=LocalS3Stub(str(s3_root)))
+    total_bytes = sum(f.stat().st_size for f in files)
+
+    start = time.perf_counter()
+    result = ingestion.ingest_files(files, user_name)
+    elapsed = time.perf_counter() - start
+
+    # Second pass over unchanged files measures the incremental fast path
+    start = time.perf_counter()
+    repeat = ingestion.ingest_files(files, user_name)
+    repeat_elapsed = time.perf_counter() - start
+
+    return {
+        "files": len(files),
+        "input_mb": round(total_bytes / (1024 * 1024), 2),
+        "ingested_files": len(result.ingested_files),
+        "failed_files": result.failed_files,
+        "chunks": result.num_chunks,
+        "seconds": round(elapsed, 3),
+        "files_per_second": round(len(result.ingested_files) / elapsed, 2) if elapsed else None,
+        "chunks_per_second": round(result.num_chunks / elapsed, 2) if elapsed else None,
+        "embed_calls": embeddings.calls,
+        "unchanged_reingest_seconds": round(repeat_elapsed, 3),
+        "unchanged_skipped_files": len(repeat.skipped_files),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def bench_queries(rag, questions, num_queries: int, concurrency: int) -> dict:
+    from langchain_core.messages import AIMessage, HumanMessage
+
+    def request(i):
+        question = questions[i % len(questions)]
+        if i % 2:  # every other query is a follow-up, exercising the question rewriter
+            return FOLLOW_UP, [HumanMessage(question), AIMessage("It is described in the uploaded files.")]
+        return question, []
+
+    for i in range(2):  # warm-up: client connections, prompt templates, caches
+        rag.invoke(*request(i))
+
+    sequential = []
+    for i in range(num_queries):
+        question, history = request(i)
+        start = time.perf_counter()
+        rag.invoke(question, chat_history=history)
+        sequential.append((time.perf_counter() - start) * 1000)
+
+    first_token = []
+    for i in range(min(num_queries, 10)):
+        question, history = request(i)
+        start = time.perf_counter()
+        for event in rag.stream(question, chat_history=history):
+            if event["type"] == "token":
+                first_token.append((time.perf_counter() - start) * 1000)
+                break
+
+    async def run_concurrent():
+        semaphore = asyncio.Semaphore(concurrency)
+        latencies = []
+
+        async def one(i):
+            async with semaphore:
+                question, history = request(i)
+                start = time.perf_counter()
+                await rag.ainvoke(question, chat_history=history)
+                latencies.append((time.perf_counter() - start) * 1000)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(one(i) for i in range(num_queries)))
+        return latencies, time.perf_counter() - start
+
+    concurrent, wall = asyncio.run(run_concurrent())
+    return {
+        "sequential": _percentiles(sequential),
+        "stream_first_token": _percentiles(first_token),
+        "concurrent": {**_percentiles(concurrent), "concurrency": concurrency,
+                       "queries_per_second": round(num_queries / wall, 2) if wall else None},
+        "rewrite_stats": dict(rag.rewrite_stats),
+        "peak_rss_mb": _peak_rss_mb(),
+    }
+
+
+def compare(report: dict, baseline: dict, prefix: str = "") -> None:
+    """Print the relative change of every numeric metric present in both reports."""
+    for key, value in report.items():
+        name = f"{prefix}{key}"
+        old = baseline.get(key) if isinstance(baseline, dict) else None
+        if isinstance(value, dict):
+            compare(value, old or {}, name + ".")
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and isinstance(old, (int, float)) and old:
+            print(f"{name:60s} {old:>12} -> {value:>12}  ({(value - old) / old * 100:+.1f}%)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline ingestion + query benchmark")
+    parser.add_argument("--data-dir", default=str(ROOT / "data"))
+    parser.add_argument("--copies", type=int, default=3, help="copies of each sample file to ingest")
+    parser.add_argument("--queries", type=int, default=40)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--questions", help="file with one question per line")
+    parser.add_argument("--llm-latency", type=float, default=0.05, help="fake LLM seconds per call")
+    parser.add_argument("--embed-latency", type=float, default=0.0, help="fake embedder seconds per call")
+    parser.add_argument("--embed-dim", type=int, default=256)
+    parser.add_argument("--parallel", action=argparse.BooleanOptionalAction, default=False)
+    parser.add_argument("--hybrid", action=argparse.BooleanOptionalAction, default=True)
+    parser.add_argument("--answer-cache", action=argparse.BooleanOptionalAction, default=False)
+    parser.add_argument("--output", help="report path (default benchmark/results/benchmark-<time>.json)")
+    parser.add_argument("--baseline", help="previous report to compare against")
+    args = parser.parse_args()
+
+    workdir = Path(tempfile.mkdtemp(prefix="rag-bench-"))
+    _configure_environment(workdir, args)
+    sys.path.insert(0, str(ROOT))
+    os.chdir(ROOT)
+
+    from benchmark.fakes import FakeChatModel, HashEmbeddings
+    from src.qa_rag import ConversationalRAG
+    from utils.metrics import dump_metrics
+
+    user_name = "benchmark"
+    try:
+        files = build_corpus(Path(args.data_dir), workdir / "corpus", args.copies)
+        embeddings = HashEmbeddings(size=args.embed_dim, latency_seconds=args.embed_latency)
+        ingestion = bench_ingestion(files, embeddings, workdir / "s3", user_name)
+
+        questions = DEFAULT_QUESTIONS
+        if args.questions:
+            questions = [q.strip() for q in Path(args.questions).read_text().splitlines() if q.strip()]
+        rag = ConversationalRAG(user_name, embeddings=embeddings, llm=FakeChatModel(latency_seconds=args.llm_latency))
+        query = bench_queries(rag, questions, args.queries, args.concurrency)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report = {
+        "meta": {
+            "timestamp": datetime.now(timezone.utc).isoformat(),
+            "git_commit": _git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "args": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        },
+        "ingestion": ingestion,
+        "query": query,
+        "stages": dump_metrics(),  # per-stage histograms from utils.metrics
+    }
+    output = Path(args.output or ROOT / "benchmark" / "results"
+                  / f"benchmark-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(json.dumps({"ingestion": ingestion, "query": query}, indent=2))
+    print(f"Report written to {output}")
+
+    if args.baseline:
+        baseline = json.loads(Path(args.baseline).read_text())
+        compare({"ingestion": ingestion, "query": query},
+                {"ingestion": baseline.get("ingestion", {}), "query": baseline.get("query", {})})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Startup benchmark: import time of utils.model_loader (lazy provider SDKs) versus importing all three
+provider SDKs eagerly, and the cost of constructing a fresh ModelLoader per caller versus reusing
+ModelLoader.get_instance().
+
+Each import measurement runs in a fresh interpreter so module caches do not skew the numbers.
+
+    python -m benchmark.startup_benchmark --runs 5 --output benchmark/results/startup.json
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+
+EAGER_IMPORT = (
+    "import langchain_google_genai, langchain_openai, langchain_groq\n"
+    "import utils.model_loader\n"
+)
+LAZY_IMPORT = "import utils.model_loader\n"
+
+
+def _time_in_subprocess(statement: str) -> float:
+    """Milliseconds to run statement in a fresh interpreter (interpreter start-up excluded)."""
+    code = (
+        "import time\n"
+        "start = time.perf_counter()\n"
+        f"exec({statement!r})\n"
+        "print((time.perf_counter() - start) * 1000)\n"
+    )
+    out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True, check=True)
+    return float(out.stdout.strip().splitlines()[-1])
+
+
+def _summary(samples):
+    return {"median_ms": round(statistics.median(samples), 2), "min_ms": round(min(samples), 2),
+            "max_ms": round(max(samples), 2), "runs": len(samples)}
+
+
+def bench_imports(runs: int) -> dict:
+    eager = [_time_in_subprocess(EAGER_IMPORT) for _ in range(runs)]
+    lazy = [_time_in_subprocess(LAZY_IMPORT) for _ in range(runs)]
+    return {"eager_provider_imports": _summary(eager), "lazy_provider_imports": _summary(lazy)}
+
+
+def bench_loader_construction(calls: int) -> dict:
+    """Per-caller ModelLoader() (before) versus the shared per-process instance (after)."""
+    from utils.model_loader import ModelLoader
+
+    start = time.perf_counter()
+    for _ in range(calls):
+        ModelLoader()
+    fresh_ms = (time.perf_counter() - start) * 1000
+
+    ModelLoader._instance = None
+    start = time.perf_counter()
+    for _ in range(calls):
+        ModelLoader.get_instance()
+    shared_ms = (time.perf_counter() - start) * 1000
+    return {"calls": calls, "fresh_instances_ms": round(fresh_ms, 2), "shared_instance_ms": round(shared_ms, 2)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure import and ModelLoader start-up cost")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--calls", type=int, default=20)
+    parser.add_argument("--output", default="benchmark/results/startup.json")
+    args = parser.parse_args()
+
+    # ModelLoader only checks that the keys are present; nothing here calls a provider
+    for key in ("GOOGLE_API_KEY", "OPENAI_API_KEY", "GROQ_API_KEY"):
+        os.environ.setdefault(key, "benchmark-dummy-key")
+    sys.path.insert(0, str(ROOT))
+    os.chdir(ROOT)
+
+    report = {"imports": bench_imports(args.runs), "model_loader": bench_loader_construction(args.calls)}
+    print(json.dumps(report, indent=2))
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,230 @@
+"""
+Tenancy benchmark: one Qdrant collection per user (qdrant.tenancy: per_user) versus one shared
+collection with an indexed tenant payload field (qdrant.tenancy: shared), for 1000+ simulated tenants.
+
+Each mode runs in its own interpreter (APP__QDRANT__TENANCY override) so peak RSS is not shared:
+
+    python -m benchmark.tenancy_benchmark --url http://localhost:6333 --tenants 2000 --points-per-tenant 50
+    python -m benchmark.tenancy_benchmark --url :memory: --tenants 1000 --dim 64
+
+Per mode it reports ingest time, tenant-filtered search latency, recall@k against exact per-tenant
+top-k, number of collections and segments, peak client RSS, and isolation violations (results that
+belong to another tenant). All tenants share one vector space, so a missing tenant filter shows up as
+violations. End-to-end retrieval (retriever.invoke, including the hybrid BM25 fetch path) is checked
+too, and the run exits non-zero if any mode returns another tenant's points. Against a server, RSS
+covers the client only: compare the server's own memory (e.g. `docker stats`) between the two runs. The in-process ":memory:" mode keeps every point in
+this process, searches by brute force and evaluates payload filters in Python, so there RSS is
+meaningful but latency (especially shared-mode filtered latency) says nothing about a server.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import resource
+import tempfile
+import subprocess
+import uuid
+from datetime import datetime, timezone
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+MODES = ("per_user", "shared")
+TENANT_PREFIX = "bench_tenant_"
+SHARED_COLLECTION = "bench_tenants_shared"
+# BM25 "user" holding every tenant's points, so only the Qdrant tenant filter can keep them apart
+ALL_TENANTS = "bench_all_tenants"
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale, 1)
+
+
+def _percentiles(samples_ms) -> dict:
+    values = np.asarray(samples_ms)
+    return {"mean": round(float(values.mean()), 3),
+            **{f"p{p}": round(float(np.percentile(values, p)), 3) for p in (50, 95, 99)}}
+
+
+def tenant_vectors(tenants: int, points_per_tenant: int, dim: int, queries: int, seed: int = 7):
+    """Every tenant's points drawn from the same clusters, plus (tenant, probe) queries near that tenant's points."""
+    from benchmark.qdrant_profiles import make_vectors
+
+    data, _ = make_vectors(tenants * points_per_tenant, dim, 0, clusters=32, seed=seed)
+    rng = np.random.default_rng(seed + 1)
+    query_tenants = rng.integers(0, tenants, queries)
+    anchors = query_tenants * points_per_tenant + rng.integers(0, points_per_tenant, queries)
+    probes = data[anchors] + 0.3 * rng.standard_normal((queries, dim)).astype(np.float32)
+    probes /= np.linalg.norm(probes, axis=1, keepdims=True)
+    return data.reshape(tenants, points_per_tenant, dim), query_tenants, probes
+
+
+def point_id(i: int) -> str:
+    # UUID point IDs, as ingestion produces (and as the BM25 index stores them)
+    return str(uuid.UUID(int=i))
+
+
+def retrieval_violations(vdb, embeddings, names, points_per_tenant: int, query_tenants, probes,
+                         k: int, checks: int, seed: int = 11) -> int:
+    """
+    Foreign documents returned by retriever.invoke for up to `checks` queries. The BM25 side indexes every
+    tenant's points and each query names other tenants' chunks, so the hybrid fetch is handed foreign IDs
+    and only the tenant filter keeps them out.
+    """
+    from utils.bm25_index import BM25Index
+    from utils.context_retriever import BudgetedMMRRetriever
+
+    rng = np.random.default_rng(seed)
+    total_points = len(names) * points_per_tenant
+    violations = 0
+    with tempfile.TemporaryDirectory() as tmp:
+        sparse_index = BM25Index(os.path.join(tmp, "bm25.db"))
+        sparse_index.add(ALL_TENANTS, ((point_id(i), f"chunk {i}") for i in range(total_points)))
+        for t, probe in list(zip(query_tenants, probes))[:checks]:
+            name = names[t]
+            foreign = [i for i in rng.choice(total_points, 4 * k, replace=False) if i // points_per_tenant != t]
+            retriever = BudgetedMMRRetriever(
+                vector_store=vdb.get_vector_store(embeddings, vdb.collection_for(name)), k=k, fetch_k=k,
+                search_params=vdb.search_params(), tenant_filter=vdb.tenant_filter(name),
+                sparse_index=sparse_index, user_name=ALL_TENANTS, sparse_k=4 * k)
+            docs = retriever.invoke(" ".join(map(str, foreign)), query_vector=probe.tolist())
+            violations += sum(doc.metadata.get("tenant") != name for doc in docs)
+    return violations
+
+
+def run_mode(args) -> dict:
+    """Ingest, query and clean up in the tenancy mode selected by APP__QDRANT__TENANCY."""
+    from langchain_core.documents import Document
+    from benchmark.fakes import HashEmbeddings
+    from utils.context_retriever import BudgetedMMRRetriever
+    from utils.qdrant_vector_db import QdrantVDB
+
+    vdb = QdrantVDB()
+    client = vdb.get_client()
+    data, query_tenants, probes = tenant_vectors(args.tenants, args.points_per_tenant, args.dim, args.queries)
+    names = [f"{TENANT_PREFIX}{t:05d}" for t in range(args.tenants)]
+    collections = sorted({vdb.collection_for(name) for name in names})
+    for collection in collections:
+        if client.collection_exists(collection):
+            client.delete_collection(collection)
+    rss_before = _peak_rss_mb()
+
+    start = time.perf_counter()
+    for t, name in enumerate(names):
+        collection = vdb.collection_for(name)
+        if t == 0 or not vdb.shared:
+            vdb.ensure_collection(collection, args.dim)
+        ids = range(t * args.points_per_tenant, (t + 1) * args.points_per_tenant)
+        docs = [Document(page_content=f"chunk {i}", metadata={"source": f"doc-{i % 7}", "tenant": name}) for i in ids]
+        vdb.upsert_embedded(collection, [point_id(i) for i in ids], data[t].tolist(), docs, vdb.tenant_id(name))
+    ingest_seconds = time.perf_counter() - start
+
+    embeddings = HashEmbeddings(size=args.dim)
+    retrievers = {}
+
+    def retriever_for(name):
+        if name not in retrievers:
+            retrievers[name] = BudgetedMMRRetriever(
+                vector_store=vdb.get_vector_store(embeddings, vdb.collection_for(name)), fetch_k=args.k,
+                search_params=vdb.search_params(), tenant_filter=vdb.tenant_filter(name))
+        return retrievers[name]
+
+    latencies, hits, violations = [], 0, 0
+    for t, probe in zip(query_tenants, probes):
+        name = names[t]
+        retriever = retriever_for(name)
+        start = time.perf_counter()
+        points = retriever._search(probe.tolist())
+        latencies.append((time.perf_counter() - start) * 1000)
+        expected = t * args.points_per_tenant + np.argsort(-(data[t] @ probe))[:args.k]
+        hits += len({uuid.UUID(str(p.id)).int for p in points} & set(expected.tolist()))
+        violations += sum((p.payload or {}).get("metadata", {}).get("tenant") != name for p in points)
+    retrieval_leaks = retrieval_violations(vdb, embeddings, names, args.points_per_tenant, query_tenants, probes,
+                                           args.k, args.isolation_checks)
+
+    infos = [client.get_collection(collection) for collection in collections]
+    report = {
+        "tenancy": "shared" if vdb.shared else "per_user",
+        "collections": len(collections),
+        "segments": sum(info.segments_count or 0 for info in infos),
+        "points": sum(info.points_count or 0 for info in infos),
+        "ingest_seconds": round(ingest_seconds, 2),
+        "search_latency_ms": _percentiles(latencies),
+        f"recall_at_{args.k}": round(hits / (len(probes) * args.k), 4),
+        "isolation_violations": int(violations),
+        "retrieval_isolation_violations": int(retrieval_leaks),
+        "peak_rss_mb": {"before_ingest": rss_before, "after_queries": _peak_rss_mb()},
+    }
+    if not args.keep:
+        for collection in collections:
+            client.delete_collection(collection)
+    return report
+
+
+def _run_in_subprocess(mode: str, argv) -> dict:
+    env = {**os.environ, "APP__QDRANT__TENANCY": mode, "APP__QDRANT__SHARED_COLLECTION": SHARED_COLLECTION}
+    out = subprocess.run([sys.executable, "-m", "benchmark.tenancy_benchmark", "--worker", *argv],
+                         cwd=ROOT, env=env, capture_output=True, text=True)
+    if out.returncode != 0:
+        raise RuntimeError(f"{mode} run failed:\n{out.stderr[-4000:]}")
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare per-user collections with one shared tenant collection")
+    parser.add_argument("--url", default=os.getenv("QDRANT_URL", "http://localhost:6333"))
+    parser.add_argument("--api-key", default=os.getenv("QDRANT_API_KEY", "local"))
+    parser.add_argument("--profile", help="qdrant.profiles entry (default: qdrant.profile)")
+    parser.add_argument("--modes", nargs="*", choices=MODES, default=list(MODES))
+    parser.add_argument("--tenants", type=int, default=1000)
+    parser.add_argument("--points-per-tenant", type=int, default=20)
+    parser.add_argument("--dim", type=int, default=256)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--isolation-checks", type=int, default=100,
+                        help="queries also run end to end through the hybrid retriever")
+    parser.add_argument("--keep", action="store_true", help="keep the benchmark collections")
+    parser.add_argument("--worker", action="store_true", help=argparse.SUPPRESS)
+    parser.add_argument("--output", default="benchmark/results/tenancy.json")
+    args = parser.parse_args()
+
+    os.environ["QDRANT_URL"] = args.url
+    os.environ["QDRANT_API_KEY"] = args.api_key
+    if args.profile:
+        os.environ["APP__QDRANT__PROFILE"] = args.profile
+    sys.path.insert(0, str(ROOT))
+    os.chdir(ROOT)
+
+    if args.worker:
+        print(json.dumps(run_mode(args)))
+        return
+
+    if args.url == ":memory:":
+        print("warning: in-process Qdrant searches by brute force; use a Qdrant server for HNSW latency")
+    results = {}
+    for mode in args.modes:
+        results[mode] = _run_in_subprocess(mode, sys.argv[1:])
+        print(mode, json.dumps(results[mode]))
+
+    report = {
+        "meta": {"timestamp": datetime.now(timezone.utc).isoformat(), "url": args.url,
+                 **{key: getattr(args, key) for key in ("profile", "tenants", "points_per_tenant", "dim", "queries", "k")}},
+        "modes": results,
+    }
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, indent=2))
+    print(f"Report written to {output}")
+
+    leaking = [mode for mode, result in results.items()
+               if result["isolation_violations"] or result["retrieval_isolation_violations"]]
+    if leaking:
+        raise SystemExit(f"Tenant isolation violated in: {', '.join(leaking)}")
+
+
+if __name__ == "__main__":
+    main()
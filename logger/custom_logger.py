@@ -1,12 +1,77 @@
 import os
+import atexit
+import random
 import logging
+import threading
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler, TimedRotatingFileHandler
+from queue import SimpleQueue
+import orjson
 import structlog
 
 CONSOLE_LOGS = False  # Set to False to disable console logs
 
+# Set by a process before it spawns helper processes (e.g. the ingestion parse pool). The children
+# inherit it and log to stderr only, instead of each opening its own rotating log file.
+HELPER_PROCESS_ENV = "PERSONAL_CHATGPT_HELPER_PROCESS"
+
+# Logging is configured once per process; later get_logger calls only return named loggers
+_configure_lock = threading.Lock()
+_configured = False
+_listener = None
+
+
+def _json_serializer(obj, **kw) -> str:
+    # orjson renders several times faster than the stdlib json module
+    return orjson.dumps(obj, default=str).decode("utf-8")
+
+
+class EventSampler:
+    """
+    structlog processor that keeps only a fraction of chosen high-volume events (logging.sample_rates).
+    Only levels at or below info are sampled; warnings and errors are always kept. The shipped
+    config samples only per-candidate debug events, so nothing is dropped at the default INFO level.
+    """
+
+    _SAMPLED_LEVELS = {"debug", "info"}
+
+    def __init__(self, rates=None):
+        self.rates = dict(rates or {})
+
+    def __call__(self, logger, method_name, event_dict):
+        rate = self.rates.get(event_dict.get("event"))
+        if rate is not None and method_name in self._SAMPLED_LEVELS and random.random() >= rate:
+            raise structlog.DropEvent
+        if rate is not None:
+            event_dict["sample_rate"] = rate
+        return event_dict
+
+
+class _DeferredQueueHandler(QueueHandler):
+    """Enqueues records as-is so JSON rendering happens on the listener thread, not the caller's."""
+
+    def prepare(self, record):
+        return record
+
+
 class CustomLogger:
-    def __init__(self, log_dir="logs"):
+    """
+    JSON structured logging over structlog.
+
+    In "queue" mode (default) callers only build the event dict and put the record on an
+    in-memory queue; a background QueueListener renders JSON and writes the (rotating) log file.
+    "sync" mode keeps the old behaviour of rendering and writing on the calling thread.
+    Settings come from the `logging` block of config.yaml when it is present. Helper processes
+    (HELPER_PROCESS_ENV set) log to stderr only.
+    """
+
+    def __init__(self, log_dir="logs", config_path="config.yaml"):
+        self.options = {}
+        if os.path.exists(config_path):
+            from utils.config_loader import get_settings
+            self.options = get_settings(config_path).logging.model_dump()
+        log_dir = self.options.get("log_dir") or log_dir
+
         # Ensure logs directory exists
         self.logs_dir = os.path.join(os.getcwd(), log_dir)
         os.makedirs(self.logs_dir, exist_ok=True)
@@ -15,40 +80,85 @@ class CustomLogger:
         log_file = f"{datetime.now().strftime('%m_%d_%Y_%H_%M_%S')}.log"
         self.log_file_path = os.path.join(self.logs_dir, log_file)
 
-    def get_logger(self, name=__file__):
-        logger_name = os.path.basename(name)
+    def _file_handler(self):
+        rotation = self.options.get("rotation", "size")
+        if rotation == "size":
+            return RotatingFileHandler(
+                self.log_file_path,
+                maxBytes=int(self.options.get("max_bytes_mb", 50) * 1024 * 1024),
+                backupCount=self.options.get("backup_count", 10),
+                delay=True,
+            )
+        if rotation == "time":
+            return TimedRotatingFileHandler(
+                self.log_file_path,
+                when=self.options.get("when", "midnight"),
+                backupCount=self.options.get("backup_count", 10),
+                utc=True,
+                delay=True,
+            )
+        return logging.FileHandler(self.log_file_path, delay=True)
+
+    def _configure(self):
+        global _configured, _listener
+        level = getattr(logging, str(self.options.get("level", "INFO")).upper(), logging.INFO)
+        queued = self.options.get("mode", "queue") == "queue"
+
+        pre_chain = [
+            structlog.processors.TimeStamper(fmt="iso", utc=True, key="timestamp"),
+            structlog.processors.add_log_level,
+        ]
+        formatter = structlog.stdlib.ProcessorFormatter(
+            processors=[
+                structlog.stdlib.ProcessorFormatter.remove_processors_meta,
+                structlog.processors.EventRenamer(to="event"),
+                structlog.processors.JSONRenderer(serializer=_json_serializer),
+            ],
+            foreign_pre_chain=pre_chain,  # plain logging records from libraries
+        )
 
         # Configure logging for console + file (both JSON)
-        file_handler = logging.FileHandler(self.log_file_path)
-        file_handler.setLevel(logging.INFO)
-        file_handler.setFormatter(logging.Formatter("%(message)s"))  # Raw JSON lines
-
-        if CONSOLE_LOGS:
-            console_handler = logging.StreamHandler()
-            console_handler.setLevel(logging.INFO)
-            console_handler.setFormatter(logging.Formatter("%(message)s"))
-            handlers = [file_handler, console_handler]
+        if os.environ.get(HELPER_PROCESS_ENV):
+            handlers, queued = [logging.StreamHandler()], False
         else:
-            handlers = [file_handler]
+            handlers = [self._file_handler()]
+            if self.options.get("console", CONSOLE_LOGS):
+                handlers.append(logging.StreamHandler())
+        for handler in handlers:
+            handler.setLevel(level)
+            handler.setFormatter(formatter)
 
-        logging.basicConfig(
-            level=logging.INFO,
-            format="%(message)s",  # Structlog will handle JSON rendering
-            handlers=handlers
-        )
+        root = logging.getLogger()
+        root.setLevel(level)
+        if queued:
+            log_queue = SimpleQueue()
+            _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+            _listener.start()
+            atexit.register(_listener.stop)  # flush what is still queued on shutdown
+            handlers = [_DeferredQueueHandler(log_queue)]
+        for handler in handlers:
+            root.addHandler(handler)
 
-        # Configure structlog for JSON structured logging
+        # Configure structlog for JSON structured logging; rendering is left to the handler's formatter
         structlog.configure(
             processors=[
-                structlog.processors.TimeStamper(fmt="iso", utc=True, key="timestamp"),
-                structlog.processors.add_log_level,
-                structlog.processors.EventRenamer(to="event"),
-                structlog.processors.JSONRenderer()
+                structlog.stdlib.filter_by_level,
+                EventSampler(self.options.get("sample_rates")),
+                *pre_chain,
+                structlog.processors.format_exc_info,
+                structlog.stdlib.ProcessorFormatter.wrap_for_formatter,
             ],
             logger_factory=structlog.stdlib.LoggerFactory(),
+            wrapper_class=structlog.stdlib.BoundLogger,
             cache_logger_on_first_use=True,
         )
+        _configured = True
 
+    def get_logger(self, name=__file__):
+        logger_name = os.path.basename(name)
+        with _configure_lock:
+            if not _configured:
+                self._configure()
         return structlog.get_logger(logger_name)
 
 
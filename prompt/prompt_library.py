@@ -22,8 +22,19 @@ context_qa_prompt = ChatPromptTemplate.from_messages([
     ("human", "{input}"),
 ])
 
+# Prompt for rolling older chat turns into a running summary
+summarize_history_prompt = ChatPromptTemplate.from_messages([
+    ("system", (
+        "You maintain a running summary of a conversation between a user and an assistant. Merge the existing "
+        "summary with the new turns into a single updated summary. Keep names, facts, documents and open "
+        "questions the user may refer back to; drop pleasantries. Stay under {max_words} words."
+    )),
+    ("human", "Existing summary:\n{summary}\n\nNew turns:\n{turns}"),
+])
+
 # Central dictionary to register prompts
 PROMPT_REGISTRY = {
     "contextualize_question": contextualize_question_prompt,
     "context_qa": context_qa_prompt,
+    "summarize_history": summarize_history_prompt,
 }
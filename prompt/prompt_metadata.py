@@ -20,4 +20,5 @@ class SummaryResponse(RootModel[list[ChangeFormat]]):
     pass
 class PromptType(str, Enum):
     CONTEXTUALIZE_QUESTION = "contextualize_question"
-    CONTEXT_QA = "context_qa"
\ No newline at end of file
+    CONTEXT_QA = "context_qa"
+    SUMMARIZE_HISTORY = "summarize_history"
\ No newline at end of file
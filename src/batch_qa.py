@@ -0,0 +1,133 @@
+"""
+JSONL-in / JSONL-out batch question answering over ConversationalRAG.batch().
+
+Input lines use the requests.jsonl layout: a JSON object with a "request_id" and the question in
+"question" (or "body"). Optional keys: "user_name" (defaults to --user-name) and "chat_history",
+a list of {"role": "human" | "ai", "content": ...}. Every input line produces one output line, in
+input order, with request_id, user_name, question, answer, sources, cached and error.
+
+    python -m src.batch_qa --input requests.jsonl --output answers.jsonl --user-name Arindam
+"""
+import sys
+import json
+import argparse
+from dataclasses import asdict
+from typing import Any, Dict, List, Optional
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage
+
+from src.qa_rag import ConversationalRAG
+from utils.model_loader import ModelLoader
+from exception.custom_exception import ProjectCustomException
+from logger import GLOBAL_LOGGER as logger
+
+
+class BatchQARunner:
+    """Reads question records, answers them per user in bounded chunks and writes one result per record."""
+
+    def __init__(self, default_user: Optional[str] = None, max_concurrency: Optional[int] = None,
+                 chunk_size: int = 256, embeddings=None, llm=None):
+        self.default_user = default_user
+        self.max_concurrency = max_concurrency
+        self.chunk_size = max(1, chunk_size)
+        self.embeddings = embeddings
+        self.llm = llm
+        self._rags: Dict[str, ConversationalRAG] = {}
+
+    def _rag(self, user_name: str) -> ConversationalRAG:
+        if user_name not in self._rags:
+            if self.embeddings is None or self.llm is None:
+                loader = ModelLoader.get_instance()
+                self.embeddings = self.embeddings or loader.load_embeddings()
+                self.llm = self.llm or loader.load_llm()
+            self._rags[user_name] = ConversationalRAG(user_name, embeddings=self.embeddings, llm=self.llm)
+        return self._rags[user_name]
+
+    @staticmethod
+    def _history(raw) -> List[BaseMessage]:
+        messages = []
+        for message in raw or []:
+            role, content = message.get("role"), message.get("content", "")
+            messages.append(HumanMessage(content) if role in ("human", "user") else AIMessage(content))
+        return messages
+
+    def _parse(self, line_no: int, line: str) -> Dict[str, Any]:
+        """Normalised record; a malformed line becomes a record that already carries its error."""
+        try:
+            raw = json.loads(line)
+            question = raw.get("question") or raw.get("body")
+            user_name = raw.get("user_name") or self.default_user
+            if not question:
+                raise ValueError("missing 'question'")
+            if not user_name:
+                raise ValueError("missing 'user_name' and no --user-name default")
+            return {"request_id": raw.get("request_id", line_no), "user_name": user_name,
+                    "question": question, "chat_history": self._history(raw.get("chat_history"))}
+        except Exception as e:
+            return {"request_id": line_no, "user_name": None, "question": None,
+                    "error": f"invalid input line {line_no}: {e}"}
+
+    def run(self, records: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Answer parsed records; returns output rows in the same order."""
+        rows: List[Optional[Dict[str, Any]]] = [None] * len(records)
+        by_user: Dict[str, List[int]] = {}
+        for i, record in enumerate(records):
+            if record.get("error"):
+                rows[i] = {**record, "answer": None, "sources": [], "cached": False}
+            else:
+                by_user.setdefault(record["user_name"], []).append(i)
+
+        for user_name, indices in by_user.items():
+            try:
+                rag = self._rag(user_name)
+            except Exception as e:
+                error = f"user '{user_name}' unavailable: {getattr(e, 'error_message', e)}"
+                for i in indices:
+                    rows[i] = self._row(records[i], error=error)
+                continue
+            for start in range(0, len(indices), self.chunk_size):
+                chunk = indices[start:start + self.chunk_size]
+                items = [(records[i]["question"], records[i]["chat_history"]) for i in chunk]
+                try:
+                    results = rag.batch(items, max_concurrency=self.max_concurrency)
+                except Exception as e:
+                    for i in chunk:
+                        rows[i] = self._row(records[i], error=getattr(e, "error_message", str(e)))
+                    continue
+                for i, result in zip(chunk, results):
+                    rows[i] = self._row(records[i], **{k: v for k, v in asdict(result).items() if k != "question"})
+        return rows
+
+    @staticmethod
+    def _row(record: Dict[str, Any], answer=None, sources=None, cached=False, error=None) -> Dict[str, Any]:
+        return {"request_id": record["request_id"], "user_name": record["user_name"],
+                "question": record["question"], "answer": answer, "sources": sources or [],
+                "cached": cached, "error": error}
+
+    def run_file(self, input_path: str, output_path: str) -> Dict[str, int]:
+        try:
+            with open(input_path, "r", encoding="utf-8") as f:
+                records = [self._parse(n, line) for n, line in enumerate(f, start=1) if line.strip()]
+            rows = self.run(records)
+            with open(output_path, "w", encoding="utf-8") as f:
+                for row in rows:
+                    f.write(json.dumps(row, ensure_ascii=False, default=str) + "\n")
+            summary = {"records": len(rows), "failed": sum(1 for r in rows if r["error"])}
+            logger.info("Batch QA complete", input=input_path, output=output_path, **summary)
+            return summary
+        except Exception as e:
+            logger.error("Batch QA failed", input=input_path, error=str(e))
+            raise ProjectCustomException(f"Batch QA over '{input_path}' failed", sys)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Answer a JSONL file of questions with ConversationalRAG")
+    parser.add_argument("--input", required=True, help="JSONL file, one question record per line")
+    parser.add_argument("--output", required=True, help="JSONL file to write one result per input line")
+    parser.add_argument("--user-name", help="collection to query when a record has no user_name")
+    parser.add_argument("--max-concurrency", type=int, help="defaults to rag.batch_max_concurrency")
+    parser.add_argument("--chunk-size", type=int, default=256, help="records answered per batch() call")
+    args = parser.parse_args()
+
+    runner = BatchQARunner(args.user_name, max_concurrency=args.max_concurrency, chunk_size=args.chunk_size)
+    print(json.dumps(runner.run_file(args.input, args.output)))
@@ -0,0 +1,119 @@
+"""
+Apply a `qdrant.profiles` layout from config.yaml to existing Qdrant collections in place, or
+copy per-user collections into the shared multi-tenant collection (qdrant.tenancy: shared).
+
+    python -m src.collection_migration                       # every collection, configured profile
+    python -m src.collection_migration Arindam --profile binary
+    python -m src.collection_migration --to-shared           # every per-user collection -> qdrant.shared_collection
+    python -m src.collection_migration Arindam Testing --to-shared --delete-source
+    python -m src.collection_migration --to-shared --exclude-prefix bench_   # skip benchmark leftovers
+"""
+import sys
+import json
+import argparse
+from typing import Dict, List, Optional, Sequence
+
+from qdrant_client.http.models import PointStruct
+
+from utils.qdrant_vector_db import QdrantVDB
+from exception.custom_exception import ProjectCustomException
+from logger import GLOBAL_LOGGER as logger
+
+
+def migrate_collections(collection_names: Optional[List[str]] = None, profile: Optional[str] = None) -> List[Dict]:
+    """Migrate the named collections (default: all of them); one failure does not stop the rest."""
+    vdb = QdrantVDB(profile=profile)
+    names = collection_names or [c.name for c in vdb.get_client().get_collections().collections]
+    results = []
+    for name in names:
+        try:
+            results.append(vdb.migrate_collection(name))
+        except Exception as e:
+            logger.error("Collection migration failed", collection=name, error=str(e))
+            results.append({"collection": name, "profile": vdb.profile_name, "error": str(e)})
+    return results
+
+
+def _copy_user(vdb: QdrantVDB, user_name: str, batch_size: int) -> int:
+    """
+    Copy every point of user_name's collection into the shared one, tagged with the tenant field.
+    The shared collection has one unnamed dense vector, so sources with named or sparse vectors
+    are rejected rather than copied lossily.
+    """
+    client = vdb.get_client()
+    params = client.get_collection(user_name).config.params
+    if isinstance(params.vectors, dict):
+        raise ValueError(f"Collection '{user_name}' has named vectors {sorted(params.vectors)}; "
+                         "only collections with a single unnamed dense vector can be moved")
+    if params.sparse_vectors:
+        raise ValueError(f"Collection '{user_name}' has sparse vectors {sorted(params.sparse_vectors)}; "
+                         "they have no place in the shared collection")
+    copied, offset = 0, None
+    while True:
+        points, offset = client.scroll(user_name, limit=batch_size, offset=offset, with_payload=True, with_vectors=True)
+        if points:
+            if copied == 0:
+                vdb.ensure_collection(vdb.shared_collection, params.vectors.size)
+            # Point IDs are uuid5(user|source|chunk) or uuid4, so they stay unique across tenants
+            client.upsert(vdb.shared_collection, wait=True, points=[
+                PointStruct(id=p.id, vector=p.vector, payload={**(p.payload or {}), vdb.tenant_field: user_name})
+                for p in points
+            ])
+            copied += len(points)
+        if offset is None:
+            return copied
+
+
+def migrate_to_shared(user_names: Optional[List[str]] = None, delete_source: bool = False,
+                      batch_size: int = 256, exclude_prefixes: Sequence[str] = ()) -> List[Dict]:
+    """
+    Copy per-user collections (default: every collection except the shared one and those starting
+    with one of exclude_prefixes) into qdrant.shared_collection. Copying is idempotent, so a failed
+    run can be repeated; a source collection is only deleted once the shared collection holds all
+    of its points.
+    """
+    vdb = QdrantVDB()
+    client = vdb.get_client()
+    names = user_names or [c.name for c in client.get_collections().collections
+                           if c.name != vdb.shared_collection and not c.name.startswith(tuple(exclude_prefixes))]
+    results = []
+    for name in names:
+        try:
+            source_points = client.count(name, exact=True).count
+            copied = _copy_user(vdb, name, batch_size)
+            shared_points = client.count(vdb.shared_collection, count_filter=vdb.tenant_condition(name),
+                                         exact=True).count if copied else 0
+            verified = shared_points >= source_points
+            if delete_source and verified:
+                client.delete_collection(name)
+            logger.info("Collection moved to shared tenancy", collection=name, points=copied,
+                        verified=verified, source_deleted=delete_source and verified)
+            results.append({"collection": name, "shared_collection": vdb.shared_collection, "points": copied,
+                            "verified": verified, "source_deleted": delete_source and verified})
+        except Exception as e:
+            logger.error("Move to shared collection failed", collection=name, error=str(e))
+            results.append({"collection": name, "shared_collection": vdb.shared_collection, "error": str(e)})
+    return results
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Migrate Qdrant collections to a configured layout profile")
+    parser.add_argument("collections", nargs="*", help="collection names (default: all)")
+    parser.add_argument("--profile", help="qdrant.profiles entry (default: qdrant.profile)")
+    parser.add_argument("--to-shared", action="store_true",
+                        help="copy per-user collections into qdrant.shared_collection instead")
+    parser.add_argument("--delete-source", action="store_true",
+                        help="with --to-shared: drop each per-user collection once its copy is verified")
+    parser.add_argument("--exclude-prefix", action="append", default=[],
+                        help="with --to-shared and no collection names: skip collections starting with this "
+                             "prefix (repeatable), e.g. bench_ for kept benchmark collections")
+    args = parser.parse_args()
+    try:
+        if args.to_shared:
+            outcome = migrate_to_shared(args.collections, delete_source=args.delete_source,
+                                        exclude_prefixes=args.exclude_prefix)
+        else:
+            outcome = migrate_collections(args.collections, args.profile)
+    except Exception as e:
+        raise ProjectCustomException("Collection migration failed", sys)
+    print(json.dumps(outcome, indent=2))
@@ -1,112 +1,479 @@
-from pathlib import Path
-from typing import Optional, Iterable, List, Any, Dict
+import io
+import os
+import uuid
+import threading
+from pathlib import Path, PurePosixPath
+from dataclasses import dataclass, field
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import deque
+from itertools import tee, islice
+from typing import Optional, Iterable, Iterator, List, Any, Dict, Tuple
 from logger import GLOBAL_LOGGER as logger
+from logger.custom_logger import HELPER_PROCESS_ENV
 from langchain_core.documents import Document
 from langchain_text_splitters import RecursiveCharacterTextSplitter
 from utils.model_loader import ModelLoader
 from utils.qdrant_vector_db import QdrantVDB
 from utils.s3_operations import S3ReadUpload
-from utils.config_loader import load_config
+from utils.config_loader import get_settings
+from utils.embedding_pipeline import EmbeddingUpsertPipeline
+from utils.answer_cache import SemanticAnswerCache
+from utils.bm25_index import BM25Index
+from utils.metrics import trace_request, stage_timer, timed_iter, record_size
+from utils.ingestion_manifest import IngestionManifest, file_content_hash, bytes_content_hash, chunk_hash, chunk_point_id
 
 SUPPORTED_FILE_TYPES = [".txt", ".pdf", ".docx", ".md", ".pptx"]
 
+# One parse pool per process: each spawned worker re-imports this module (seconds), so it is reused
+_parse_pool: Optional[ProcessPoolExecutor] = None
+_parse_pool_lock = threading.Lock()
+
+
+@dataclass
+class IngestionResult:
+    """Summary of one ingest_files call: what went in and what failed (per file)."""
+    ingested_files: List[str] = field(default_factory=list)
+    failed_files: Dict[str, str] = field(default_factory=dict)
+    skipped_files: List[str] = field(default_factory=list)
+    num_chunks: int = 0
+    num_deleted_chunks: int = 0
+
+
+def _parse_file(file_path: Path, data: Optional[bytes] = None) -> Tuple[Path, Optional[List[Document]], Optional[str]]:
+    """
+    Process-pool worker: parse a single file (or its in-memory bytes) and return
+    (file_path, page_documents, error). Never raises, so one corrupt file cannot abort the batch.
+    """
+    try:
+        return file_path, list(DataIngestion._read_file_documents(file_path, data)), None
+    except Exception as e:
+        return file_path, None, f"{type(e).__name__}: {e}"
+
+
+def _get_parse_pool(max_workers: int) -> ProcessPoolExecutor:
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is None:
+            # spawn, not fork: S3 upload and embedding threads may be running in this process.
+            # Workers inherit the environment, so they log to stderr rather than opening log files
+            os.environ[HELPER_PROCESS_ENV] = "1"
+            _parse_pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return _parse_pool
+
+
+def _reset_parse_pool(broken: ProcessPoolExecutor) -> None:
+    """Drop a pool whose worker died so the next batch starts a fresh one."""
+    global _parse_pool
+    with _parse_pool_lock:
+        if _parse_pool is broken:
+            _parse_pool = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+
 class DataIngestion:
 
-    def __init__(self):
-        ### Load Embedding and LLM models:
-        model_load = ModelLoader()
-        self.embeddings = model_load.load_embeddings()
-        
+    def __init__(self, embeddings=None, vector_db=None, s3_ops=None):
+        ### Load Embedding and LLM models (callers such as benchmarks can pass their own):
+        if embeddings is None:
+            embeddings = ModelLoader.get_instance().load_embeddings()
+        self.embeddings = embeddings
+
         ### Initialize Qdrant Vector DB
-        self.vector_db = QdrantVDB()
+        self.vector_db = vector_db or QdrantVDB()
 
         ### Initialize S3 Operations
-        self.s3_ops = S3ReadUpload()
+        self.s3_ops = s3_ops or S3ReadUpload()
 
         ### Load S3 configuration
-        config = load_config("config.yaml")
-        s3_config = config.get('AWS-S3', {})
-        self.bucket_name = s3_config.get('bucket_name')
-        self.object_prefix = s3_config.get('preindex_folder_name')
+        settings = get_settings()
+        self.bucket_name = settings.s3.bucket_name
+        # Files ingested here are already indexed, so their raw copies go straight to post-index;
+        # pre-index is the ingestion worker's inbox and anything left there would be ingested again
+        self.object_prefix = settings.s3.postindex_folder_name
 
-    def ingest_files(self, file_paths: List[Path], user_name: str) -> None:
-        documents = []
-        for file_path in file_paths:
-            if file_path.suffix.lower() in SUPPORTED_FILE_TYPES:
-                content = self._read_file_content(file_path)
-                doc = Document(page_content=content, metadata={"source": str(file_path)})
-                documents.append(doc)
-                object_name = f"{self.object_prefix}/{user_name}/{file_path.name}"
-                self.s3_ops.upload_file_to_s3(file_name=str(file_path), bucket_name=self.bucket_name, object_name=object_name)
-                logger.info(f"File uploaded to S3: {object_name}")
-            else:
+        ### Load ingestion configuration
+        ingestion_config = settings.ingestion
+        self.parallel = ingestion_config.parallel
+        self.max_workers = ingestion_config.max_workers
+        self.parallel_min_bytes = int(ingestion_config.parallel_min_mb * 1024 * 1024)
+        self.chunk_size = ingestion_config.chunk_size
+        self.chunk_overlap = ingestion_config.chunk_overlap
+        self.incremental = ingestion_config.incremental
+        self.manifest = None
+        if self.incremental:
+            self.manifest = IngestionManifest(ingestion_config.manifest_path)
+
+        ### Cached answers are invalidated whenever a user's collection changes
+        self.answer_cache_version_dir = settings.rag.answer_cache.version_dir
+
+        ### Keyword (BM25) index for hybrid retrieval
+        self.sparse_index = None
+        if settings.retrieval.hybrid:
+            self.sparse_index = BM25Index(settings.retrieval.bm25_path)
+
+        ### Streaming embed + upsert stage
+        pipeline_config = settings.embedding_pipeline
+        self.pipeline = None
+        if pipeline_config.enabled:
+            self.pipeline = EmbeddingUpsertPipeline(
+                embedding=self.embeddings,
+                vector_db=self.vector_db,
+                batch_size=pipeline_config.batch_size,
+                max_concurrency=pipeline_config.max_concurrency,
+                requests_per_minute=pipeline_config.requests_per_minute,
+                max_retries=pipeline_config.max_retries,
+                retry_backoff_seconds=pipeline_config.retry_backoff_seconds,
+            )
+
+    def ingest_files(self, file_paths: List[Path], user_name: str) -> IngestionResult:
+        # One "Request trace" log event per call, with parse/split/embed/upsert/... stage times
+        with trace_request("ingest", user_name=user_name, num_files=len(file_paths)):
+            return self._ingest_files(file_paths, user_name)
+
+    def ingest_objects(self, objects: List[Tuple[str, bytes]], user_name: str) -> IngestionResult:
+        """
+        Ingest files that are already in memory, e.g. streamed from S3, as (object_key, content) pairs.
+        Nothing is written to local disk or uploaded. The chunks' source is the object key as a
+        normalized path ("a//b.pdf" -> "a/b.pdf"); the returned result reports the keys as given.
+        """
+        with trace_request("ingest", user_name=user_name, num_files=len(objects), origin="memory"):
+            result = IngestionResult()
+            # Everything downstream is keyed by str(path), so contents must be too
+            keys, contents, collisions = {}, {}, {}
+            for key, data in objects:
+                source = str(PurePosixPath(key))
+                if source in keys:
+                    collisions[key] = f"Object key names the same file as '{keys[source]}'"
+                    continue
+                keys[source] = key
+                contents[source] = data
+
+            to_parse, content_hashes = self._select(
+                [PurePosixPath(source) for source in contents], user_name, result,
+                lambda path: bytes_content_hash(contents[str(path)]),
+            )
+            record_size("input_bytes", sum(len(contents[str(p)]) for p in to_parse))
+            manifest_updates = self._index(to_parse, user_name, content_hashes, result, contents)
+            result = self._finish(user_name, result, manifest_updates)
+
+            result.ingested_files = [keys.get(source, source) for source in result.ingested_files]
+            result.skipped_files = [keys.get(source, source) for source in result.skipped_files]
+            result.failed_files = {keys.get(source, source): error for source, error in result.failed_files.items()}
+            result.failed_files.update(collisions)
+            return result
+
+    def _ingest_files(self, file_paths: List[Path], user_name: str) -> IngestionResult:
+        result = IngestionResult()
+        to_parse, content_hashes = self._select(file_paths, user_name, result, file_content_hash)
+        record_size("input_bytes", sum(p.stat().st_size for p in to_parse if p.exists()))
+        if self._use_parse_pool(to_parse, {}):
+            # Start the pool before the upload threads below, not while they run
+            _get_parse_pool(self.max_workers)
+
+        # Raw files go to S3 in the background while they are parsed and embedded
+        uploads = {
+            str(file_path): self.s3_ops.submit_upload(
+                str(file_path), self.bucket_name, f"{self.object_prefix}/{user_name}/{file_path.name}"
+            )
+            for file_path in to_parse
+        }
+
+        manifest_updates = self._index(to_parse, user_name, content_hashes, result)
+
+        failed_uploads = set()
+        with stage_timer("s3_wait"):
+            for source, future in uploads.items():
+                try:
+                    future.result()
+                except Exception as e:
+                    message = getattr(e, "error_message", str(e))
+                    logger.error("Failed to upload file to S3", file=source, error=message)
+                    result.failed_files.setdefault(source, f"S3 upload failed: {message}")
+                    failed_uploads.add(source)
+        result.ingested_files = [f for f in result.ingested_files if f not in failed_uploads]
+        return self._finish(user_name, result, manifest_updates, failed_uploads)
+
+    def _select(self, file_paths, user_name: str, result: IngestionResult, content_hash_fn
+                ) -> Tuple[List[Any], Dict[str, str]]:
+        """Drop unsupported and (in incremental mode) unchanged files; returns (to_parse, content_hashes)."""
+        to_parse = []
+        content_hashes = {}
+        for file_path in timed_iter(file_paths, "manifest_check"):
+            if file_path.suffix.lower() not in SUPPORTED_FILE_TYPES:
                 print(f"Unsupported file type: {file_path.suffix} for file {file_path}")
+                result.failed_files[str(file_path)] = f"Unsupported file type: {file_path.suffix}"
+                continue
+            if self.incremental:
+                # Unchanged files are skipped before any parsing, upload or embedding
+                try:
+                    digest = content_hash_fn(file_path)
+                except OSError as e:
+                    result.failed_files[str(file_path)] = f"{type(e).__name__}: {e}"
+                    continue
+                if self.manifest.is_unchanged(user_name, str(file_path), digest):
+                    result.skipped_files.append(str(file_path))
+                    continue
+                content_hashes[str(file_path)] = digest
+            to_parse.append(file_path)
+        return to_parse, content_hashes
+
+    def _index(self, to_parse: List[Any], user_name: str, content_hashes: Dict[str, str],
+               result: IngestionResult, contents: Optional[Dict[str, bytes]] = None) -> List[Tuple]:
+        """Chunk, embed and upsert to_parse, then delete stale chunks; returns the pending manifest updates."""
+        stale_ids = []
+        manifest_updates = []
+        collection_name = self.vector_db.collection_for(user_name)
+        tenant_id = self.vector_db.tenant_id(user_name)
+        chunks = self._iter_chunks(to_parse, user_name, content_hashes, result, stale_ids, manifest_updates, contents)
+        if self.sparse_index is not None:
+            chunks = self._index_sparse(chunks, user_name)
 
+        if self.pipeline is not None:
+            # Chunks flow lazily from the splitter through batched embedding into Qdrant
+            docs_iter, ids_iter = tee(chunks)
+            result.num_chunks = self.pipeline.run(
+                collection_name=collection_name,
+                documents=(doc for doc, _ in docs_iter),
+                ids=(point_id for _, point_id in ids_iter),
+                tenant_id=tenant_id,
+            )
+        else:
+            split_docs, point_ids = [], []
+            for doc, point_id in chunks:
+                split_docs.append(doc)
+                point_ids.append(point_id)
+            if split_docs:
+                self.vector_db.create_vector_store(
+                    embedding=self.embeddings,
+                    collection_name=collection_name,
+                    documents=split_docs,
+                    ids=point_ids,
+                    tenant_id=tenant_id,
+                )
+            result.num_chunks = len(split_docs)
+
+        if stale_ids:
+            with stage_timer("delete_stale"):
+                self.vector_db.delete_points(self.embeddings, collection_name=collection_name, ids=stale_ids,
+                                             tenant_id=tenant_id)
+                if self.sparse_index is not None:
+                    self.sparse_index.delete(user_name, stale_ids)
+            logger.info("Deleted stale chunks", collection=collection_name, user_name=user_name,
+                        num_points=len(stale_ids))
+        result.num_deleted_chunks = len(stale_ids)
+        return manifest_updates
+
+    def _finish(self, user_name: str, result: IngestionResult, manifest_updates: List[Tuple],
+                failed_sources=frozenset()) -> IngestionResult:
+        # Only record files in the manifest once their points are committed (and the raw file is in S3)
+        with stage_timer("manifest_update"):
+            for source, content_hash, chunk_hashes in manifest_updates:
+                if source not in failed_sources:
+                    self.manifest.update(user_name, source, content_hash, chunk_hashes)
+
+        record_size("chunks", result.num_chunks)
+        record_size("deleted_chunks", result.num_deleted_chunks)
+        if result.num_chunks or result.num_deleted_chunks:
+            SemanticAnswerCache.bump_version(user_name, self.answer_cache_version_dir)
+        print(f"Ingested {result.num_chunks} documents into collection "
+              f"'{self.vector_db.collection_for(user_name)}' for user '{user_name}'.")
+        if result.skipped_files:
+            logger.info("Skipped unchanged files", num_files=len(result.skipped_files))
+        if result.failed_files:
+            logger.warning("Some files were not ingested", failed_files=result.failed_files)
+        return result
+
+    def _iter_chunks(self, file_paths: List[Path], user_name: str, content_hashes: Dict[str, str],
+                     result: IngestionResult, stale_ids: List[str], manifest_updates: List[Tuple],
+                     contents: Optional[Dict[str, bytes]] = None) -> Iterator[Tuple[Document, Optional[str]]]:
+        """
+        Split page/slide documents as they are extracted, yielding (chunk, point_id).
+        point_id is deterministic in incremental mode and a random UUID otherwise.
+        Per-file bookkeeping is recorded into result, stale_ids and manifest_updates.
+        """
         text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=1000,
-            chunk_overlap=200,
+            chunk_size=self.chunk_size,
+            chunk_overlap=self.chunk_overlap,
             separators=["\n\n", "\n", " ", ""]
         )
-        split_docs = text_splitter.split_documents(documents)
 
-        self.vector_db.create_vector_store(
-            embedding=self.embeddings,
-            collection_name=user_name,
-            documents=split_docs
-        )
-        print(f"Ingested {len(split_docs)} documents into collection '{user_name}'.")
-
-    def _read_file_content(self, file_path: Path) -> str:
-        if file_path.suffix.lower() == ".txt":
-            content = self._read_txt(file_path)
-        elif file_path.suffix.lower() == ".pdf":
-            content = self._read_pdf(file_path)
-        elif file_path.suffix.lower() == ".docx":
-            content = self._read_docx(file_path)
-        elif file_path.suffix.lower() == ".md":
-            content = self._read_md(file_path)
-        elif file_path.suffix.lower() == ".pptx":
-            content = self._read_pptx(file_path)
+        # Files arrive in input order; their pages are split (and yielded) one at a time
+        for file_path, pages, error in timed_iter(self._parse_files(file_paths, contents), "parse"):
+            source = str(file_path)
+            if error is None:
+                old_hashes = set()
+                if self.incremental:
+                    entry = self.manifest.get(user_name, source)
+                    old_hashes = set(entry["chunk_hashes"]) if entry else set()
+                seen = set()
+                chunk_hashes = []
+                try:
+                    for page in timed_iter(pages, "parse"):
+                        with stage_timer("split"):
+                            page_chunks = text_splitter.split_documents([page])
+                        for chunk in page_chunks:
+                            if not self.incremental:
+                                yield chunk, str(uuid.uuid4())
+                                continue
+                            digest = chunk_hash(chunk.page_content)
+                            if digest in seen:
+                                continue
+                            seen.add(digest)
+                            chunk_hashes.append(digest)
+                            if digest not in old_hashes:
+                                chunk.metadata["chunk_hash"] = digest
+                                yield chunk, chunk_point_id(user_name, source, digest)
+                except Exception as e:
+                    # Lazy extractors surface parse errors while pages are being read
+                    error = f"{type(e).__name__}: {e}"
+            if error is not None:
+                logger.error("Failed to parse file", file=source, error=error)
+                result.failed_files[source] = error
+                continue
+
+            if self.incremental:
+                stale_ids.extend(chunk_point_id(user_name, source, h) for h in old_hashes - seen)
+                manifest_updates.append((source, content_hashes[source], chunk_hashes))
+            result.ingested_files.append(source)
+
+    def _index_sparse(self, chunks: Iterator[Tuple[Document, str]], user_name: str,
+                      batch_size: int = 256) -> Iterator[Tuple[Document, str]]:
+        """Pass chunks through unchanged while adding them to the BM25 index in batches."""
+        while True:
+            batch = list(islice(chunks, batch_size))
+            if not batch:
+                return
+            with stage_timer("bm25_index"):
+                self.sparse_index.add(user_name, ((point_id, doc.page_content) for doc, point_id in batch))
+            yield from batch
+
+    def _parse_files(self, file_paths: List[Path], contents: Optional[Dict[str, bytes]] = None
+                     ) -> Iterator[Tuple[Path, Optional[Iterable[Document]], Optional[str]]]:
+        """
+        Yield (file_path, page_documents, error) in the same order as file_paths.
+        When contents (str(file_path) -> bytes) is given, files are parsed from memory instead of disk.
+        Sequentially, page_documents is a lazy generator, so only one page is in memory at a time.
+        In parallel mode files are parsed in a process pool and their pages come back as a list;
+        at most 2 x max_workers files are in flight so results stream out without buffering the batch.
+        """
+        contents = contents or {}
+        if not self._use_parse_pool(file_paths, contents):
+            for file_path in file_paths:
+                yield file_path, DataIngestion._read_file_documents(file_path, contents.get(str(file_path))), None
+            return
+
+        logger.info("Parsing files in parallel", num_files=len(file_paths), max_workers=self.max_workers)
+        executor = _get_parse_pool(self.max_workers)
+        pending = deque()
+        paths = iter(file_paths)
+        broken = False
+
+        def submit(path):
+            nonlocal broken
+            if broken:
+                return None
+            try:
+                return executor.submit(_parse_file, path, contents.get(str(path)))
+            except BrokenProcessPool:
+                broken = True
+                return None
+
+        for file_path in paths:
+            pending.append((file_path, submit(file_path)))
+            if len(pending) >= 2 * self.max_workers:
+                break
+        while pending:
+            file_path, future = pending.popleft()
+            try:
+                if future is None:
+                    raise BrokenProcessPool("parse pool is no longer usable")
+                yield future.result()
+            except Exception as e:
+                # Worker process died (e.g. crashed inside a native parser)
+                broken = broken or isinstance(e, BrokenProcessPool)
+                yield file_path, None, f"{type(e).__name__}: {e}"
+            next_path = next(paths, None)
+            if next_path is not None:
+                pending.append((next_path, submit(next_path)))
+        if broken:
+            _reset_parse_pool(executor)
+
+    def _use_parse_pool(self, file_paths: List[Any], contents: Dict[str, bytes]) -> bool:
+        """Parse in the process pool only when the batch is big enough to outweigh its IPC cost."""
+        if not self.parallel or self.max_workers <= 1 or len(file_paths) <= 1:
+            return False
+        total_bytes = 0
+        for file_path in file_paths:
+            data = contents.get(str(file_path))
+            if data is not None:
+                total_bytes += len(data)
+            elif Path(file_path).exists():
+                total_bytes += Path(file_path).stat().st_size
+        return total_bytes >= self.parallel_min_bytes
+
+    @staticmethod
+    def _read_file_documents(file_path: Path, data: Optional[bytes] = None) -> Iterator[Document]:
+        """
+        Yield page/slide-level Documents for PDF/PPTX and a single Document for other types.
+        With data, the file's bytes are parsed from memory and file_path only names the source.
+        """
+        source = str(file_path)
+        suffix = file_path.suffix.lower()
+        if suffix == ".pdf":
+            yield from DataIngestion._read_pdf(file_path, data)
+        elif suffix == ".pptx":
+            yield from DataIngestion._read_pptx(file_path, data)
+        elif suffix == ".txt":
+            yield Document(page_content=DataIngestion._read_txt(file_path, data), metadata={"source": source})
+        elif suffix == ".docx":
+            yield Document(page_content=DataIngestion._read_docx(file_path, data), metadata={"source": source})
+        elif suffix == ".md":
+            yield Document(page_content=DataIngestion._read_md(file_path, data), metadata={"source": source})
         else:
             raise ValueError(f"Unsupported file type: {file_path.suffix}")
-        return content
     
-    def _read_txt(self, file_path: Path) -> str:
+    @staticmethod
+    def _read_txt(file_path: Path, data: Optional[bytes] = None) -> str:
+        if data is not None:
+            return data.decode("utf-8")
         with open(file_path, "r", encoding="utf-8") as f:
             logger.info(f"File read (txt): {file_path}")
             return f.read()
 
-    def _read_pdf(self, file_path: Path) -> str:
+    @staticmethod
+    def _read_pdf(file_path: Path, data: Optional[bytes] = None) -> Iterator[Document]:
         import fitz  # PyMuPDF
-        text_chunks = []
-        with fitz.open(file_path) as doc:
+        with (fitz.open(stream=data, filetype="pdf") if data is not None else fitz.open(file_path)) as doc:
             for page_num in range(doc.page_count):
                 page = doc.load_page(page_num)
-                text_chunks.append(f"\n--- Page {page_num + 1} ---\n{page.get_text()}")
-        
-        return "\n".join(text_chunks)
+                yield Document(page_content=page.get_text(), metadata={"source": str(file_path), "page": page_num + 1})
+        logger.info(f"File read (pdf): {file_path}")
     
-    def _read_docx(self, file_path: Path) -> str:
+    @staticmethod
+    def _read_docx(file_path: Path, data: Optional[bytes] = None) -> str:
         import docx2txt as docx
-        text = docx.process(file_path)
+        text = docx.process(io.BytesIO(data) if data is not None else file_path)
         logger.info(f"File read (docx): {file_path}")
         return text
     
-    def _read_md(self, file_path: Path) -> str:
+    @staticmethod
+    def _read_md(file_path: Path, data: Optional[bytes] = None) -> str:
+        if data is not None:
+            return data.decode("utf-8")
         with open(file_path, "r", encoding="utf-8") as f:
             logger.info(f"File read (md): {file_path}")
             return f.read()
         
-    def _read_pptx(self, file_path: Path) -> str:
+    @staticmethod
+    def _read_pptx(file_path: Path, data: Optional[bytes] = None) -> Iterator[Document]:
         from pptx import Presentation
-        prs = Presentation(file_path)
-        full_text = []
-        for slide in prs.slides:
-            for shape in slide.shapes:
-                if hasattr(shape, "text"):
-                    full_text.append(shape.text)
+        prs = Presentation(io.BytesIO(data) if data is not None else file_path)
+        for slide_num, slide in enumerate(prs.slides, start=1):
+            slide_text = [shape.text for shape in slide.shapes if hasattr(shape, "text")]
+            yield Document(page_content="\n".join(slide_text), metadata={"source": str(file_path), "slide": slide_num})
         logger.info(f"File read (pptx): {file_path}")
-        return "\n".join(full_text)
 
 if __name__ == "__main__":
     data_ingestion = DataIngestion()
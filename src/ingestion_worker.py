@@ -0,0 +1,183 @@
+"""
+Long-running S3 ingestion worker.
+
+Objects uploaded under <preindex_folder_name>/<user>/ are read into memory (no temp files),
+ingested into the user's collection and, once their points are committed to Qdrant, moved to
+<postindex_folder_name>/<user>/. Progress is checkpointed per object, so a restarted worker
+only retries what had not finished. Files ingested directly (DataIngestion.ingest_files, the API's
+/ingest) are uploaded straight to post-index, so the worker never ingests them a second time.
+
+    python -m src.ingestion_worker            # poll forever
+    python -m src.ingestion_worker --once     # drain pre-index once and exit
+"""
+import sys
+import json
+import signal
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from src.data_ingestion import DataIngestion
+from utils.config_loader import get_settings
+from utils.ingestion_checkpoint import IngestionCheckpoint, INDEXED, MOVED, FAILED
+from utils.metrics import stage_timer, trace_request
+from exception.custom_exception import ProjectCustomException
+from logger import GLOBAL_LOGGER as logger
+
+
+class S3IngestionWorker:
+    """
+    Polls pre-index for new objects and ingests them in batches on a thread pool, one batch of up
+    to batch_size objects of a single user per task. Objects whose ETag is already checkpointed as
+    indexed are only moved; objects that failed max_attempts times are left in pre-index.
+    """
+
+    def __init__(self, ingestion: Optional[DataIngestion] = None, s3_ops=None,
+                 checkpoint: Optional[IngestionCheckpoint] = None, users: Optional[List[str]] = None):
+        try:
+            settings = get_settings()
+            worker_config = settings.ingestion_worker
+            self.ingestion = ingestion or DataIngestion(s3_ops=s3_ops)
+            self.s3_ops = s3_ops or self.ingestion.s3_ops
+            self.checkpoint = checkpoint or IngestionCheckpoint(worker_config.checkpoint_path)
+
+            self.bucket_name = settings.s3.bucket_name
+            self.preindex_prefix = settings.s3.preindex_folder_name
+            self.postindex_prefix = settings.s3.postindex_folder_name
+            self.users = users or worker_config.users
+            self.poll_interval_seconds = worker_config.poll_interval_seconds
+            self.max_workers = max(1, worker_config.max_workers)
+            self.batch_size = max(1, worker_config.batch_size)
+            self.max_attempts = worker_config.max_attempts
+            self._stop = threading.Event()
+        except Exception as e:
+            logger.error("Failed to initialize S3IngestionWorker", error=str(e))
+            raise ProjectCustomException("Initialization error in S3IngestionWorker", sys)
+
+    def _user_names(self) -> List[str]:
+        if self.users:
+            return list(self.users)
+        prefixes = self.s3_ops.list_prefixes(self.bucket_name, f"{self.preindex_prefix}/")
+        return [p[len(self.preindex_prefix) + 1:].rstrip("/") for p in prefixes]
+
+    def _post_key(self, key: str) -> str:
+        return f"{self.postindex_prefix}/{key[len(self.preindex_prefix) + 1:]}"
+
+    def _plan(self, user_name: str) -> Tuple[List[Dict], List[Dict], int]:
+        """Split the user's pre-index objects into (to_ingest, to_move, given_up) using the checkpoint."""
+        to_ingest, to_move, given_up = [], [], 0
+        for obj in self.s3_ops.list_objects(self.bucket_name, f"{self.preindex_prefix}/{user_name}/"):
+            if obj["key"].endswith("/"):  # folder placeholder objects
+                continue
+            state = self.checkpoint.get(obj["key"])
+            if state is None or state["etag"] != obj["etag"]:
+                to_ingest.append(obj)
+            elif state["status"] in (INDEXED, MOVED):
+                to_move.append(obj)  # points are committed; only the move to post-index is left
+            elif state["attempts"] >= self.max_attempts:
+                given_up += 1
+            else:
+                to_ingest.append(obj)
+        return to_ingest, to_move, given_up
+
+    def _move(self, user_name: str, obj: Dict) -> bool:
+        try:
+            self.s3_ops.move_object(self.bucket_name, obj["key"], self._post_key(obj["key"]))
+            self.checkpoint.mark(obj["key"], obj["etag"], user_name, MOVED)
+            return True
+        except Exception as e:
+            # Stays "indexed": the next pass retries only the move
+            logger.error("Failed to move object to post-index", object_name=obj["key"],
+                         error=getattr(e, "error_message", str(e)))
+            return False
+
+    def _fail(self, user_name: str, objects: List[Dict], error: str) -> None:
+        for obj in objects:
+            self.checkpoint.mark(obj["key"], obj["etag"], user_name, FAILED, error=error)
+        logger.error("Objects not ingested", user_name=user_name, num_objects=len(objects), error=error)
+
+    def _process_batch(self, user_name: str, objects: List[Dict]) -> Dict[str, int]:
+        """Download, ingest, checkpoint and move one batch; returns per-outcome counts."""
+        counts = {"ingested": 0, "failed": 0, "moved": 0}
+        with trace_request("ingest_worker", user_name=user_name, num_objects=len(objects)):
+            with stage_timer("s3_download"):
+                contents = self.s3_ops.download_files_batch([o["key"] for o in objects], self.bucket_name)
+            unreadable = [o for o in objects if contents.get(o["key"]) is None]
+            if unreadable:
+                self._fail(user_name, unreadable, "S3 download failed")
+                counts["failed"] += len(unreadable)
+            readable = [o for o in objects if contents.get(o["key"]) is not None]
+            if not readable:
+                return counts
+
+            try:
+                result = self.ingestion.ingest_objects([(o["key"], contents[o["key"]]) for o in readable], user_name)
+            except Exception as e:
+                self._fail(user_name, readable, getattr(e, "error_message", str(e)))
+                counts["failed"] += len(readable)
+                return counts
+
+            for obj in readable:
+                error = result.failed_files.get(obj["key"])
+                if error is not None:
+                    self._fail(user_name, [obj], error)
+                    counts["failed"] += 1
+                    continue
+                # The upsert has returned, so the points are committed before the object leaves pre-index
+                self.checkpoint.mark(obj["key"], obj["etag"], user_name, INDEXED)
+                counts["ingested"] += 1
+                with stage_timer("s3_move"):
+                    counts["moved"] += self._move(user_name, obj)
+        return counts
+
+    def run_once(self) -> Dict[str, int]:
+        """One pass over every user's pre-index folder; returns totals for the pass."""
+        totals = {"ingested": 0, "failed": 0, "moved": 0, "given_up": 0}
+        tasks = []
+        for user_name in self._user_names():
+            to_ingest, to_move, given_up = self._plan(user_name)
+            totals["given_up"] += given_up
+            for obj in to_move:
+                totals["moved"] += self._move(user_name, obj)
+            tasks.extend((user_name, to_ingest[i:i + self.batch_size])
+                         for i in range(0, len(to_ingest), self.batch_size))
+
+        if tasks:
+            with ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="ingest-worker") as pool:
+                for counts in pool.map(lambda task: self._process_batch(*task), tasks):
+                    for name, value in counts.items():
+                        totals[name] += value
+        if any(totals.values()):
+            logger.info("Ingestion worker pass complete", batches=len(tasks), **totals)
+        return totals
+
+    def run_forever(self) -> None:
+        """Poll until stop() is called (or SIGINT/SIGTERM when run as a script)."""
+        logger.info("Ingestion worker started", bucket=self.bucket_name, prefix=self.preindex_prefix,
+                    max_workers=self.max_workers, poll_interval_seconds=self.poll_interval_seconds)
+        while not self._stop.is_set():
+            try:
+                self.run_once()
+            except Exception as e:
+                logger.error("Ingestion worker pass failed", error=getattr(e, "error_message", str(e)))
+            self._stop.wait(self.poll_interval_seconds)
+        logger.info("Ingestion worker stopped", checkpoint=self.checkpoint.counts())
+
+    def stop(self) -> None:
+        self._stop.set()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ingest objects from the S3 pre-index folder")
+    parser.add_argument("--once", action="store_true", help="process pending objects once and exit")
+    parser.add_argument("--users", nargs="*", help="user folders to watch (default: ingestion_worker.users or all)")
+    args = parser.parse_args()
+
+    worker = S3IngestionWorker(users=args.users)
+    if args.once:
+        print(json.dumps(worker.run_once()))
+    else:
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(sig, lambda *_: worker.stop())
+        worker.run_forever()
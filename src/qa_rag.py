@@ -1,42 +1,126 @@
 import sys
 import os
+import hashlib
+import threading
+from collections import OrderedDict
+from contextlib import closing
+from dataclasses import dataclass, field
 from operator import itemgetter
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, Iterator, AsyncIterator, Generator, Sequence, Tuple, Union
 
 from langchain_core.messages import BaseMessage
 from langchain_core.output_parsers import StrOutputParser
 from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableConfig, RunnableParallel, RunnableLambda
 
 from utils.model_loader import ModelLoader
+from utils.config_loader import get_settings
 from exception.custom_exception import ProjectCustomException
 from logger import GLOBAL_LOGGER as loger   
 from utils.qdrant_vector_db import QdrantVDB
+from utils.answer_cache import SemanticAnswerCache
+from utils.session_store import SessionManager
+from utils.metrics import StageCallbackHandler, trace_request, trace_iter, stage_timer, record_cache, record_size
+from utils.context_retriever import BudgetedMMRRetriever
+from utils.bm25_index import BM25Index
+from utils.reranker import Reranker, RerankingRetriever, get_cross_encoder
 from prompt.prompt_metadata import PromptType
 from prompt.prompt_library import PROMPT_REGISTRY
 
+# A batch item is a bare question or a (question, chat_history) pair
+BatchItem = Union[str, Tuple[str, Optional[List[BaseMessage]]]]
+# One unit of work yielded by a ConversationalRAG flow: (runnable, input, config, run as a batch)
+Step = Tuple[Any, Any, RunnableConfig, bool]
+
+
+@dataclass
+class BatchResult:
+    """Outcome of one batch item: the answer and its sources, or the error that item hit."""
+    question: str
+    answer: Optional[str] = None
+    sources: List[Dict[str, Any]] = field(default_factory=list)
+    cached: bool = False
+    error: Optional[str] = None
+
+
 class ConversationalRAG:
     """
     LCEL-based Conversational RAG with lazy retriever initialization.
 
     Usage:
-        rag = ConversationalRAG(session_id="abc")
-        rag.load_retriever_from_faiss(index_path="faiss_index/abc", k=5, index_name="index")
+        rag = ConversationalRAG(user_name="Arindam")
         answer = rag.invoke("What is ...?", chat_history=[])
+        # or let the session store keep (and bound) the history:
+        answer = rag.invoke("What is ...?", session_id="abc")
+        # or answer many questions at once, with per-item errors:
+        results = rag.batch([("What is ...?", []), "Who is ...?"], max_concurrency=8)
     """
 
-    def __init__(self, user_name: str):
+    def __init__(self, user_name: str, embeddings=None, llm=None, sessions: Optional[SessionManager] = None):
         try:
             self.user_name = user_name
-            self.session_id = "Arindam_session"  # Placeholder for session management
+            self.session_id = "default"  # Used in logs when callers pass chat_history themselves
+
+            # Load LLM and prompts once (a server can pass shared instances in)
+            if embeddings is None or llm is None:
+                modelload = ModelLoader.get_instance()
+                embeddings = embeddings or modelload.load_embeddings()
+                llm = llm or modelload.load_llm()
+            self.embeddings = embeddings
+            self.llm = llm
+
+            settings = get_settings()
 
-            # Load LLM and prompts once
-            modelload = ModelLoader()
-            self.embeddings = modelload.load_embeddings()
-            self.llm = modelload.load_llm()
+            # Session-backed chat history (a server passes one shared manager in)
+            if sessions is None and settings.session.enabled:
+                sessions = SessionManager.from_config(settings.session, llm=self.llm)
+            self.sessions = sessions
+
+            # Question-rewrite fast path / cache
+            self.rewrite_cache_size = settings.rag.rewrite_cache_size
+            self._rewrite_cache: "OrderedDict[tuple, str]" = OrderedDict()
+            self._rewrite_lock = threading.Lock()
+            self.rewrite_stats = {"skipped_no_history": 0, "cache_hits": 0, "llm_rewrites": 0}
+            self.batch_max_concurrency = settings.rag.batch_max_concurrency
+
+            # Semantic answer cache (per user, shared across instances in this process)
+            answer_cache_config = settings.rag.answer_cache
+            self.answer_cache = None
+            if answer_cache_config.enabled:
+                self.answer_cache = SemanticAnswerCache.for_user(
+                    user_name,
+                    similarity_threshold=answer_cache_config.similarity_threshold,
+                    max_entries=answer_cache_config.max_entries,
+                    ttl_seconds=answer_cache_config.ttl_seconds,
+                    version_dir=answer_cache_config.version_dir,
+                )
 
             qdrant_ds = QdrantVDB()
-            vector_store = qdrant_ds.get_vector_store(self.embeddings, collection_name=user_name)
-            self.retriever = vector_store.as_retriever(search_type="mmr", search_kwargs={"k": 1})
+            vector_store = qdrant_ds.get_vector_store(self.embeddings, collection_name=qdrant_ds.collection_for(user_name))
+            retrieval_config = settings.retrieval
+            self.retriever = BudgetedMMRRetriever(
+                vector_store=vector_store,
+                k=retrieval_config.k,
+                fetch_k=retrieval_config.fetch_k,
+                lambda_mult=retrieval_config.lambda_mult,
+                context_token_budget=retrieval_config.context_token_budget,
+                dedup_threshold=retrieval_config.dedup_threshold,
+                search_params=qdrant_ds.search_params(),
+                tenant_filter=qdrant_ds.tenant_filter(user_name),
+                sparse_index=BM25Index(retrieval_config.bm25_path) if retrieval_config.hybrid else None,
+                user_name=user_name,
+                sparse_k=retrieval_config.sparse_k,
+                rrf_k=retrieval_config.rrf_k,
+            )
+
+            # Optional cross-encoder rerank of the packed candidates before they reach the prompt
+            rerank_config = retrieval_config.rerank
+            if rerank_config.enabled:
+                scorer = get_cross_encoder(rerank_config.model_name, batch_size=rerank_config.batch_size)
+                self.retriever = RerankingRetriever(
+                    base_retriever=self.retriever,
+                    reranker=Reranker(scorer, top_n=rerank_config.top_n, cache_size=rerank_config.cache_size),
+                )
 
             self.contextualize_prompt: ChatPromptTemplate = PROMPT_REGISTRY[PromptType.CONTEXTUALIZE_QUESTION.value]
             self.qa_prompt: ChatPromptTemplate = PROMPT_REGISTRY[PromptType.CONTEXT_QA.value]
@@ -50,62 +134,471 @@ class ConversationalRAG:
             loger.error("Failed to initialize ConversationalRAG", error=str(e))
             raise ProjectCustomException("Initialization error in ConversationalRAG", sys)
 
-    def invoke(self, user_input: str, chat_history: Optional[List[BaseMessage]] = None) -> str:
+    # Public entry points. Each sync/async pair runs the same step generator (see _run / _arun),
+    # so the steps themselves (history, cache, retrieval, answer, session update) exist only once.
+
+    def invoke(self, user_input: str, chat_history: Optional[List[BaseMessage]] = None,
+               session_id: Optional[str] = None) -> str:
         """Invoke the LCEL pipeline."""
         try:
-            if self.chain is None:
-                raise ProjectCustomException(
-                    "RAG chain not initialized. Call load_retriever_from_faiss() before invoke().", sys
-                )
-            chat_history = chat_history or []
-            payload = {"input": user_input, "chat_history": chat_history}
-            answer = self.chain.invoke(payload)
-            if not answer:
-                loger.warning(
-                    "No answer generated", user_input=user_input, session_id=self.session_id
-                )
-                return "no answer generated."
-            loger.info(
-                "Chain invoked successfully",
-                session_id=self.session_id,
-                user_input=user_input,
-                answer_preview=str(answer)[:150],
-            )
-            return answer
+            self._require_chain()
+            with trace_request("query", user_name=self.user_name, session_id=session_id or self.session_id):
+                return self._run(self._invoke_flow(user_input, chat_history, session_id))
         except Exception as e:
             loger.error("Failed to invoke ConversationalRAG", error=str(e))
             raise ProjectCustomException("Invocation error in ConversationalRAG", sys)
 
+    async def ainvoke(self, user_input: str, chat_history: Optional[List[BaseMessage]] = None,
+                      session_id: Optional[str] = None) -> str:
+        """Async variant of invoke(), so one event loop can serve many queries concurrently."""
+        try:
+            self._require_chain()
+            with trace_request("query", user_name=self.user_name, session_id=session_id or self.session_id):
+                return await self._arun(self._invoke_flow(user_input, chat_history, session_id))
+        except Exception as e:
+            loger.error("Failed to invoke ConversationalRAG", error=str(e))
+            raise ProjectCustomException("Invocation error in ConversationalRAG", sys)
+
+    def stream(self, user_input: str, chat_history: Optional[List[BaseMessage]] = None,
+               session_id: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Stream the answer as events: one {"type": "sources"} event as soon as retrieval finishes,
+        then {"type": "token"} events as the LLM produces them, then {"type": "end"}.
+        The request trace is bound around each step, so the events may be consumed from other
+        threads (e.g. a server's threadpool) without losing stage timings.
+        """
+        return trace_iter(self._stream_events(user_input, chat_history, session_id), "query_stream",
+                          user_name=self.user_name, session_id=session_id or self.session_id)
+
+    def _stream_events(self, user_input: str, chat_history: Optional[List[BaseMessage]],
+                       session_id: Optional[str]) -> Iterator[Dict[str, Any]]:
+        try:
+            self._require_chain()
+            state = self._run(self._stream_start_flow(user_input, chat_history, session_id))
+            if state["hit"] is not None:
+                yield from self._cached_events(state["hit"])
+                return
+            yield {"type": "sources", "sources": self._sources(state["docs"])}
+            tokens = []
+            for token in self.answer_chain.stream(self._answer_input(state), config=self._trace_config):
+                tokens.append(token)
+                yield {"type": "token", "content": token}
+            self._run(self._stream_end_flow(state, "".join(tokens)))
+            yield {"type": "end"}
+        except Exception as e:
+            loger.error("Failed to stream ConversationalRAG", error=str(e))
+            raise ProjectCustomException("Streaming error in ConversationalRAG", sys)
+
+    async def astream(self, user_input: str, chat_history: Optional[List[BaseMessage]] = None,
+                      session_id: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """Async variant of stream(); yields the same events."""
+        try:
+            self._require_chain()
+            with trace_request("query_stream", user_name=self.user_name, session_id=session_id or self.session_id):
+                state = await self._arun(self._stream_start_flow(user_input, chat_history, session_id))
+                if state["hit"] is not None:
+                    for event in self._cached_events(state["hit"]):
+                        yield event
+                    return
+                yield {"type": "sources", "sources": self._sources(state["docs"])}
+                tokens = []
+                async for token in self.answer_chain.astream(self._answer_input(state), config=self._trace_config):
+                    tokens.append(token)
+                    yield {"type": "token", "content": token}
+                await self._arun(self._stream_end_flow(state, "".join(tokens)))
+                yield {"type": "end"}
+        except Exception as e:
+            loger.error("Failed to stream ConversationalRAG", error=str(e))
+            raise ProjectCustomException("Streaming error in ConversationalRAG", sys)
+
+    def batch(self, items: Sequence[BatchItem], max_concurrency: Optional[int] = None) -> List[BatchResult]:
+        """
+        Answer many questions with at most max_concurrency rewrite/retrieve/answer calls in flight.
+        Items whose rewritten question is identical share one retrieval (and one LLM answer when
+        input and history match too). Failures are reported per item in BatchResult.error.
+        """
+        try:
+            self._require_chain()
+            with trace_request("query_batch", user_name=self.user_name, size=len(items)):
+                return self._run(self._batch_flow(items, max_concurrency))
+        except Exception as e:
+            loger.error("Failed to run ConversationalRAG batch", error=str(e))
+            raise ProjectCustomException("Batch error in ConversationalRAG", sys)
+
+    async def abatch(self, items: Sequence[BatchItem], max_concurrency: Optional[int] = None) -> List[BatchResult]:
+        """Async variant of batch(); same de-duplication and per-item errors."""
+        try:
+            self._require_chain()
+            with trace_request("query_batch", user_name=self.user_name, size=len(items)):
+                return await self._arun(self._batch_flow(items, max_concurrency))
+        except Exception as e:
+            loger.error("Failed to run ConversationalRAG batch", error=str(e))
+            raise ProjectCustomException("Batch error in ConversationalRAG", sys)
+
+    # Step drivers. A flow is a generator that yields Step tuples and returns its result; the
+    # drivers run each step with the sync or async Runnable API and send the output back in.
+
+    def _step(self, runnable, value, config: Optional[RunnableConfig] = None) -> Step:
+        return runnable, value, config or self._trace_config, False
+
+    @staticmethod
+    def _batch_step(runnable, values: List[Any], config: RunnableConfig) -> Step:
+        """A step run with .batch()/.abatch(); failures come back per item as exceptions."""
+        return runnable, values, config, True
+
+    @staticmethod
+    def _run(flow: Generator[Step, Any, Any]):
+        with closing(flow):
+            result = None
+            while True:
+                try:
+                    runnable, value, config, batched = flow.send(result)
+                except StopIteration as done:
+                    return done.value
+                result = (runnable.batch(value, config=config, return_exceptions=True) if batched
+                          else runnable.invoke(value, config=config))
+
+    @staticmethod
+    async def _arun(flow: Generator[Step, Any, Any]):
+        with closing(flow):
+            result = None
+            while True:
+                try:
+                    runnable, value, config, batched = flow.send(result)
+                except StopIteration as done:
+                    return done.value
+                result = (await runnable.abatch(value, config=config, return_exceptions=True) if batched
+                          else await runnable.ainvoke(value, config=config))
+
+    # Flows
+
+    def _invoke_flow(self, user_input: str, chat_history: Optional[List[BaseMessage]], session_id: Optional[str]):
+        history = yield self._step(self.history_step, (chat_history, session_id))
+        payload = {"input": user_input, "chat_history": history}
+        if self.answer_cache is None:
+            answer = yield self._step(self.chain, payload)
+        else:
+            # Same steps as self.chain, with a semantic-cache lookup between rewrite and retrieval
+            question = yield self._step(self.rewrite_step, payload)
+            with stage_timer("embed_query"):
+                query_vector = yield self._step(self._query_embedder, question)
+            hit, version = self._cache_lookup(query_vector)
+            if hit is not None:
+                answer = hit["answer"]
+            else:
+                docs = yield self._step(self.retrieve_step, (question, query_vector))
+                answer = yield self._step(self.answer_chain, {**payload, "context": self._format_docs(docs)})
+                self._cache_store(question, query_vector, answer, docs, version)
+
+        if not answer:
+            loger.warning("No answer generated", user_input=user_input, session_id=self.session_id)
+            return "no answer generated."
+        record_size("answer_chars", len(answer))
+        loger.info(
+            "Chain invoked successfully",
+            session_id=session_id or self.session_id,
+            user_input=user_input,
+            answer_preview=str(answer)[:150],
+        )
+        with stage_timer("session_update"):
+            yield self._step(self.session_step, (session_id, user_input, answer))
+        return answer
+
+    def _stream_start_flow(self, user_input: str, chat_history: Optional[List[BaseMessage]],
+                           session_id: Optional[str]):
+        """Everything before the answer tokens; returns the state the token loop and _stream_end_flow use."""
+        history = yield self._step(self.history_step, (chat_history, session_id))
+        state = {"payload": {"input": user_input, "chat_history": history}, "session_id": session_id,
+                 "query_vector": None, "version": None, "hit": None, "docs": None}
+        state["question"] = yield self._step(self.rewrite_step, state["payload"])
+        if self.answer_cache is not None:
+            with stage_timer("embed_query"):
+                state["query_vector"] = yield self._step(self._query_embedder, state["question"])
+            state["hit"], state["version"] = self._cache_lookup(state["query_vector"], log_hit=False)
+            if state["hit"] is not None:
+                yield self._step(self.session_step, (session_id, user_input, state["hit"]["answer"]))
+                return state
+        state["docs"] = yield self._step(self.retrieve_step, (state["question"], state["query_vector"]))
+        return state
+
+    def _stream_end_flow(self, state: Dict[str, Any], answer: str):
+        record_size("answer_chars", len(answer))
+        self._cache_store(state["question"], state["query_vector"], answer, state["docs"], state["version"])
+        if answer:
+            with stage_timer("session_update"):
+                yield self._step(self.session_step, (state["session_id"], state["payload"]["input"], answer))
+        loger.info("Chain streamed successfully", session_id=state["session_id"] or self.session_id,
+                   answer_chars=len(answer))
+
+    def _batch_flow(self, items: Sequence[BatchItem], max_concurrency: Optional[int]):
+        payloads = [self._batch_payload(item) for item in items]
+        config = self._batch_config(max_concurrency)
+        questions = yield self._batch_step(self.rewrite_step, payloads, config)
+        unique = self._unique_questions(questions)
+
+        hits, vectors, version = {}, {}, None
+        if self.answer_cache is not None and unique:
+            with stage_timer("embed_query"):
+                embedded = yield self._batch_step(self._query_embedder, unique, config)
+            version = self.answer_cache.version()
+            hits, vectors = self._batch_cache_lookup(unique, embedded)
+
+        retrieved = {}
+        pending = [q for q in unique if q not in hits]
+        if pending:
+            docs = yield self._batch_step(self.retrieve_step, [(q, vectors.get(q)) for q in pending], config)
+            retrieved = dict(zip(pending, docs))
+
+        answers = {}
+        jobs = self._answer_jobs(payloads, questions, hits, retrieved)
+        if jobs:
+            outputs = yield self._batch_step(self.answer_chain, list(jobs.values()), config)
+            answers = dict(zip(jobs, outputs))
+        return self._batch_results(payloads, questions, hits, vectors, retrieved, answers, version)
+
+    # Shared step helpers
+
+    def _require_chain(self) -> None:
+        if self.chain is None:
+            raise ProjectCustomException("RAG chain not initialized.", sys)
+
+    @staticmethod
+    def _answer_input(state: Dict[str, Any]) -> Dict[str, Any]:
+        return {**state["payload"], "context": ConversationalRAG._format_docs(state["docs"])}
+
+    def _cache_lookup(self, query_vector, log_hit: bool = True):
+        """(hit or None, collection version to store a freshly computed answer under)."""
+        version = self.answer_cache.version()
+        hit = self.answer_cache.lookup(query_vector)
+        if hit is not None and log_hit:
+            loger.info("Answer cache hit", session_id=self.session_id, similarity=hit["similarity"])
+        return hit, version
+
+    def _cache_store(self, question: str, query_vector, answer: str, docs, version: Optional[int]) -> None:
+        if self.answer_cache is not None and answer and query_vector is not None:
+            self.answer_cache.store(question, query_vector, answer, self._sources(docs), version)
+
+    def _resolve_history(self, item: Tuple[Optional[List[BaseMessage]], Optional[str]]) -> List[BaseMessage]:
+        """Explicit chat_history wins; otherwise load the bounded history of session_id from the store."""
+        chat_history, session_id = item
+        if chat_history is None and session_id and self.sessions is not None:
+            with stage_timer("session_load"):
+                return self.sessions.get_history(self.user_name, session_id)
+        return chat_history or []
+
+    async def _aresolve_history(self, item: Tuple[Optional[List[BaseMessage]], Optional[str]]) -> List[BaseMessage]:
+        chat_history, session_id = item
+        if chat_history is None and session_id and self.sessions is not None:
+            with stage_timer("session_load"):
+                return await self.sessions.aget_history(self.user_name, session_id)
+        return chat_history or []
+
+    def _save_turn(self, item: Tuple[Optional[str], str, str]) -> None:
+        session_id, user_input, answer = item
+        if session_id and self.sessions is not None:
+            self.sessions.append_turn(self.user_name, session_id, user_input, answer)
+
+    async def _asave_turn(self, item: Tuple[Optional[str], str, str]) -> None:
+        session_id, user_input, answer = item
+        if session_id and self.sessions is not None:
+            await self.sessions.aappend_turn(self.user_name, session_id, user_input, answer)
+
+    @staticmethod
+    def _batch_payload(item: BatchItem) -> Dict[str, Any]:
+        if isinstance(item, str):
+            return {"input": item, "chat_history": []}
+        question, chat_history = item
+        return {"input": question, "chat_history": chat_history or []}
+
+    def _batch_config(self, max_concurrency: Optional[int]) -> RunnableConfig:
+        return {**self._trace_config, "max_concurrency": max(1, max_concurrency or self.batch_max_concurrency)}
+
+    @staticmethod
+    def _unique_questions(questions: List[Any]) -> List[str]:
+        """Distinct rewritten questions in first-seen order; failed rewrites are left out."""
+        unique = list(dict.fromkeys(q for q in questions if not isinstance(q, Exception)))
+        record_size("unique_questions", len(unique))
+        return unique
+
+    def _batch_cache_lookup(self, unique: List[str], embedded: List[Any]):
+        """Answer-cache hits and query vectors per question; an embedding failure just means a miss."""
+        hits, vectors = {}, {}
+        for question, vector in zip(unique, embedded):
+            if isinstance(vector, Exception):
+                continue
+            vectors[question] = vector
+            hit = self.answer_cache.lookup(vector)
+            if hit is not None:
+                hits[question] = hit
+        return hits, vectors
+
+    def _answer_key(self, payload: Dict[str, Any], question: str) -> tuple:
+        return payload["input"], self._history_digest(payload["chat_history"]), question
+
+    def _answer_jobs(self, payloads, questions, hits, retrieved) -> Dict[tuple, Dict[str, Any]]:
+        """One answer_chain input per distinct (input, history, rewritten question) still needing the LLM."""
+        jobs: Dict[tuple, Dict[str, Any]] = {}
+        for payload, question in zip(payloads, questions):
+            if isinstance(question, Exception) or question in hits or isinstance(retrieved[question], Exception):
+                continue
+            key = self._answer_key(payload, question)
+            if key not in jobs:
+                jobs[key] = {**payload, "context": self._format_docs(retrieved[question])}
+        return jobs
+
+    @staticmethod
+    def _batch_error(stage: str, error: Exception) -> str:
+        # ProjectCustomException's str() carries a full traceback; keep only its message per item
+        return f"{stage} failed: {type(error).__name__}: {getattr(error, 'error_message', error)}"
+
+    def _batch_results(self, payloads, questions, hits, vectors, retrieved, answers,
+                       version: Optional[int] = None) -> List[BatchResult]:
+        results: List[BatchResult] = []
+        stored = set()
+        for payload, question in zip(payloads, questions):
+            result = BatchResult(question=payload["input"])
+            if isinstance(question, Exception):
+                result.error = self._batch_error("rewrite", question)
+            elif question in hits:
+                result.answer, result.sources, result.cached = hits[question]["answer"], hits[question]["sources"], True
+            elif isinstance(retrieved[question], Exception):
+                result.error = self._batch_error("retrieve", retrieved[question])
+            else:
+                answer = answers[self._answer_key(payload, question)]
+                if isinstance(answer, Exception):
+                    result.error = self._batch_error("answer", answer)
+                else:
+                    result.answer, result.sources = answer or "no answer generated.", self._sources(retrieved[question])
+                    if self.answer_cache is not None and answer and question in vectors and question not in stored:
+                        self.answer_cache.store(question, vectors[question], answer, result.sources, version)
+                        stored.add(question)
+            results.append(result)
+
+        failed = sum(1 for r in results if r.error)
+        record_size("batch_failed", failed)
+        loger.info("Batch answered", items=len(results), failed=failed,
+                   unique_questions=len(retrieved) + len(hits), llm_answers=len(answers))
+        return results
+
+    def _cached_events(self, hit: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        loger.info("Answer cache hit", session_id=self.session_id, similarity=hit["similarity"])
+        yield {"type": "sources", "sources": hit["sources"], "cached": True}
+        yield {"type": "token", "content": hit["answer"]}
+        yield {"type": "end"}
+
+    @staticmethod
+    def _history_digest(chat_history: List[BaseMessage]) -> str:
+        sha = hashlib.sha256()
+        for message in chat_history:
+            sha.update(f"{message.type}\x1f{message.content}\x1e".encode("utf-8"))
+        return sha.hexdigest()
+
+    def _rewrite_fast_path(self, inputs: Dict[str, Any]):
+        """
+        Return (rewritten_question, cache_key). The question is None when the LLM rewriter must run.
+        With no chat history the input is already standalone, so it is used as-is.
+        """
+        chat_history = inputs["chat_history"]
+        if not chat_history:
+            with self._rewrite_lock:
+                self.rewrite_stats["skipped_no_history"] += 1
+            return inputs["input"], None
+
+        key = (self._history_digest(chat_history), inputs["input"])
+        if self.rewrite_cache_size:
+            with self._rewrite_lock:
+                cached = self._rewrite_cache.get(key)
+                if cached is not None:
+                    self._rewrite_cache.move_to_end(key)
+                    self.rewrite_stats["cache_hits"] += 1
+                    record_cache("rewrite", hits=1)
+                    return cached, key
+        record_cache("rewrite", misses=1)
+        return None, key
+
+    def _remember_rewrite(self, key, rewritten: str) -> None:
+        with self._rewrite_lock:
+            self.rewrite_stats["llm_rewrites"] += 1
+            if self.rewrite_cache_size:
+                self._rewrite_cache[key] = rewritten
+                while len(self._rewrite_cache) > self.rewrite_cache_size:
+                    self._rewrite_cache.popitem(last=False)
+
+    def _retrieve(self, item: Tuple[str, Optional[List[float]]]):
+        """Retrieve for (question, query_vector); a vector already computed for the answer cache is reused."""
+        question, query_vector = item
+        return self.retriever.invoke(question, config=self._retrieve_config, query_vector=query_vector)
+
+    async def _aretrieve(self, item: Tuple[str, Optional[List[float]]]):
+        question, query_vector = item
+        return await self.retriever.ainvoke(question, config=self._retrieve_config, query_vector=query_vector)
+
+    def _rewrite_question(self, inputs: Dict[str, Any], config: Optional[RunnableConfig] = None) -> str:
+        # Inside the chain, config carries the parent's callbacks; direct calls use the stage callbacks
+        rewritten, key = self._rewrite_fast_path(inputs)
+        if rewritten is None:
+            rewritten = self.question_rewriter.invoke(inputs, config=config or self._trace_config)
+            self._remember_rewrite(key, rewritten)
+        return rewritten
+
+    async def _arewrite_question(self, inputs: Dict[str, Any], config: Optional[RunnableConfig] = None) -> str:
+        rewritten, key = self._rewrite_fast_path(inputs)
+        if rewritten is None:
+            rewritten = await self.question_rewriter.ainvoke(inputs, config=config or self._trace_config)
+            self._remember_rewrite(key, rewritten)
+        return rewritten
+
+    @staticmethod
+    def _sources(docs) -> List[Dict[str, Any]]:
+        """Source metadata (file, page/slide) of retrieved chunks, minus Qdrant internals."""
+        return [
+            {k: v for k, v in getattr(d, "metadata", {}).items() if not k.startswith("_")}
+            for d in docs
+        ]
+
     @staticmethod
     def _format_docs(docs) -> str:
-        return "\n\n".join(getattr(d, "page_content", str(d)) for d in docs)
+        context = "\n\n".join(getattr(d, "page_content", str(d)) for d in docs)
+        record_size("context_chars", len(context))
+        return context
 
     def _build_lcel_chain(self):
         try:
             if self.retriever is None:
                 raise ProjectCustomException("No retriever set before building chain", sys)
 
+            # Per-stage wall time, tokens and first-token latency, keyed by the run names below
+            self.stage_callbacks = StageCallbackHandler(["rewrite", "retrieve", "answer"])
+            self._trace_config: RunnableConfig = {"callbacks": [self.stage_callbacks]}
+            self._retrieve_config: RunnableConfig = {**self._trace_config, "run_name": "retrieve"}
+            self._query_embedder = RunnableLambda(self.embeddings.embed_query, afunc=self.embeddings.aembed_query)
+
             # 1) Rewrite user question with chat history context
-            question_rewriter = (
+            #    (skipped when there is no history, memoized per (history, input) otherwise)
+            self.question_rewriter = (
                 {"input": itemgetter("input"), "chat_history": itemgetter("chat_history")}
                 | self.contextualize_prompt
                 | self.llm
                 | StrOutputParser()
-            )
+            ).with_config(run_name="rewrite")
+            self.rewrite_step = RunnableLambda(self._rewrite_question, afunc=self._arewrite_question)
+            self.retrieve_step = RunnableLambda(self._retrieve, afunc=self._aretrieve)
+            self.history_step = RunnableLambda(self._resolve_history, afunc=self._aresolve_history)
+            self.session_step = RunnableLambda(self._save_turn, afunc=self._asave_turn)
 
             # 2) Retrieve docs for rewritten question
-            retrieve_docs = question_rewriter | self.retriever | self._format_docs
+            self.retrieve_chain = self.rewrite_step | self.retriever.with_config(run_name="retrieve")
+            retrieve_docs = self.retrieve_chain | self._format_docs
 
             # 3) Answer using retrieved context + original input + chat history
+            self.answer_chain = (self.qa_prompt | self.llm | StrOutputParser()).with_config(run_name="answer")
             self.chain = (
-                {
-                    "context": retrieve_docs,
-                    "input": itemgetter("input"),
-                    "chat_history": itemgetter("chat_history"),
-                }
-                | self.qa_prompt
-                | self.llm
-                | StrOutputParser()
+                RunnableParallel(
+                    context=retrieve_docs,
+                    input=itemgetter("input"),
+                    chat_history=itemgetter("chat_history"),
+                )
+                | self.answer_chain
             )
 
             loger.info("LCEL graph built successfully", session_id=self.session_id)
@@ -119,4 +612,11 @@ if __name__ == "__main__":
     # test_question = "How many years of experience Arindam has?"
     test_question = "Give me Rudy's vaccine report?"
     answer = rag.invoke(user_input=test_question, chat_history=test_chat_history)
-    print("Answer:", answer)
\ No newline at end of file
+    print("Answer:", answer)
+
+    for event in rag.stream(user_input=test_question, chat_history=test_chat_history):
+        if event["type"] == "sources":
+            print("Sources:", event["sources"])
+        elif event["type"] == "token":
+            print(event["content"], end="", flush=True)
+    print()
\ No newline at end of file
@@ -0,0 +1,148 @@
+import os
+import time
+import threading
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from logger import GLOBAL_LOGGER as logger
+from utils.metrics import record_cache
+
+
+class SemanticAnswerCache:
+    """
+    Per-user cache of answered questions, matched by cosine similarity of the query embedding.
+
+    Query vectors are kept L2-normalised in one NumPy matrix, so a lookup is a single
+    matrix-vector product. Entries expire after ttl_seconds and the least recently used entry is
+    evicted once max_entries is reached. Re-ingesting a user's collection bumps a version file
+    (see bump_version), which drops that user's entries in every process on its next lookup.
+    Callers take version() before lookup and pass it to store(), so an answer computed from the
+    old collection is not stored after a bump.
+    """
+
+    _registry: Dict[str, "SemanticAnswerCache"] = {}
+    _registry_lock = threading.Lock()
+
+    def __init__(self, user_name: str, similarity_threshold: float = 0.95, max_entries: int = 512,
+                 ttl_seconds: float = 86400, version_dir: str = "cache/answer_cache_versions"):
+        self.user_name = user_name
+        self.similarity_threshold = similarity_threshold
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.version_path = self.version_file(user_name, version_dir)
+
+        self._lock = threading.Lock()
+        self._vectors: Optional[np.ndarray] = None
+        self._entries: List[Dict[str, Any]] = []
+        self._created = np.zeros(0)
+        self._last_used = np.zeros(0)
+        self._version = self._read_version()
+        self.hits = 0
+        self.misses = 0
+
+    @classmethod
+    def for_user(cls, user_name: str, **kwargs) -> "SemanticAnswerCache":
+        """Process-wide cache instance for a user, shared by every ConversationalRAG of that user."""
+        with cls._registry_lock:
+            cache = cls._registry.get(user_name)
+            if cache is None:
+                cache = cls(user_name, **kwargs)
+                cls._registry[user_name] = cache
+            return cache
+
+    @staticmethod
+    def version_file(user_name: str, version_dir: str) -> str:
+        return os.path.join(version_dir, f"{user_name}.version")
+
+    @staticmethod
+    def bump_version(user_name: str, version_dir: str = "cache/answer_cache_versions") -> None:
+        """Mark a user's collection as changed, invalidating their cached answers everywhere."""
+        os.makedirs(version_dir, exist_ok=True)
+        with open(SemanticAnswerCache.version_file(user_name, version_dir), "w") as f:
+            f.write(str(time.time_ns()))
+        with SemanticAnswerCache._registry_lock:
+            cache = SemanticAnswerCache._registry.get(user_name)
+        if cache is not None:
+            cache.invalidate()
+        logger.info("Answer cache invalidated", user_name=user_name)
+
+    def version(self) -> int:
+        """Current collection version; pass it to store() for answers computed after this call."""
+        return self._read_version()
+
+    def _read_version(self) -> int:
+        try:
+            return os.stat(self.version_path).st_mtime_ns
+        except FileNotFoundError:
+            return 0
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._vectors = None
+            self._entries = []
+            self._created = np.zeros(0)
+            self._last_used = np.zeros(0)
+            self._version = self._read_version()
+
+    def _drop(self, keep: np.ndarray) -> None:
+        """Keep only the rows where keep is True (caller holds the lock)."""
+        self._vectors = self._vectors[keep] if keep.any() else None
+        self._entries = [e for e, k in zip(self._entries, keep) if k]
+        self._created = self._created[keep]
+        self._last_used = self._last_used[keep]
+
+    @staticmethod
+    def _normalise(vector) -> np.ndarray:
+        vec = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vec)
+        return vec / norm if norm else vec
+
+    def lookup(self, query_vector) -> Optional[Dict[str, Any]]:
+        """Return {"query", "answer", "sources", "similarity"} of the best match above threshold, or None."""
+        if self._read_version() != self._version:
+            self.invalidate()
+        query = self._normalise(query_vector)
+        now = time.time()
+        with self._lock:
+            if self._vectors is not None:
+                expired = (now - self._created) > self.ttl_seconds
+                if expired.any():
+                    self._drop(~expired)
+            if self._vectors is None:
+                self.misses += 1
+                hit = None
+            else:
+                scores = self._vectors @ query
+                best = int(np.argmax(scores))
+                if scores[best] < self.similarity_threshold:
+                    self.misses += 1
+                    hit = None
+                else:
+                    self._last_used[best] = now
+                    self.hits += 1
+                    hit = {**self._entries[best], "similarity": float(scores[best])}
+        record_cache("answer", hits=int(hit is not None), misses=int(hit is None))
+        return hit
+
+    def store(self, query: str, query_vector, answer: str, sources: List[Dict[str, Any]],
+              version: Optional[int] = None) -> None:
+        """Cache an answer, unless the collection changed since version (taken before retrieval)."""
+        vec = self._normalise(query_vector)[None, :]
+        now = time.time()
+        with self._lock:
+            # Under the lock, so a concurrent bump_version() cannot slip between check and insert
+            if version is not None and not (version == self._version == self._read_version()):
+                logger.info("Answer not cached: collection changed while answering", user_name=self.user_name)
+                return
+            if self._vectors is not None and len(self._entries) >= self.max_entries:
+                keep = np.ones(len(self._entries), dtype=bool)
+                keep[int(np.argmin(self._last_used))] = False
+                self._drop(keep)
+            self._vectors = vec if self._vectors is None else np.vstack([self._vectors, vec])
+            self._entries.append({"query": query, "answer": answer, "sources": sources})
+            self._created = np.append(self._created, now)
+            self._last_used = np.append(self._last_used, now)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,131 @@
+import os
+import re
+import math
+import uuid
+import sqlite3
+import threading
+from collections import Counter
+from typing import Iterable, List, Tuple
+
+TOKEN_PATTERN = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have i in is it its me my of on or s that the this to was "
+    "were what when where which who why will with you your".split()
+)
+
+
+def normalize_point_id(point_id) -> str:
+    """Canonical string form of a Qdrant point ID (UUIDs in dashed form, integers as digits)."""
+    try:
+        return str(uuid.UUID(str(point_id)))
+    except ValueError:
+        return str(point_id)
+
+
+def tokenize(text: str) -> List[str]:
+    return [t for t in TOKEN_PATTERN.findall(text.lower()) if t not in STOPWORDS]
+
+
+class BM25Index:
+    """
+    Per-user inverted index for BM25 keyword search, stored in SQLite next to the Qdrant collection.
+    Documents are keyed by their Qdrant point ID, so sparse hits can be fused with dense hits
+    and their payloads/vectors fetched from Qdrant.
+    """
+
+    def __init__(self, path: str = "index/bm25.db", k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS docs (
+                user_name TEXT NOT NULL,
+                point_id TEXT NOT NULL,
+                length INTEGER NOT NULL,
+                PRIMARY KEY (user_name, point_id)
+            );
+            CREATE TABLE IF NOT EXISTS postings (
+                user_name TEXT NOT NULL,
+                term TEXT NOT NULL,
+                point_id TEXT NOT NULL,
+                tf INTEGER NOT NULL,
+                PRIMARY KEY (user_name, term, point_id)
+            );
+            CREATE INDEX IF NOT EXISTS idx_postings_point ON postings(user_name, point_id);
+            """
+        )
+        self._conn.commit()
+
+    def add(self, user_name: str, items: Iterable[Tuple[str, str]]) -> int:
+        """Index (point_id, text) pairs; re-adding a point replaces its postings."""
+        docs, postings = [], []
+        for point_id, text in items:
+            counts = Counter(tokenize(text))
+            point_id = normalize_point_id(point_id)
+            docs.append((user_name, point_id, sum(counts.values())))
+            postings.extend((user_name, term, point_id, tf) for term, tf in counts.items())
+        if not docs:
+            return 0
+        with self._lock:
+            self._delete_locked(user_name, [d[1] for d in docs])
+            self._conn.executemany("INSERT INTO docs (user_name, point_id, length) VALUES (?, ?, ?)", docs)
+            self._conn.executemany(
+                "INSERT INTO postings (user_name, term, point_id, tf) VALUES (?, ?, ?, ?)", postings
+            )
+            self._conn.commit()
+        return len(docs)
+
+    def _delete_locked(self, user_name: str, point_ids: List[str]) -> None:
+        rows = [(user_name, normalize_point_id(p)) for p in point_ids]
+        self._conn.executemany("DELETE FROM docs WHERE user_name = ? AND point_id = ?", rows)
+        self._conn.executemany("DELETE FROM postings WHERE user_name = ? AND point_id = ?", rows)
+
+    def delete(self, user_name: str, point_ids: Iterable[str]) -> None:
+        with self._lock:
+            self._delete_locked(user_name, list(point_ids))
+            self._conn.commit()
+
+    def search(self, user_name: str, query: str, k: int = 40) -> List[Tuple[str, float]]:
+        """Top-k (point_id, bm25_score) for the query."""
+        terms = list(set(tokenize(query)))
+        if not terms:
+            return []
+        placeholders = ",".join("?" * len(terms))
+        with self._lock:
+            num_docs, avg_len = self._conn.execute(
+                "SELECT COUNT(*), AVG(length) FROM docs WHERE user_name = ?", (user_name,)
+            ).fetchone()
+            if not num_docs:
+                return []
+            doc_freq = dict(self._conn.execute(
+                f"SELECT term, COUNT(*) FROM postings WHERE user_name = ? AND term IN ({placeholders}) GROUP BY term",
+                (user_name, *terms),
+            ).fetchall())
+            rows = self._conn.execute(
+                f"SELECT p.term, p.point_id, p.tf, d.length FROM postings p "
+                f"JOIN docs d ON d.user_name = p.user_name AND d.point_id = p.point_id "
+                f"WHERE p.user_name = ? AND p.term IN ({placeholders})",
+                (user_name, *terms),
+            ).fetchall()
+
+        scores = Counter()
+        for term, point_id, tf, length in rows:
+            df = doc_freq[term]
+            idf = math.log(1 + (num_docs - df + 0.5) / (df + 0.5))
+            norm = tf + self.k1 * (1 - self.b + self.b * length / (avg_len or 1))
+            scores[point_id] += idf * tf * (self.k1 + 1) / norm
+        return scores.most_common(k)
+
+
+def reciprocal_rank_fusion(rankings: List[List[str]], k: int = 60) -> List[Tuple[str, float]]:
+    """Fuse ranked ID lists: score(id) = sum over lists of 1 / (k + rank)."""
+    fused = Counter()
+    for ranking in rankings:
+        for rank, point_id in enumerate(ranking, start=1):
+            fused[point_id] += 1.0 / (k + rank)
+    return fused.most_common()
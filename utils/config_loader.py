@@ -1,4 +1,196 @@
+import os
+import threading
+from typing import Dict, List, Optional
+
 import yaml
+from pydantic import BaseModel, ConfigDict, Field
+
+# Environment overrides: APP__<SECTION>__<KEY>=value, e.g. APP__RETRIEVAL__K=12 or APP__S3__BUCKET_NAME=...
+# (a section can be named by its field or its YAML key, "-" written as "_", so APP__AWS_S3__... works too).
+# Values are parsed as YAML scalars, so "12", "true" and "0.5" keep their types.
+ENV_PREFIX = "APP__"
+
+
+class _Section(BaseModel):
+    # Unknown (e.g. misspelled) keys fail validation instead of silently falling back to defaults
+    model_config = ConfigDict(extra="forbid", populate_by_name=True)
+
+
+class ProviderSettings(_Section):
+    llm: str = "openai"
+    embedding: str = "openai"
+
+
+class LLMSettings(_Section):
+    model_name: str
+    temperature: float = 0.2
+    max_output_tokens: int = 2048
+
+
+class EmbeddingModelSettings(_Section):
+    model_name: str
+    dimensions: Optional[int] = None     # reduced vector size; None keeps the model's full size
+    native_dimensions: bool = True       # ask the provider for it, else truncate + renormalise locally
+
+
+class EmbeddingPipelineSettings(_Section):
+    enabled: bool = False
+    batch_size: int = 64
+    max_concurrency: int = 4
+    requests_per_minute: int = 0
+    max_retries: int = 3
+    retry_backoff_seconds: float = 1.0
+
+
+class EmbeddingCacheSettings(_Section):
+    enabled: bool = False
+    path: str = "cache/embeddings.db"
+    memory_max_entries: int = 10000
+    disk_max_entries: int = 500000
+    vector_dtype: str = "float32"        # float32 | float16 blobs on disk
+
+
+class RerankSettings(_Section):
+    enabled: bool = False
+    model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+    batch_size: int = 32
+    top_n: int = 4
+    cache_size: int = 50000
+
+
+class RetrievalSettings(_Section):
+    k: int = 8
+    fetch_k: int = 40
+    lambda_mult: float = Field(0.5, ge=0.0, le=1.0)
+    context_token_budget: int = 2000
+    dedup_threshold: float = 0.97
+    hybrid: bool = False
+    bm25_path: str = "index/bm25.db"
+    sparse_k: int = 40
+    rrf_k: int = 60
+    rerank: RerankSettings = Field(default_factory=RerankSettings)
+
+
+class AnswerCacheSettings(_Section):
+    enabled: bool = False
+    similarity_threshold: float = 0.95
+    max_entries: int = 512
+    ttl_seconds: float = 86400
+    version_dir: str = "cache/answer_cache_versions"
+
+
+class RAGSettings(_Section):
+    rewrite_cache_size: int = 1024
+    batch_max_concurrency: int = 8
+    answer_cache: AnswerCacheSettings = Field(default_factory=AnswerCacheSettings)
+
+
+class SessionSettings(_Section):
+    enabled: bool = False
+    backend: str = "memory"
+    sqlite_path: str = "sessions/sessions.db"
+    max_sessions: int = 10000
+    max_history_tokens: int = 1500
+    summary_max_tokens: int = 300
+    summarize: bool = True
+    trim_to: float = 0.5                 # fraction of max_history_tokens left after a trim
+
+
+class APISettings(_Section):
+    rag_pool_size: int = 64
+    upload_dir: str = "uploads"
+
+
+class S3Settings(_Section):
+    bucket_name: Optional[str] = None
+    preindex_folder_name: str = "pre-index"
+    postindex_folder_name: str = "post-index"
+    endpoint_url: Optional[str] = None
+    max_pool_connections: int = 32
+    transfer_workers: int = 8
+    multipart_threshold_mb: int = 8
+    multipart_chunksize_mb: int = 8
+    multipart_concurrency: int = 4
+
+
+class IngestionSettings(_Section):
+    parallel: bool = False
+    max_workers: int = 4
+    parallel_min_mb: float = 16.0        # smaller batches parse in-process; the pool only pays off on big inputs
+    chunk_size: int = 1000
+    chunk_overlap: int = 200
+    incremental: bool = False
+    manifest_path: str = "manifest/ingestion_manifest.db"
+
+
+class CollectionProfile(_Section):
+    """Layout of one Qdrant collection: vector storage, HNSW graph, quantization and payload indexes."""
+    on_disk: bool = False                # original vectors memory-mapped instead of in RAM
+    datatype: str = "float32"            # float32 | float16 | uint8 storage of the original vectors
+    hnsw_m: int = 16
+    hnsw_ef_construct: int = 100
+    hnsw_on_disk: bool = False
+    search_ef: Optional[int] = None      # hnsw_ef per query; None uses the server default
+    quantization: Optional[str] = None   # None | scalar | binary
+    quantile: float = 0.99               # scalar (int8) quantization clipping quantile
+    always_ram: bool = True              # keep quantized vectors in RAM even when originals are on disk
+    rescore: bool = True                 # re-rank quantized hits with the original vectors
+    oversampling: float = 2.0            # candidates fetched per result before rescoring
+    payload_indexes: Dict[str, str] = Field(default_factory=dict)  # payload key -> schema type
+
+
+class QdrantSettings(_Section):
+    profile: str = "default"
+    tenancy: str = "per_user"            # per_user: a collection per user | shared: one tenant-filtered collection
+    shared_collection: str = "tenants"
+    tenant_field: str = "tenant_id"      # top-level payload key holding the user name in shared mode
+    profiles: Dict[str, CollectionProfile] = Field(default_factory=dict)
+
+    def collection_profile(self, name: Optional[str] = None) -> CollectionProfile:
+        """The named (or configured) profile; unknown names fall back to Qdrant defaults."""
+        return self.profiles.get(name or self.profile) or CollectionProfile()
+
+
+class IngestionWorkerSettings(_Section):
+    poll_interval_seconds: float = 30
+    max_workers: int = 4
+    batch_size: int = 16
+    max_attempts: int = 3
+    checkpoint_path: str = "manifest/ingestion_worker.db"
+    users: List[str] = Field(default_factory=list)
+
+
+class LoggingSettings(_Section):
+    mode: str = "queue"               # queue | sync
+    level: str = "INFO"
+    console: bool = False
+    log_dir: str = "logs"
+    rotation: str = "size"            # size | time | none
+    max_bytes_mb: float = 50
+    when: str = "midnight"
+    backup_count: int = 10
+    sample_rates: Dict[str, float] = Field(default_factory=dict)
+
+
+class Settings(_Section):
+    """Validated view of config.yaml; unknown sections and keys are rejected at load time."""
+
+    user_names: Dict[str, str] = Field(default_factory=dict)
+    providers: ProviderSettings = Field(default_factory=ProviderSettings)
+    llm: Dict[str, LLMSettings] = Field(default_factory=dict)
+    embedding_model: Dict[str, EmbeddingModelSettings] = Field(default_factory=dict)
+    embedding_pipeline: EmbeddingPipelineSettings = Field(default_factory=EmbeddingPipelineSettings)
+    embedding_cache: EmbeddingCacheSettings = Field(default_factory=EmbeddingCacheSettings)
+    retrieval: RetrievalSettings = Field(default_factory=RetrievalSettings)
+    rag: RAGSettings = Field(default_factory=RAGSettings)
+    session: SessionSettings = Field(default_factory=SessionSettings)
+    api: APISettings = Field(default_factory=APISettings)
+    s3: S3Settings = Field(default_factory=S3Settings, alias="AWS-S3")
+    ingestion: IngestionSettings = Field(default_factory=IngestionSettings)
+    qdrant: QdrantSettings = Field(default_factory=QdrantSettings)
+    ingestion_worker: IngestionWorkerSettings = Field(default_factory=IngestionWorkerSettings)
+    logging: LoggingSettings = Field(default_factory=LoggingSettings)
+
 
 def load_config(path="config.yaml"):
     """Load configuration from a YAML file.
@@ -9,6 +201,77 @@ def load_config(path="config.yaml"):
         config = yaml.safe_load(file)
     return config
 
+
+def _section_keys(config: dict) -> Dict[str, str]:
+    """Lower-case spellings of each top-level section (field name, YAML alias, alias with "-" as "_") -> YAML key."""
+    sections = {}
+    for name, info in Settings.model_fields.items():
+        key = info.alias or name
+        for spelling in (name, key, key.replace("-", "_")):
+            sections[spelling.lower()] = key
+    sections.update({key.lower(): key for key in config})
+    return sections
+
+
+def _apply_env_overrides(config: dict, environ=None) -> dict:
+    environ = os.environ if environ is None else environ
+    sections = _section_keys(config)
+    for name, raw in environ.items():
+        if not name.startswith(ENV_PREFIX):
+            continue
+        parts = [p.lower() for p in name[len(ENV_PREFIX):].split("__") if p]
+        if not parts:
+            continue
+        if parts[0] not in sections:
+            raise ValueError(f"{name}: unknown config section '{parts[0]}' (expected one of "
+                             f"{', '.join(sorted(set(sections.values())))})")
+        node = config
+        # Match the first level case-insensitively so APP__S3__... / APP__AWS_S3__... reach the "AWS-S3" block
+        parts[0] = sections[parts[0]]
+        for part in parts[:-1]:
+            node = node.setdefault(part, {})
+        node[parts[-1]] = yaml.safe_load(raw)
+    return config
+
+
+_settings: Dict[str, tuple] = {}
+_settings_lock = threading.Lock()
+
+
+def get_settings(path: str = "config.yaml", reload_on_change: Optional[bool] = None) -> Settings:
+    """
+    Parsed, validated and memoized settings (one instance per path per process).
+    With reload_on_change (or CONFIG_RELOAD=1) the file's mtime is checked on each call and the
+    settings rebuilt when it changes; otherwise the file is read exactly once. A reload only reaches
+    code that calls get_settings() again: objects already built from the old settings (the
+    ModelLoader's models, warm pooled ConversationalRAG instances) keep them until restart.
+    Raises pydantic.ValidationError at load time for malformed values or unknown keys, and
+    ValueError for an APP__ override naming an unknown section.
+    """
+    if reload_on_change is None:
+        reload_on_change = os.getenv("CONFIG_RELOAD", "").lower() in ("1", "true", "yes")
+    key = os.path.abspath(path)
+    cached = _settings.get(key)
+    if cached is not None and not reload_on_change:
+        return cached[1]
+
+    mtime = os.path.getmtime(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with _settings_lock:
+        cached = _settings.get(key)
+        if cached is None or cached[0] != mtime:
+            settings = Settings.model_validate(_apply_env_overrides(load_config(path) or {}))
+            _settings[key] = cached = (mtime, settings)
+        return cached[1]
+
+
+def reset_settings() -> None:
+    """Forget memoized settings (e.g. after changing APP__ environment overrides)."""
+    with _settings_lock:
+        _settings.clear()
+
+
 if __name__ == "__main__":
-    config = load_config("config.yaml")
-    print(config)
\ No newline at end of file
+    settings = get_settings("config.yaml")
+    print(settings.model_dump(by_alias=True))
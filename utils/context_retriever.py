@@ -0,0 +1,211 @@
+import time
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from langchain_core.callbacks import CallbackManagerForRetrieverRun, AsyncCallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables.config import run_in_executor
+from logger import GLOBAL_LOGGER as logger
+from utils.session_store import estimate_tokens
+from utils.metrics import record_size, stage_timer
+from utils.bm25_index import reciprocal_rank_fusion, normalize_point_id
+
+# Shared by all retrievers: runs the sparse search while the dense search is in flight
+_search_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hybrid-search")
+
+
+def mmr_select(query_vector: np.ndarray, candidate_vectors: np.ndarray, k: int,
+               lambda_mult: float = 0.5, dedup_threshold: float = 0.97,
+               relevance: Optional[np.ndarray] = None) -> List[int]:
+    """
+    Vectorized maximal marginal relevance over candidate vectors.
+
+    The candidate-candidate similarity matrix is computed once; each pick is then one
+    vector update. Candidates whose similarity to an already selected one exceeds
+    dedup_threshold are treated as near-duplicates and never selected.
+    relevance overrides the query cosine (e.g. with fused hybrid scores scaled to [0, 1]).
+    Returns candidate indices in selection order.
+    """
+    def normalise(m):
+        norms = np.linalg.norm(m, axis=-1, keepdims=True)
+        return m / np.where(norms == 0, 1, norms)
+
+    candidates = normalise(np.asarray(candidate_vectors, dtype=np.float32))
+    query = normalise(np.asarray(query_vector, dtype=np.float32))
+    relevance = candidates @ query if relevance is None else np.asarray(relevance, dtype=np.float32)
+    similarity = candidates @ candidates.T
+
+    n = len(candidates)
+    max_sim = np.zeros(n, dtype=np.float32)
+    available = np.ones(n, dtype=bool)
+    selected: List[int] = []
+    while len(selected) < k and available.any():
+        scores = lambda_mult * relevance - (1 - lambda_mult) * max_sim
+        scores[~available] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        max_sim = np.maximum(max_sim, similarity[best])
+        available[best] = False
+        available &= max_sim < dedup_threshold
+    return selected
+
+
+class BudgetedMMRRetriever(BaseRetriever):
+    """
+    Over-fetches fetch_k candidates (with their vectors) from Qdrant, removes exact and near
+    duplicates, orders them by NumPy MMR and returns as many as fit context_token_budget (at most k).
+    With a sparse_index, BM25 and dense search run concurrently and are fused by reciprocal rank
+    fusion before MMR, so exact names and keywords are not lost to pure embedding similarity.
+    Packing happens here rather than when formatting, so the documents reported as sources are
+    exactly the ones placed in {context}. In a shared multi-tenant collection, tenant_filter
+    (QdrantVDB.tenant_filter()) is added to every Qdrant read, so no other tenant's point is returned.
+    """
+
+    vector_store: Any
+    k: int = 8
+    fetch_k: int = 40
+    lambda_mult: float = 0.5
+    context_token_budget: int = 2000
+    dedup_threshold: float = 0.97
+    query_filter: Optional[Any] = None
+    tenant_filter: Optional[Any] = None
+    search_params: Optional[Any] = None  # HNSW ef / quantization rescoring (QdrantVDB.search_params())
+    sparse_index: Optional[Any] = None
+    user_name: Optional[str] = None
+    sparse_k: int = 40
+    rrf_k: int = 60
+
+    def _filter(self):
+        if self.tenant_filter is None or self.query_filter is None:
+            return self.tenant_filter or self.query_filter
+        from qdrant_client.http.models import Filter
+        return Filter(must=[self.tenant_filter, self.query_filter])
+
+    def _fetch(self, ids: List[str]):
+        """Points by ID, restricted to the tenant in a shared collection."""
+        vs = self.vector_store
+        if self.tenant_filter is None:
+            return vs.client.retrieve(vs.collection_name, ids=ids, with_payload=True, with_vectors=True)
+        from qdrant_client.http.models import Filter, HasIdCondition
+        points, _ = vs.client.scroll(vs.collection_name, limit=len(ids), with_payload=True, with_vectors=True,
+                                     scroll_filter=Filter(must=[HasIdCondition(has_id=ids), self.tenant_filter]))
+        return points
+
+    def _search(self, query_vector: List[float]):
+        vs = self.vector_store
+        return vs.client.query_points(
+            collection_name=vs.collection_name,
+            query=query_vector,
+            using=vs.vector_name or None,
+            query_filter=self._filter(),
+            search_params=self.search_params,
+            limit=self.fetch_k,
+            with_payload=True,
+            with_vectors=True,
+        ).points
+
+    def _hybrid_search(self, query: str, query_vector: List[float]):
+        """Dense + BM25 in parallel, fused by RRF. Returns (points, fused relevance in [0, 1])."""
+        start = time.perf_counter()
+        sparse_future = _search_executor.submit(self.sparse_index.search, self.user_name, query, self.sparse_k)
+        dense_points = self._search(query_vector)
+        dense_ms = (time.perf_counter() - start) * 1000
+        sparse_hits = sparse_future.result()
+        sparse_ms = (time.perf_counter() - start) * 1000
+
+        fuse_start = time.perf_counter()
+        by_id = {normalize_point_id(p.id): p for p in dense_points}
+        fused = reciprocal_rank_fusion(
+            [list(by_id), [point_id for point_id, _ in sparse_hits]], k=self.rrf_k
+        )[:self.fetch_k]
+        fuse_ms = (time.perf_counter() - fuse_start) * 1000
+
+        fetch_start = time.perf_counter()
+        missing = [point_id for point_id, _ in fused if point_id not in by_id]
+        if missing:
+            for record in self._fetch(missing):
+                by_id[normalize_point_id(record.id)] = record
+        fetch_ms = (time.perf_counter() - fetch_start) * 1000
+
+        # Sparse hits whose points were deleted since indexing are skipped
+        fused = [(point_id, score) for point_id, score in fused if point_id in by_id]
+        top = fused[0][1] if fused else 1.0
+        logger.debug(
+            "Hybrid retrieval", dense_hits=len(dense_points), sparse_hits=len(sparse_hits), fused=len(fused),
+            dense_ms=round(dense_ms, 2), sparse_ms=round(sparse_ms, 2), fuse_ms=round(fuse_ms, 2),
+            fetch_ms=round(fetch_ms, 2),
+        )
+        return [by_id[point_id] for point_id, _ in fused], [score / top for _, score in fused]
+
+    def _to_document(self, point, score=None) -> Document:
+        payload = point.payload or {}
+        metadata = dict(payload.get(self.vector_store.metadata_payload_key) or {})
+        metadata["_id"] = point.id
+        metadata["_score"] = getattr(point, "score", None) if score is None else score
+        return Document(page_content=payload.get(self.vector_store.content_payload_key, ""), metadata=metadata)
+
+    def _dense_vector(self, point):
+        vector = point.vector
+        if isinstance(vector, dict):  # named vectors
+            vector = vector[self.vector_store.vector_name]
+        return vector
+
+    def pack(self, query_vector, points, relevance: Optional[List[float]] = None) -> List[Document]:
+        # Exact duplicates (same chunk text from overlapping files/pages) keep their best-scored copy
+        seen, unique, unique_relevance = set(), [], []
+        for i, point in enumerate(points):
+            digest = hashlib.sha256(str((point.payload or {}).get(self.vector_store.content_payload_key, "")).encode()).digest()
+            if digest not in seen:
+                seen.add(digest)
+                unique.append(point)
+                if relevance is not None:
+                    unique_relevance.append(relevance[i])
+        if not unique:
+            return []
+
+        order = mmr_select(
+            np.asarray(query_vector),
+            np.asarray([self._dense_vector(p) for p in unique]),
+            k=len(unique),
+            lambda_mult=self.lambda_mult,
+            dedup_threshold=self.dedup_threshold,
+            relevance=np.asarray(unique_relevance) if relevance is not None else None,
+        )
+
+        packed, used = [], 0
+        for idx in order:
+            doc = self._to_document(unique[idx], unique_relevance[idx] if relevance is not None else None)
+            cost = estimate_tokens(doc.page_content)
+            if used + cost > self.context_token_budget:
+                continue  # a smaller lower-ranked chunk may still fit
+            packed.append(doc)
+            used += cost
+            if len(packed) >= self.k:
+                break
+        logger.debug("Context packed", candidates=len(points), unique=len(unique), packed=len(packed), tokens=used)
+        record_size("candidates", len(points))
+        record_size("context_tokens", used)
+        return packed
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun,
+                                query_vector: Optional[List[float]] = None) -> List[Document]:
+        # Callers that already embedded the query (e.g. for the answer cache) pass query_vector in
+        if query_vector is None:
+            with stage_timer("embed_query"):
+                query_vector = self.vector_store.embeddings.embed_query(query)
+        with stage_timer("search"):
+            if self.sparse_index is not None:
+                points, relevance = self._hybrid_search(query, query_vector)
+            else:
+                points, relevance = self._search(query_vector), None
+        with stage_timer("pack"):
+            return self.pack(query_vector, points, relevance)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun,
+                                       query_vector: Optional[List[float]] = None) -> List[Document]:
+        # BaseRetriever's default does not forward extra kwargs, so query_vector would be dropped
+        return await run_in_executor(None, self._get_relevant_documents, query,
+                                     run_manager=run_manager.get_sync(), query_vector=query_vector)
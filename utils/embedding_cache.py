@@ -0,0 +1,203 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+from logger import GLOBAL_LOGGER as logger
+from utils.metrics import record_cache
+
+QUERY, DOCUMENT = "q", "d"
+
+
+class CachedEmbeddings(Embeddings):
+    """
+    Embeddings wrapper with a two-tier cache: an in-process LRU in front of a SQLite store.
+    Entries are keyed by (provider, model_name, kind, sha256(text)); kind keeps query and document
+    vectors apart, since some providers (Google's task_type) embed the same text differently for each.
+    Vectors are stored as float32 blobs, or float16 (half the disk, ~3 significant digits) with
+    vector_dtype="float16".
+    Only texts missing from both tiers are sent to the wrapped provider, in one batched call.
+    """
+
+    def __init__(
+        self,
+        underlying: Embeddings,
+        provider: str,
+        model_name: str,
+        path: str = "cache/embeddings.db",
+        memory_max_entries: int = 10000,
+        disk_max_entries: int = 500000,
+        vector_dtype: str = "float32",
+    ):
+        if vector_dtype not in ("float32", "float16"):
+            raise ValueError(f"Unsupported vector_dtype '{vector_dtype}' (expected float32 or float16)")
+        self.underlying = underlying
+        self.provider = provider
+        self.model_name = model_name
+        self.memory_max_entries = memory_max_entries
+        self.disk_max_entries = disk_max_entries
+        self.half_precision = vector_dtype == "float16"
+
+        self._memory: "OrderedDict[str, List[float]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.memory_hits = 0
+
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS embeddings (
+                key TEXT PRIMARY KEY,
+                vector BLOB NOT NULL,
+                last_access REAL NOT NULL
+            )
+            """
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_last_access ON embeddings(last_access)")
+        self._conn.commit()
+        logger.info("Embedding cache opened", path=path, provider=provider, model=model_name)
+
+    def _key(self, text: str, kind: str) -> str:
+        """kind is QUERY or DOCUMENT: a text's query vector must never be served as its document vector."""
+        digest = hashlib.sha256(text.encode("utf-8")).hexdigest()
+        if self.half_precision:  # blobs of the two formats must never be read as each other
+            return f"{self.provider}:{self.model_name}:f16:{kind}:{digest}"
+        return f"{self.provider}:{self.model_name}:{kind}:{digest}"
+
+    def _to_blob(self, vector: List[float]) -> bytes:
+        if self.half_precision:
+            return np.asarray(vector, dtype=np.float16).tobytes()
+        return array("f", vector).tobytes()
+
+    def _from_blob(self, blob: bytes) -> List[float]:
+        if self.half_precision:
+            return np.frombuffer(blob, dtype=np.float16).astype(np.float32).tolist()
+        vec = array("f")
+        vec.frombytes(blob)
+        return vec.tolist()
+
+    def _remember(self, key: str, vector: List[float]) -> None:
+        self._memory[key] = vector
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.memory_max_entries:
+            self._memory.popitem(last=False)
+
+    def _lookup(self, keys: List[str]) -> Dict[str, List[float]]:
+        found: Dict[str, List[float]] = {}
+        disk_keys = []
+        with self._lock:
+            for key in keys:
+                if key in self._memory:
+                    self._memory.move_to_end(key)
+                    found[key] = self._memory[key]
+                    self.memory_hits += 1
+                else:
+                    disk_keys.append(key)
+
+            now = time.time()
+            # SQLite caps bound parameters per statement, so look up in slices
+            for i in range(0, len(disk_keys), 500):
+                batch = disk_keys[i:i + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch
+                ).fetchall()
+                for key, blob in rows:
+                    vector = self._from_blob(blob)
+                    found[key] = vector
+                    self._remember(key, vector)
+                if rows:
+                    self._conn.executemany(
+                        "UPDATE embeddings SET last_access = ? WHERE key = ?", [(now, k) for k, _ in rows]
+                    )
+            self._conn.commit()
+        return found
+
+    def _store(self, items: Dict[str, List[float]]) -> None:
+        now = time.time()
+        with self._lock:
+            for key, vector in items.items():
+                self._remember(key, vector)
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, last_access) VALUES (?, ?, ?)",
+                [(k, self._to_blob(v), now) for k, v in items.items()],
+            )
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self) -> None:
+        """Size-based eviction: drop least recently used rows once the store exceeds disk_max_entries."""
+        (count,) = self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()
+        excess = count - self.disk_max_entries
+        if excess > 0:
+            self._conn.execute(
+                "DELETE FROM embeddings WHERE key IN "
+                "(SELECT key FROM embeddings ORDER BY last_access ASC LIMIT ?)",
+                (excess,),
+            )
+            logger.info("Embedding cache evicted entries", num_entries=excess)
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        keys = [self._key(t, DOCUMENT) for t in texts]
+        found = self._lookup(keys)
+        hit_count = sum(1 for k in keys if k in found)
+
+        # Embed each distinct missing text once
+        missing: Dict[str, str] = {}
+        for key, text in zip(keys, texts):
+            if key not in found and key not in missing:
+                missing[key] = text
+
+        with self._lock:
+            self.hits += hit_count
+            self.misses += len(missing)
+        record_cache("embedding", hits=hit_count, misses=len(missing))
+
+        if missing:
+            vectors = self.underlying.embed_documents(list(missing.values()))
+            fresh = dict(zip(missing.keys(), vectors))
+            self._store(fresh)
+            found.update(fresh)
+
+        return [found[k] for k in keys]
+
+    def embed_query(self, text: str) -> List[float]:
+        key = self._key(text, QUERY)
+        found = self._lookup([key])
+        if key in found:
+            with self._lock:
+                self.hits += 1
+            record_cache("embedding", hits=1)
+            return found[key]
+
+        with self._lock:
+            self.misses += 1
+        record_cache("embedding", misses=1)
+        vector = self.underlying.embed_query(text)
+        self._store({key: vector})
+        return vector
+
+    def stats(self) -> Dict[str, float]:
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "memory_hits": self.memory_hits,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "memory_entries": len(self._memory),
+            }
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
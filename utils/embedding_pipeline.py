@@ -0,0 +1,141 @@
+import sys
+import time
+import uuid
+import threading
+import contextvars
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, Future
+from itertools import islice, repeat
+from typing import Iterable, Iterator, List, Optional, Tuple
+
+from langchain_core.documents import Document
+from exception.custom_exception import ProjectCustomException
+from logger import GLOBAL_LOGGER as logger
+from utils.metrics import stage_timer
+
+
+class RateLimiter:
+    """Thread-safe limiter that spaces calls evenly to stay under requests_per_minute (0 disables it)."""
+
+    def __init__(self, requests_per_minute: float = 0):
+        self.interval = 60.0 / requests_per_minute if requests_per_minute else 0.0
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self) -> None:
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot)
+            self._next_slot = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class EmbeddingUpsertPipeline:
+    """
+    Streams documents into a Qdrant collection in fixed-size batches.
+
+    Up to max_concurrency batches are embedded at once (within the rate limit), and each
+    embedded batch is upserted on a separate thread while later batches embed. Only a bounded
+    number of batches is ever in flight, so memory stays flat regardless of corpus size.
+    Failed embed/upsert calls are retried with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        embedding,
+        vector_db,
+        batch_size: int = 64,
+        max_concurrency: int = 4,
+        requests_per_minute: float = 0,
+        max_retries: int = 3,
+        retry_backoff_seconds: float = 1.0,
+    ):
+        self.embedding = embedding
+        self.vector_db = vector_db
+        self.batch_size = batch_size
+        self.max_concurrency = max(1, max_concurrency)
+        self.rate_limiter = RateLimiter(requests_per_minute)
+        self.max_retries = max_retries
+        self.retry_backoff_seconds = retry_backoff_seconds
+
+    def _with_retry(self, what: str, fn, *args):
+        for attempt in range(self.max_retries + 1):
+            try:
+                return fn(*args)
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error(f"{what} failed after retries", attempts=attempt + 1, error=str(e))
+                    raise
+                delay = self.retry_backoff_seconds * (2 ** attempt)
+                logger.warning(f"{what} failed, retrying", attempt=attempt + 1, delay=delay, error=str(e))
+                time.sleep(delay)
+
+    def _embed(self, texts: List[str]) -> List[List[float]]:
+        def call():
+            self.rate_limiter.acquire()
+            return self.embedding.embed_documents(texts)
+        with stage_timer("embed"):
+            return self._with_retry("Embedding batch", call)
+
+    def _upsert(self, collection_name: str, ids: List[str], vectors, docs: List[Document],
+                tenant_id: Optional[str] = None) -> int:
+        with stage_timer("upsert"):
+            self._with_retry("Qdrant upsert", self.vector_db.upsert_embedded, collection_name, ids, vectors, docs,
+                             tenant_id)
+        return len(docs)
+
+    def _batches(self, documents: Iterable[Document], ids: Optional[Iterable[Optional[str]]]
+                 ) -> Iterator[Tuple[List[Document], List[str]]]:
+        pairs = zip(documents, ids if ids is not None else repeat(None))
+        while True:
+            batch = list(islice(pairs, self.batch_size))
+            if not batch:
+                return
+            yield [d for d, _ in batch], [i or str(uuid.uuid4()) for _, i in batch]
+
+    def run(self, collection_name: str, documents: Iterable[Document],
+            ids: Optional[Iterable[Optional[str]]] = None, tenant_id: Optional[str] = None) -> int:
+        """Embed and upsert all documents (tagged with tenant_id in a shared collection); returns points written."""
+        try:
+            written = 0
+            collection_ready = False
+            embedding_q: "deque[Tuple[List[Document], List[str], Future]]" = deque()
+            upsert_q: "deque[Future]" = deque()
+
+            with ThreadPoolExecutor(max_workers=self.max_concurrency) as embed_pool, \
+                    ThreadPoolExecutor(max_workers=1) as upsert_pool:
+
+                def drain_one_embedding():
+                    nonlocal collection_ready, written
+                    docs, batch_ids, future = embedding_q.popleft()
+                    vectors = future.result()
+                    if not collection_ready:
+                        self.vector_db.ensure_collection(collection_name, len(vectors[0]))
+                        collection_ready = True
+                    upsert_q.append(upsert_pool.submit(
+                        contextvars.copy_context().run, self._upsert, collection_name, batch_ids, vectors, docs, tenant_id
+                    ))
+                    # Backpressure: never hold more than max_concurrency embedded batches waiting for upsert
+                    while len(upsert_q) > self.max_concurrency:
+                        written += upsert_q.popleft().result()
+
+                for docs, batch_ids in self._batches(documents, ids):
+                    texts = [d.page_content for d in docs]
+                    # Workers run in a copy of the caller's context so their stage times reach its trace
+                    embedding_q.append((docs, batch_ids, embed_pool.submit(contextvars.copy_context().run, self._embed, texts)))
+                    if len(embedding_q) >= self.max_concurrency:
+                        drain_one_embedding()
+
+                while embedding_q:
+                    drain_one_embedding()
+                while upsert_q:
+                    written += upsert_q.popleft().result()
+
+            logger.info("Streaming upsert complete", collection=collection_name, num_points=written)
+            return written
+        except Exception as e:
+            logger.error("Streaming upsert failed", collection=collection_name, error=str(e))
+            raise ProjectCustomException(f"Streaming upsert into '{collection_name}' failed", sys)
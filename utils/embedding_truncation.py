@@ -0,0 +1,39 @@
+from typing import List, Sequence
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+
+def truncate_normalize(vectors: Sequence[Sequence[float]], dimensions: int) -> np.ndarray:
+    """Keep the first `dimensions` components of each vector and rescale it to unit length."""
+    matrix = np.asarray(vectors, dtype=np.float32)[..., :dimensions]
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return matrix / np.where(norms == 0, 1, norms)
+
+
+class TruncatedEmbeddings(Embeddings):
+    """
+    Matryoshka-style dimension reduction for models trained to front-load information
+    (text-embedding-3-*, gemini-embedding-001): vectors are cut to `dimensions` and renormalised,
+    so cosine scores stay comparable. Also normalises output that a provider already shortened.
+    """
+
+    def __init__(self, underlying: Embeddings, dimensions: int):
+        self.underlying = underlying
+        self.dimensions = dimensions
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return truncate_normalize(self.underlying.embed_documents(texts), self.dimensions).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return truncate_normalize(self.underlying.embed_query(text), self.dimensions).tolist()
+
+    async def aembed_documents(self, texts: List[str]) -> List[List[float]]:
+        if not texts:
+            return []
+        return truncate_normalize(await self.underlying.aembed_documents(texts), self.dimensions).tolist()
+
+    async def aembed_query(self, text: str) -> List[float]:
+        return truncate_normalize(await self.underlying.aembed_query(text), self.dimensions).tolist()
@@ -0,0 +1,84 @@
+import os
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from typing import Dict, Optional
+from logger import GLOBAL_LOGGER as logger
+
+# Object states, in order: downloaded + upserted ("indexed"), then moved to post-index ("moved")
+INDEXED = "indexed"
+MOVED = "moved"
+FAILED = "failed"
+
+
+class IngestionCheckpoint:
+    """
+    Persistent progress of the S3 ingestion worker, keyed by object key and ETag.
+    A restarted worker skips objects already indexed (it only retries their move to post-index)
+    and gives up on objects that failed max_attempts times, instead of reprocessing everything.
+    """
+
+    def __init__(self, path: str = "manifest/ingestion_worker.db"):
+        self.path = path
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS objects (
+                object_key TEXT PRIMARY KEY,
+                etag TEXT NOT NULL,
+                user_name TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at TEXT NOT NULL
+            )
+            """
+        )
+        self._conn.commit()
+        logger.info("Ingestion checkpoint opened", path=path)
+
+    def get(self, object_key: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, user_name, status, attempts, error FROM objects WHERE object_key = ?",
+                (object_key,),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"etag": row[0], "user_name": row[1], "status": row[2], "attempts": row[3], "error": row[4]}
+
+    def mark(self, object_key: str, etag: str, user_name: str, status: str, error: Optional[str] = None) -> None:
+        """Record the object's new status; failures also count an attempt against the same ETag."""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT etag, attempts FROM objects WHERE object_key = ?", (object_key,)
+            ).fetchone()
+            attempts = row[1] if row is not None and row[0] == etag else 0
+            if status == FAILED:
+                attempts += 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO objects (object_key, etag, user_name, status, attempts, error, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (object_key, etag, user_name, status, attempts, error, datetime.now(timezone.utc).isoformat()),
+            )
+            self._conn.commit()
+
+    def counts(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM objects GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+if __name__ == "__main__":
+    checkpoint = IngestionCheckpoint("manifest/test_checkpoint.db")
+    checkpoint.mark("pre-index/Testing/text.txt", "etag-1", "Testing", FAILED, error="boom")
+    checkpoint.mark("pre-index/Testing/text.txt", "etag-1", "Testing", INDEXED)
+    print(checkpoint.get("pre-index/Testing/text.txt"), checkpoint.counts())
@@ -0,0 +1,112 @@
+import os
+import json
+import uuid
+import sqlite3
+import hashlib
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Dict, List, Optional
+from logger import GLOBAL_LOGGER as logger
+
+# Namespace for deterministic Qdrant point IDs (uuid5 of user|source|chunk_hash)
+POINT_ID_NAMESPACE = uuid.UUID("6f1c2e1a-8d7b-4f3e-9a51-2b0c7e4d9f10")
+
+
+def file_content_hash(file_path: Path, block_size: int = 1 << 20) -> str:
+    """SHA-256 of the raw file bytes, read in blocks."""
+    sha = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def bytes_content_hash(data: bytes) -> str:
+    """SHA-256 of in-memory file content; equal to file_content_hash of the same bytes on disk."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def chunk_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def chunk_point_id(user_name: str, source: str, chunk_digest: str) -> str:
+    """Deterministic point ID, so the same chunk always maps to the same Qdrant point."""
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{user_name}|{source}|{chunk_digest}"))
+
+
+class IngestionManifest:
+    """
+    Persistent record of what has already been ingested, keyed by (user_name, source).
+    Each entry holds the file content hash and the hashes of the chunks it produced.
+    """
+
+    def __init__(self, path: str = "manifest/ingestion_manifest.db"):
+        self.path = path
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS manifest (
+                user_name TEXT NOT NULL,
+                source TEXT NOT NULL,
+                content_hash TEXT NOT NULL,
+                chunk_hashes TEXT NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (user_name, source)
+            )
+            """
+        )
+        self._conn.commit()
+        logger.info("Ingestion manifest opened", path=path)
+
+    def get(self, user_name: str, source: str) -> Optional[Dict]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT content_hash, chunk_hashes FROM manifest WHERE user_name = ? AND source = ?",
+                (user_name, source),
+            ).fetchone()
+        if row is None:
+            return None
+        return {"content_hash": row[0], "chunk_hashes": json.loads(row[1])}
+
+    def is_unchanged(self, user_name: str, source: str, content_hash: str) -> bool:
+        entry = self.get(user_name, source)
+        return entry is not None and entry["content_hash"] == content_hash
+
+    def update(self, user_name: str, source: str, content_hash: str, chunk_hashes: List[str]) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO manifest (user_name, source, content_hash, chunk_hashes, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (user_name, source, content_hash, json.dumps(chunk_hashes),
+                 datetime.now(timezone.utc).isoformat()),
+            )
+            self._conn.commit()
+
+    def remove(self, user_name: str, source: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM manifest WHERE user_name = ? AND source = ?", (user_name, source))
+            self._conn.commit()
+
+    def sources(self, user_name: str) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute("SELECT source FROM manifest WHERE user_name = ?", (user_name,)).fetchall()
+        return [r[0] for r in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+if __name__ == "__main__":
+    manifest = IngestionManifest("manifest/test_manifest.db")
+    digest = file_content_hash(Path("./data/text.txt"))
+    print("Unchanged before update:", manifest.is_unchanged("Testing", "data/text.txt", digest))
+    manifest.update("Testing", "data/text.txt", digest, [chunk_hash("hello")])
+    print("Unchanged after update:", manifest.is_unchanged("Testing", "data/text.txt", digest))
+    print("Point ID:", chunk_point_id("Testing", "data/text.txt", chunk_hash("hello")))
@@ -0,0 +1,365 @@
+import json
+import time
+import threading
+from bisect import bisect_left
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterable, Iterator, Optional, Set
+
+import numpy as np
+from langchain_core.callbacks import BaseCallbackHandler
+from logger import GLOBAL_LOGGER as logger
+
+# Histogram bucket upper bounds (milliseconds for *_ms metrics, raw values otherwise)
+BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, float("inf"))
+
+
+class Histogram:
+    """Fixed buckets plus a bounded window of recent samples for percentiles."""
+
+    def __init__(self, window: int = 2048):
+        self.counts = [0] * len(BUCKETS)
+        self.count = 0
+        self.total = 0.0
+        self.min = float("inf")
+        self.max = float("-inf")
+        self.recent = deque(maxlen=window)
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(BUCKETS, value)] += 1
+        self.count += 1
+        self.total += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.recent.append(value)
+
+    def summary(self) -> Dict[str, Any]:
+        recent = np.asarray(self.recent)
+        p50, p95, p99 = np.percentile(recent, [50, 95, 99]) if len(recent) else (0.0, 0.0, 0.0)
+        return {
+            "count": self.count,
+            "mean": round(self.total / self.count, 3) if self.count else 0.0,
+            "min": round(self.min, 3), "max": round(self.max, 3),
+            "p50": round(float(p50), 3), "p95": round(float(p95), 3), "p99": round(float(p99), 3),
+            "buckets": {("+Inf" if b == float("inf") else str(b)): c for b, c in zip(BUCKETS, self.counts) if c},
+        }
+
+
+class MetricsRegistry:
+    """Process-wide histograms and counters; snapshot() is what /metrics and dump_metrics() return."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms: Dict[str, Histogram] = {}
+        self._counters: Dict[str, float] = {}
+
+    def observe(self, name: str, value: float) -> None:
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(value)
+
+    def incr(self, name: str, amount: float = 1) -> None:
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "histograms": {name: h.summary() for name, h in sorted(self._histograms.items())},
+                "counters": dict(sorted(self._counters.items())),
+            }
+
+    def reset(self) -> None:
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+
+METRICS = MetricsRegistry()
+
+
+class RequestTrace:
+    """Per-request record of stage wall times, token counts, cache hits and payload sizes."""
+
+    def __init__(self, kind: str, fields: Dict[str, Any]):
+        self.kind = kind
+        self.fields = fields
+        self.stages: Dict[str, float] = {}
+        self.tokens: Dict[str, int] = {}
+        self.cache: Dict[str, int] = {}
+        self.sizes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def add(self, bucket: Dict, key: str, value: float) -> None:
+        with self._lock:
+            bucket[key] = bucket.get(key, 0) + value
+
+
+_current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("request_trace", default=None)
+
+
+def current_trace() -> Optional[RequestTrace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def trace_request(kind: str, **fields):
+    """
+    Collect everything recorded by the helpers below for one request, then log it as a single
+    "Request trace" event and fold the per-stage totals into METRICS histograms.
+    Nested calls reuse the outer trace. For a generator that may be resumed from other threads
+    or contexts, wrap it with trace_iter() instead.
+    """
+    if _current_trace.get() is not None:
+        yield _current_trace.get()
+        return
+    trace = RequestTrace(kind, fields)
+    token = _current_trace.set(trace)
+    start = time.perf_counter()
+    failed = False
+    try:
+        yield trace
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        try:
+            _current_trace.reset(token)
+        except ValueError:  # generator finished in a different context
+            _current_trace.set(None)
+        _finish_trace(trace, start, failed)
+
+
+@contextmanager
+def bind_trace(trace: RequestTrace):
+    """Make trace the current one for the block; entered and left in the same context."""
+    token = _current_trace.set(trace)
+    try:
+        yield trace
+    finally:
+        _current_trace.reset(token)
+
+
+def trace_iter(iterable: Iterable, kind: str, **fields) -> Iterator:
+    """
+    trace_request() around the whole iteration, with the trace bound explicitly around each step.
+    A ContextVar set inside a generator only lives in the context of the step that set it, so a
+    consumer that resumes the generator from other threads or contexts (e.g. Starlette's
+    iterate_in_threadpool) would otherwise record later stages into no trace at all.
+    """
+    iterator = iter(iterable)
+    if _current_trace.get() is not None:
+        yield from iterator
+        return
+    trace = RequestTrace(kind, fields)
+    start = time.perf_counter()
+    failed = False
+    try:
+        while True:
+            with bind_trace(trace):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+    except BaseException:
+        failed = True
+        raise
+    finally:
+        close = getattr(iterator, "close", None)
+        if close is not None:
+            with bind_trace(trace):
+                close()
+        _finish_trace(trace, start, failed)
+
+
+def _finish_trace(trace: RequestTrace, start: float, failed: bool) -> None:
+    kind = trace.kind
+    total_ms = (time.perf_counter() - start) * 1000
+    METRICS.incr(f"{kind}.requests")
+    if failed:
+        METRICS.incr(f"{kind}.errors")
+    METRICS.observe(f"{kind}.total_ms", total_ms)
+    for stage, ms in trace.stages.items():
+        METRICS.observe(f"{kind}.stage.{stage}_ms", ms)
+    for name, value in trace.sizes.items():
+        METRICS.observe(f"{kind}.size.{name}", value)
+    for name, value in trace.tokens.items():
+        METRICS.incr(f"{kind}.tokens.{name}", value)
+    for name, value in trace.cache.items():
+        METRICS.incr(f"{kind}.cache.{name}", value)
+    logger.info(
+        "Request trace", kind=kind, total_ms=round(total_ms, 2), failed=failed,
+        stages={k: round(v, 2) for k, v in trace.stages.items()},
+        tokens=trace.tokens, cache=trace.cache, sizes=trace.sizes, **trace.fields,
+    )
+
+
+def record_stage(stage: str, ms: float) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(trace.stages, stage, ms)
+    else:
+        METRICS.observe(f"stage.{stage}_ms", ms)
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """Wall time of the block, added to the current request's stage total."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, (time.perf_counter() - start) * 1000)
+
+
+def timed_iter(iterable: Iterable, stage: str) -> Iterator:
+    """Yield from iterable, charging only the time spent producing items to stage."""
+    iterator = iter(iterable)
+    elapsed = 0.0
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                elapsed += time.perf_counter() - start
+            yield item
+    finally:
+        record_stage(stage, elapsed * 1000)
+
+
+def record_size(name: str, value: int) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(trace.sizes, name, value)
+
+
+def record_cache(name: str, hits: int = 0, misses: int = 0) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        if hits:
+            trace.add(trace.cache, f"{name}_hits", hits)
+        if misses:
+            trace.add(trace.cache, f"{name}_misses", misses)
+    else:
+        METRICS.incr(f"cache.{name}_hits", hits)
+        METRICS.incr(f"cache.{name}_misses", misses)
+
+
+def record_tokens(stage: str, input_tokens: int = 0, output_tokens: int = 0) -> None:
+    trace = _current_trace.get()
+    if trace is not None:
+        trace.add(trace.tokens, f"{stage}_input", input_tokens)
+        trace.add(trace.tokens, f"{stage}_output", output_tokens)
+    else:
+        METRICS.incr(f"tokens.{stage}_input", input_tokens)
+        METRICS.incr(f"tokens.{stage}_output", output_tokens)
+
+
+def dump_metrics(path: Optional[str] = None) -> Dict[str, Any]:
+    """Return the aggregated metrics, and also write them as JSON when path is given."""
+    snapshot = METRICS.snapshot()
+    if path:
+        with open(path, "w") as f:
+            json.dump(snapshot, f, indent=2)
+    return snapshot
+
+
+class StageCallbackHandler(BaseCallbackHandler):
+    """
+    Times LangChain runs whose run_name is one of `stages`, attributes nested LLM calls to the
+    enclosing stage for token accounting, and records the answer's time to first token.
+    """
+
+    run_inline = True  # cheap bookkeeping; keeps the request's context in async runs
+
+    def __init__(self, stages: Iterable[str]):
+        self.stages: Set[str] = set(stages)
+        self._stage_of: Dict[Any, str] = {}
+        self._starts: Dict[Any, float] = {}
+        self._first_token: Set[Any] = set()
+        self._lock = threading.Lock()
+
+    def _start(self, run_id, parent_run_id, name: Optional[str]) -> None:
+        with self._lock:
+            if name in self.stages:
+                self._stage_of[run_id] = name
+                self._starts[run_id] = time.perf_counter()
+            elif parent_run_id in self._stage_of:
+                self._stage_of[run_id] = self._stage_of[parent_run_id]
+
+    def _end(self, run_id) -> Optional[str]:
+        with self._lock:
+            stage = self._stage_of.pop(run_id, None)
+            start = self._starts.pop(run_id, None)
+            self._first_token.discard(run_id)
+        if start is not None:
+            record_stage(stage, (time.perf_counter() - start) * 1000)
+        return stage
+
+    def on_chain_start(self, serialized, inputs, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, kwargs.get("name"))
+
+    def on_chain_end(self, outputs, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chain_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_retriever_start(self, serialized, query, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, kwargs.get("name"))
+
+    def on_retriever_end(self, documents, *, run_id, **kwargs):
+        record_size("retrieved_docs", len(documents))
+        self._end(run_id)
+
+    def on_retriever_error(self, error, *, run_id, **kwargs):
+        self._end(run_id)
+
+    def on_chat_model_start(self, serialized, messages, *, run_id, parent_run_id=None, **kwargs):
+        self._start(run_id, parent_run_id, kwargs.get("name"))
+        with self._lock:
+            if self._stage_of.get(run_id):
+                self._starts.setdefault(("llm", run_id), time.perf_counter())
+
+    def on_llm_start(self, serialized, prompts, *, run_id, parent_run_id=None, **kwargs):
+        self.on_chat_model_start(serialized, prompts, run_id=run_id, parent_run_id=parent_run_id, **kwargs)
+
+    def on_llm_new_token(self, token, *, run_id, **kwargs):
+        with self._lock:
+            if run_id in self._first_token:
+                return
+            self._first_token.add(run_id)
+            stage = self._stage_of.get(run_id)
+            start = self._starts.get(("llm", run_id))
+        if stage is not None and start is not None:
+            record_stage(f"{stage}_first_token", (time.perf_counter() - start) * 1000)
+
+    def on_llm_end(self, response, *, run_id, **kwargs):
+        with self._lock:
+            stage = self._stage_of.get(run_id)
+            self._starts.pop(("llm", run_id), None)
+        input_tokens = output_tokens = 0
+        for generations in response.generations:
+            for generation in generations:
+                usage = getattr(getattr(generation, "message", None), "usage_metadata", None) or {}
+                input_tokens += usage.get("input_tokens", 0)
+                output_tokens += usage.get("output_tokens", 0)
+        if not (input_tokens or output_tokens):
+            usage = (response.llm_output or {}).get("token_usage") or {}
+            input_tokens = usage.get("prompt_tokens", 0)
+            output_tokens = usage.get("completion_tokens", 0)
+        if stage is not None:
+            record_tokens(stage, input_tokens, output_tokens)
+        self._end(run_id)
+
+    def on_llm_error(self, error, *, run_id, **kwargs):
+        with self._lock:
+            self._starts.pop(("llm", run_id), None)
+        self._end(run_id)
@@ -1,19 +1,33 @@
 import os
+import threading
 from dotenv import load_dotenv
 from exception.custom_exception import ProjectCustomException
 from logger import GLOBAL_LOGGER as logger
-from utils.config_loader import load_config
+from utils.config_loader import get_settings
 from utils.APIKey_loader import APIKeyManager
+from utils.embedding_cache import CachedEmbeddings
+from utils.embedding_truncation import TruncatedEmbeddings
 
-from langchain_google_genai import GoogleGenerativeAIEmbeddings, ChatGoogleGenerativeAI
-from langchain_openai import OpenAIEmbeddings, ChatOpenAI
-from langchain_groq import ChatGroq
+# Provider SDKs (langchain_openai / langchain_google_genai / langchain_groq) are imported
+# only when that provider is selected, since each one is slow to import.
 
 class ModelLoader:
     """
     Loads embedding models and LLMs based on config and environment.
+    Use ModelLoader.get_instance() to share one loader (and its models) per process.
     """
 
+    _instance = None
+    _instance_lock = threading.Lock()
+
+    @classmethod
+    def get_instance(cls) -> "ModelLoader":
+        if cls._instance is None:
+            with cls._instance_lock:
+                if cls._instance is None:
+                    cls._instance = cls()
+        return cls._instance
+
     def __init__(self):
         REQUIRED_KEYS = ['GOOGLE_API_KEY', 'OPENAI_API_KEY', 'GROQ_API_KEY']
         api_key_mgr = APIKeyManager(REQUIRED_KEYS)
@@ -21,57 +35,112 @@ class ModelLoader:
         self.google_api_key = api_key_mgr.get("GOOGLE_API_KEY")
         self.groq_api_key = api_key_mgr.get("GROQ_API_KEY")
 
-        self.config = load_config()
-        logger.info("config file loaded", config_keys=list(self.config.keys()))
-    
+        self.settings = get_settings()
+        logger.info("config file loaded", llm_provider=self.settings.providers.llm,
+                    embedding_provider=self.settings.providers.embedding)
+
+        self._lock = threading.Lock()
+        self._embeddings = None
+        self._llm = None
+
     def load_embeddings(self):
         """
-        Load and return embedding model from Google Generative AI.
+        Return the configured embedding model, created on first use and reused afterwards.
+        """
+        if self._embeddings is None:
+            with self._lock:
+                if self._embeddings is None:
+                    self._embeddings = self._create_embeddings()
+        return self._embeddings
+
+    def load_llm(self):
+        """
+        Return the configured LLM, created on first use and reused afterwards.
         """
+        if self._llm is None:
+            with self._lock:
+                if self._llm is None:
+                    self._llm = self._create_llm()
+        return self._llm
 
-        provider = self.config.get("providers").get("embedding")
-        embedding_block = self.config["embedding_model"]
+    def _create_embeddings(self):
+        """
+        Build the embedding model for the configured provider.
+        """
+
+        provider = self.settings.providers.embedding
+        embedding_block = self.settings.embedding_model
        
         if provider not in embedding_block:
             logger.error("Embedding provider not found in config", provider=provider)
             raise ValueError(f"Embedding provider '{provider}' not found in config")
         
         embedding_config = embedding_block[provider]
-        model_name = embedding_config.get("model_name")
-        logger.info("Loading embedding model", provider=provider, model=model_name)
+        model_name = embedding_config.model_name
+        dimensions = embedding_config.dimensions
+        logger.info("Loading embedding model", provider=provider, model=model_name, dimensions=dimensions)
+
+        # Reduced size requested from the provider when it supports it (smaller responses too)
+        native = {}
+        if dimensions and embedding_config.native_dimensions:
+            native = {"output_dimensionality" if provider == "google" else "dimensions": dimensions}
 
         if provider == "google":
-            return GoogleGenerativeAIEmbeddings(
+            from langchain_google_genai import GoogleGenerativeAIEmbeddings
+            embeddings = GoogleGenerativeAIEmbeddings(
                 model=model_name,
-                google_api_key=self.google_api_key
+                google_api_key=self.google_api_key,
+                **native
             )
         elif provider == "openai":
-            return OpenAIEmbeddings(
+            from langchain_openai import OpenAIEmbeddings
+            embeddings = OpenAIEmbeddings(
                 model=model_name,
-                openai_api_key=self.openai_api_key
+                openai_api_key=self.openai_api_key,
+                **native
             )
         else:
             logger.error("Unsupported embedding provider", provider=provider)
             raise ValueError(f"Unsupported embedding provider: {provider}")
 
-    def load_llm(self):
+        if dimensions:
+            # Client-side truncation otherwise; either way vectors come back unit length
+            embeddings = TruncatedEmbeddings(embeddings, dimensions)
+            model_name = f"{model_name}@{dimensions}"  # keeps cached vectors of other sizes apart
+
+        cache_config = self.settings.embedding_cache
+        if cache_config.enabled:
+            logger.info("Wrapping embeddings with cache", path=cache_config.path)
+            return CachedEmbeddings(
+                embeddings,
+                provider=provider,
+                model_name=model_name,
+                path=cache_config.path,
+                memory_max_entries=cache_config.memory_max_entries,
+                disk_max_entries=cache_config.disk_max_entries,
+                vector_dtype=cache_config.vector_dtype,
+            )
+        return embeddings
+
+    def _create_llm(self):
         """
-        Load and return the configured LLM model.
+        Build the LLM for the configured provider.
         """
-        provider = self.config.get("providers").get("llm")
-        llm_block = self.config["llm"]
+        provider = self.settings.providers.llm
+        llm_block = self.settings.llm
 
         if provider not in llm_block:
             logger.error("LLM provider not found in config", provider=provider)
             raise ValueError(f"LLM provider '{provider}' not found in config")
 
         llm_config = llm_block[provider]
-        model_name = llm_config.get("model_name")
-        temperature = llm_config.get("temperature", 0.2)
-        max_tokens = llm_config.get("max_output_tokens", 2048)
+        model_name = llm_config.model_name
+        temperature = llm_config.temperature
+        max_tokens = llm_config.max_output_tokens
 
         logger.info("Loading LLM", provider=provider, model=model_name)
         if provider == "google":
+            from langchain_google_genai import ChatGoogleGenerativeAI
             return ChatGoogleGenerativeAI(
                 model=model_name,
                 google_api_key=self.google_api_key,
@@ -80,6 +149,7 @@ class ModelLoader:
             )
 
         elif provider == "groq":
+            from langchain_groq import ChatGroq
             return ChatGroq(
                 model=model_name,
                 api_key=self.groq_api_key,
@@ -87,6 +157,7 @@ class ModelLoader:
             )
 
         elif provider == "openai":
+            from langchain_openai import ChatOpenAI
             return ChatOpenAI(
                 model=model_name,
                 api_key=self.openai_api_key,
@@ -100,7 +171,7 @@ class ModelLoader:
 
 
 if __name__ == "__main__":
-    loader = ModelLoader()
+    loader = ModelLoader.get_instance()
 
     # Test Embedding
     embeddings = loader.load_embeddings()
@@ -1,43 +1,324 @@
 import os
+import time
+import asyncio
+import uuid
+import threading
+from typing import Optional
 from dotenv import load_dotenv
 from langchain_qdrant import QdrantVectorStore
-from qdrant_client import QdrantClient
-from qdrant_client.http.models import Distance, VectorParams
+from qdrant_client import QdrantClient, AsyncQdrantClient
+from qdrant_client.http.models import (
+    Distance, VectorParams, VectorParamsDiff, PointStruct, PointIdsList, HnswConfigDiff,
+    ScalarQuantization, ScalarQuantizationConfig, ScalarType, BinaryQuantization, BinaryQuantizationConfig,
+    Disabled, SearchParams, QuantizationSearchParams, PayloadSchemaType, Datatype,
+    Filter, FieldCondition, MatchValue, HasIdCondition, FilterSelector, KeywordIndexParams, KeywordIndexType,
+)
+from logger import GLOBAL_LOGGER as logger
+from utils.metrics import stage_timer
 from utils.APIKey_loader import APIKeyManager
+from utils.config_loader import get_settings, CollectionProfile
 from utils.model_loader import ModelLoader
 
 class QdrantVDB:
-    def __init__(self):
-        api_key_mgr = APIKeyManager(['QDRANT_API_KEY', 'QDRANT_URL'])
-        self.url = api_key_mgr.get("QDRANT_URL")
-        self.api_key = api_key_mgr.get("QDRANT_API_KEY")
-        if not self.api_key or not self.url:
+    """
+    Qdrant access with process-wide shared clients.
+
+    Credentials are resolved once per process, and one sync and one async client are kept per
+    (url, api_key), so every QdrantVDB instance reuses the same warmed gRPC channel. Vector-store
+    views are cached per (collection, embedding), so callers never reconnect per collection.
+    QDRANT_URL=":memory:" runs an in-process local Qdrant instead (benchmarks, offline runs).
+
+    New collections are created with the layout of a `qdrant.profiles` entry in config.yaml
+    (quantization, on-disk vectors, HNSW, payload indexes); migrate_collection() applies it to
+    existing ones, and search_params() carries its query-time settings to the retriever.
+
+    With qdrant.tenancy "shared", every user lives in one collection: points carry the user name in
+    an indexed tenant payload field, and collection_for() / tenant_filter() / tenant_id() give
+    callers the collection, the mandatory search filter and the payload value for a user.
+    """
+
+    LOCAL_LOCATION = ":memory:"
+
+    _lock = threading.RLock()
+    _credentials = None
+    _clients = {}
+    _async_clients = {}
+    _stores = {}
+    _collection_locks = {}
+
+    def __init__(self, profile: Optional[str] = None):
+        with QdrantVDB._lock:
+            if QdrantVDB._credentials is None:
+                api_key_mgr = APIKeyManager(['QDRANT_API_KEY', 'QDRANT_URL'])
+                QdrantVDB._credentials = (api_key_mgr.get("QDRANT_URL"), api_key_mgr.get("QDRANT_API_KEY"))
+        self.url, self.api_key = QdrantVDB._credentials
+        self.is_local = self.url == QdrantVDB.LOCAL_LOCATION
+        if not self.url or not (self.api_key or self.is_local):
             raise ValueError("Qdrant API key and URL must be provided in the env file.")
+        qdrant_config = get_settings().qdrant
+        self.profile_name = profile or qdrant_config.profile
+        self.layout: CollectionProfile = qdrant_config.collection_profile(profile)
+        if qdrant_config.tenancy not in ("per_user", "shared"):
+            raise ValueError(f"Unknown qdrant.tenancy '{qdrant_config.tenancy}' (expected per_user or shared)")
+        self.shared = qdrant_config.tenancy == "shared"
+        self.shared_collection = qdrant_config.shared_collection
+        self.tenant_field = qdrant_config.tenant_field
 
-    def create_vector_store(self, embedding, collection_name, documents):
-        vector_store = QdrantVectorStore.from_documents(
-                documents=documents,
-                embedding=embedding,
-                url=self.url,
-                prefer_grpc=True,
-                api_key=self.api_key,
-                collection_name=collection_name,
+    def collection_for(self, user_name: str) -> str:
+        """Collection holding user_name's points."""
+        return self.shared_collection if self.shared else user_name
+
+    def tenant_id(self, user_name: str) -> Optional[str]:
+        """Tenant payload value for user_name's points (None when each user has a collection)."""
+        return user_name if self.shared else None
+
+    def tenant_filter(self, user_name: str) -> Optional[Filter]:
+        """Filter every search of user_name must carry in shared mode; None otherwise."""
+        return self.tenant_condition(user_name) if self.shared else None
+
+    def tenant_condition(self, tenant_id: str) -> Filter:
+        """Filter matching the points of tenant_id in the shared collection, whatever the tenancy mode."""
+        return Filter(must=[FieldCondition(key=self.tenant_field, match=MatchValue(value=tenant_id))])
+
+    def _client_kwargs(self) -> dict:
+        if self.is_local:
+            return {"location": self.url}
+        return {"url": self.url, "api_key": self.api_key, "prefer_grpc": True}
+
+    def get_client(self) -> QdrantClient:
+        key = (self.url, self.api_key)
+        client = QdrantVDB._clients.get(key)
+        if client is None:
+            with QdrantVDB._lock:
+                client = QdrantVDB._clients.get(key)
+                if client is None:
+                    client = QdrantClient(**self._client_kwargs())
+                    client.get_collections()  # warm up the channel before first real use
+                    QdrantVDB._clients[key] = client
+                    logger.info("Qdrant client created", url=self.url)
+        return client
+
+    def get_async_client(self) -> AsyncQdrantClient:
+        key = (self.url, self.api_key)
+        client = QdrantVDB._async_clients.get(key)
+        if client is None:
+            with QdrantVDB._lock:
+                client = QdrantVDB._async_clients.get(key)
+                if client is None:
+                    client = AsyncQdrantClient(**self._client_kwargs())
+                    QdrantVDB._async_clients[key] = client
+                    logger.info("Async Qdrant client created", url=self.url)
+        return client
+
+    def health_check(self) -> dict:
+        """Round-trip to Qdrant on the shared client; never raises."""
+        start = time.perf_counter()
+        try:
+            collections = self.get_client().get_collections().collections
+            return {"status": "ok", "collections": len(collections),
+                    "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+        except Exception as e:
+            logger.error("Qdrant health check failed", error=str(e))
+            return {"status": "error", "error": str(e)}
+
+    async def ahealth_check(self) -> dict:
+        if self.is_local:
+            # An in-process async client is a separate, empty instance: ask the shared sync one
+            return await asyncio.to_thread(self.health_check)
+        start = time.perf_counter()
+        try:
+            collections = (await self.get_async_client().get_collections()).collections
+            return {"status": "ok", "collections": len(collections),
+                    "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+        except Exception as e:
+            logger.error("Qdrant health check failed", error=str(e))
+            return {"status": "error", "error": str(e)}
+
+    @classmethod
+    def close_clients(cls) -> None:
+        """Close all shared clients (process shutdown)."""
+        with cls._lock:
+            for client in cls._clients.values():
+                client.close()
+            cls._clients.clear()
+            cls._async_clients.clear()
+            cls._stores.clear()
+
+    @classmethod
+    async def aclose_clients(cls) -> None:
+        """Close the shared async clients, then the sync ones (process shutdown from an event loop)."""
+        with cls._lock:
+            async_clients = list(cls._async_clients.values())
+            cls._async_clients.clear()
+        for client in async_clients:
+            await client.close()
+        cls.close_clients()
+
+    def _hnsw_config(self, collection_name=None) -> HnswConfigDiff:
+        if collection_name == self.shared_collection:
+            # Searches are always tenant-filtered: build per-tenant graphs instead of one global graph
+            return HnswConfigDiff(m=0, payload_m=self.layout.hnsw_m, ef_construct=self.layout.hnsw_ef_construct,
+                                  on_disk=self.layout.hnsw_on_disk)
+        return HnswConfigDiff(m=self.layout.hnsw_m, ef_construct=self.layout.hnsw_ef_construct,
+                              on_disk=self.layout.hnsw_on_disk)
+
+    def _quantization_config(self):
+        layout = self.layout
+        if layout.quantization == "scalar":
+            return ScalarQuantization(scalar=ScalarQuantizationConfig(
+                type=ScalarType.INT8, quantile=layout.quantile, always_ram=layout.always_ram))
+        if layout.quantization == "binary":
+            return BinaryQuantization(binary=BinaryQuantizationConfig(always_ram=layout.always_ram))
+        if layout.quantization:
+            raise ValueError(f"Unknown quantization '{layout.quantization}' (expected scalar or binary)")
+        return None
+
+    def search_params(self) -> Optional[SearchParams]:
+        """Query-time HNSW ef and quantization rescoring of the profile, for query_points(search_params=...)."""
+        layout = self.layout
+        if self.is_local:  # in-process Qdrant always searches exactly
+            return None
+        quantization = None
+        if layout.quantization:
+            quantization = QuantizationSearchParams(rescore=layout.rescore, oversampling=layout.oversampling)
+        if layout.search_ef is None and quantization is None:
+            return None
+        return SearchParams(hnsw_ef=layout.search_ef, quantization=quantization)
+
+    def ensure_payload_indexes(self, collection_name) -> None:
+        if self.is_local:  # payload indexes are a server feature
+            return
+        client = self.get_client()
+        existing = client.get_collection(collection_name).payload_schema or {}
+        for field_name, schema in self.layout.payload_indexes.items():
+            if field_name not in existing:
+                client.create_payload_index(collection_name, field_name=field_name,
+                                            field_schema=PayloadSchemaType(schema), wait=True)
+        if collection_name == self.shared_collection and self.tenant_field not in existing:
+            # is_tenant co-locates each tenant's points in storage for faster filtered search
+            client.create_payload_index(collection_name, field_name=self.tenant_field, wait=True,
+                                        field_schema=KeywordIndexParams(type=KeywordIndexType.KEYWORD, is_tenant=True))
+
+    def ensure_collection(self, collection_name, vector_size):
+        """
+        Create the collection (cosine, unnamed dense vector as langchain_qdrant expects) with the
+        profile's storage, HNSW, quantization and payload indexes if it is missing. Safe to call
+        concurrently: creation is serialized per collection in this process, and losing the race to
+        another process ("already exists") counts as success.
+        """
+        client = self.get_client()
+        with self._collection_lock(collection_name):
+            if not client.collection_exists(collection_name):
+                try:
+                    client.create_collection(
+                        collection_name=collection_name,
+                        vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE,
+                                                    on_disk=self.layout.on_disk,
+                                                    datatype=Datatype(self.layout.datatype)),
+                        hnsw_config=self._hnsw_config(collection_name),
+                        quantization_config=self._quantization_config(),
+                    )
+                except Exception:
+                    if not client.collection_exists(collection_name):
+                        raise
+                else:
+                    self.ensure_payload_indexes(collection_name)
+                    logger.info("Qdrant collection created", collection=collection_name,
+                                profile=self.profile_name, vector_size=vector_size)
+                    return
+
+            existing = client.get_collection(collection_name).config.params.vectors
+            existing_size = getattr(existing, "size", None)
+            if existing_size is not None and existing_size != vector_size:
+                # e.g. embedding_model.dimensions changed: old and new vectors cannot share a collection
+                raise ValueError(
+                    f"Collection '{collection_name}' holds {existing_size}-dim vectors, got {vector_size}; "
+                    "re-ingest into a new collection to change embedding dimensions"
+                )
+
+    @classmethod
+    def _collection_lock(cls, collection_name) -> threading.Lock:
+        with cls._lock:
+            return cls._collection_locks.setdefault(collection_name, threading.Lock())
+
+    def migrate_collection(self, collection_name) -> dict:
+        """
+        Bring an existing collection to the profile's layout in place. Qdrant rebuilds the HNSW graph
+        and quantized vectors in the background; search keeps working on the old segments meanwhile.
+        The vector datatype and size are fixed at creation, so those only apply to new collections.
+        """
+        client = self.get_client()
+        client.update_collection(
+            collection_name=collection_name,
+            vectors_config={"": VectorParamsDiff(on_disk=self.layout.on_disk)},
+            hnsw_config=self._hnsw_config(collection_name),
+            quantization_config=self._quantization_config() or Disabled.DISABLED,
+        )
+        self.ensure_payload_indexes(collection_name)
+        info = client.get_collection(collection_name)
+        logger.info("Qdrant collection migrated", collection=collection_name, profile=self.profile_name,
+                    status=str(info.status), points=info.points_count)
+        return {"collection": collection_name, "profile": self.profile_name,
+                "status": str(info.status), "points": info.points_count}
+
+    def upsert_embedded(self, collection_name, ids, vectors, documents, tenant_id: Optional[str] = None):
+        """Upsert pre-embedded documents using the langchain_qdrant payload layout (plus the tenant field)."""
+        tenant = {self.tenant_field: tenant_id} if tenant_id is not None else {}
+        points = [
+            PointStruct(
+                id=point_id,
+                vector=vector,
+                payload={
+                    QdrantVectorStore.CONTENT_KEY: doc.page_content,
+                    QdrantVectorStore.METADATA_KEY: doc.metadata,
+                    **tenant,
+                },
             )
-        return vector_store
+            for point_id, vector, doc in zip(ids, vectors, documents)
+        ]
+        self.get_client().upsert(collection_name=collection_name, points=points, wait=True)
+
+    def create_vector_store(self, embedding, collection_name, documents, ids=None, batch_size=64,
+                            tenant_id: Optional[str] = None):
+        ids = list(ids) if ids is not None else [str(uuid.uuid4()) for _ in documents]
+        for start in range(0, len(documents), batch_size):
+            batch = documents[start:start + batch_size]
+            with stage_timer("embed"):
+                vectors = embedding.embed_documents([d.page_content for d in batch])
+            if start == 0:
+                self.ensure_collection(collection_name, len(vectors[0]))
+            with stage_timer("upsert"):
+                self.upsert_embedded(collection_name, ids[start:start + batch_size], vectors, batch, tenant_id)
+        return self.get_vector_store(embedding, collection_name)
     
     def get_vector_store(self, embedding, collection_name):
-        vector_store = QdrantVectorStore.from_existing_collection(
-                embedding=embedding,
-                url=self.url,
-                prefer_grpc=True,
-                api_key=self.api_key,
+        key = (self.url, collection_name, id(embedding))
+        cached = QdrantVDB._stores.get(key)
+        if cached is not None and cached[0] is embedding:
+            return cached[1]
+        vector_store = QdrantVectorStore(
+                client=self.get_client(),
                 collection_name=collection_name,
+                embedding=embedding,
             )
+        with QdrantVDB._lock:
+            QdrantVDB._stores[key] = (embedding, vector_store)
         return vector_store
 
+    def delete_points(self, embedding, collection_name, ids, tenant_id: Optional[str] = None):
+        """Delete points by ID (e.g. stale chunks of a re-ingested file), only within tenant_id if given."""
+        if not ids:
+            return
+        if tenant_id is None:
+            selector = PointIdsList(points=list(ids))
+        else:
+            selector = FilterSelector(filter=Filter(must=[HasIdCondition(has_id=list(ids)),
+                                                          self.tenant_condition(tenant_id)]))
+        self.get_client().delete(collection_name=collection_name, points_selector=selector, wait=True)
+
 
 if __name__ == "__main__":
-    loader = ModelLoader()
+    loader = ModelLoader.get_instance()
     embeddings = loader.load_embeddings()
     print(f"Embedding Model Loaded: {embeddings}")
     from langchain_core.documents import Document
@@ -55,4 +336,5 @@ if __name__ == "__main__":
 
     qdrant_vdb.get_vector_store(embedding=embeddings,
         collection_name="test_collection")
-    print("Vector store retrieved successfully.")
\ No newline at end of file
+    print("Vector store retrieved successfully.")
+    print("Health:", qdrant_vdb.health_check())
\ No newline at end of file
@@ -0,0 +1,121 @@
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Any, List, Optional, Protocol, Sequence
+
+from langchain_core.callbacks import CallbackManagerForRetrieverRun, AsyncCallbackManagerForRetrieverRun
+from langchain_core.documents import Document
+from langchain_core.retrievers import BaseRetriever
+from langchain_core.runnables.config import run_in_executor
+from logger import GLOBAL_LOGGER as logger
+from utils.metrics import record_cache, stage_timer
+
+
+class Scorer(Protocol):
+    """Anything that scores (query, passage) pairs; higher means more relevant."""
+
+    def score(self, query: str, passages: Sequence[str]) -> List[float]:
+        ...
+
+
+class CrossEncoderScorer:
+    """Small local cross-encoder (sentence-transformers) scored on CPU in fixed-size batches."""
+
+    def __init__(self, model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2", batch_size: int = 32,
+                 max_length: int = 512):
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError as e:
+            raise ImportError("Reranking needs sentence-transformers: pip install sentence-transformers") from e
+        self.batch_size = batch_size
+        self.model = CrossEncoder(model_name, device="cpu", max_length=max_length)
+        logger.info("Cross-encoder loaded", model=model_name)
+
+    def score(self, query: str, passages: Sequence[str]) -> List[float]:
+        pairs = [(query, p) for p in passages]
+        return [float(s) for s in self.model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)]
+
+
+_scorers = {}
+_scorers_lock = threading.Lock()
+
+
+def get_cross_encoder(model_name: str, batch_size: int = 32) -> CrossEncoderScorer:
+    """One cross-encoder per model per process; loading it is far more expensive than scoring."""
+    with _scorers_lock:
+        scorer = _scorers.get(model_name)
+        if scorer is None:
+            scorer = CrossEncoderScorer(model_name, batch_size=batch_size)
+            _scorers[model_name] = scorer
+        return scorer
+
+
+class Reranker:
+    """
+    Re-scores retrieved chunks against the query and keeps the top_n.
+    Scores are cached per (query hash, chunk hash), so repeated queries only score new chunks.
+    """
+
+    def __init__(self, scorer: Scorer, top_n: int = 4, cache_size: int = 50000):
+        self.scorer = scorer
+        self.top_n = top_n
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def rerank(self, query: str, docs: List[Document]) -> List[Document]:
+        if len(docs) <= 1:
+            return docs
+        query_hash = self._hash(query)
+        keys = [(query_hash, self._hash(d.page_content)) for d in docs]
+
+        scores: List[Optional[float]] = []
+        with self._lock:
+            for key in keys:
+                score = self._cache.get(key)
+                if score is not None:
+                    self._cache.move_to_end(key)
+                scores.append(score)
+
+        missing = [i for i, s in enumerate(scores) if s is None]
+        if missing:
+            with stage_timer("rerank"):
+                fresh = self.scorer.score(query, [docs[i].page_content for i in missing])
+            with self._lock:
+                for i, score in zip(missing, fresh):
+                    scores[i] = score
+                    self._cache[keys[i]] = score
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+
+        record_cache("rerank", hits=len(docs) - len(missing), misses=len(missing))
+        ranked = sorted(zip(scores, range(len(docs))), key=lambda pair: pair[0], reverse=True)[:self.top_n]
+        logger.debug("Reranked chunks", candidates=len(docs), scored=len(missing), kept=len(ranked))
+        result = []
+        for score, i in ranked:
+            docs[i].metadata["_rerank_score"] = score
+            result.append(docs[i])
+        return result
+
+
+class RerankingRetriever(BaseRetriever):
+    """Wraps a retriever so its candidates pass through a Reranker before reaching the prompt."""
+
+    base_retriever: BaseRetriever
+    reranker: Any
+
+    def _get_relevant_documents(self, query: str, *, run_manager: CallbackManagerForRetrieverRun,
+                                **kwargs: Any) -> List[Document]:
+        # kwargs (e.g. a precomputed query_vector) are passed through to the base retriever
+        docs = self.base_retriever.invoke(query, config={"callbacks": run_manager.get_child()}, **kwargs)
+        return self.reranker.rerank(query, docs)
+
+    async def _aget_relevant_documents(self, query: str, *, run_manager: AsyncCallbackManagerForRetrieverRun,
+                                       **kwargs: Any) -> List[Document]:
+        docs = await self.base_retriever.ainvoke(query, config={"callbacks": run_manager.get_child()}, **kwargs)
+        # Cross-encoder scoring is CPU-bound: keep it off the event loop
+        return await run_in_executor(None, self.reranker.rerank, query, docs)
@@ -1,11 +1,33 @@
+import io
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from typing import Dict, Iterator, List, Optional, Tuple
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
 from botocore.exceptions import NoCredentialsError, PartialCredentialsError
 from exception.custom_exception import ProjectCustomException
-import logger
+from logger import GLOBAL_LOGGER as logger
 from utils.APIKey_loader import APIKeyManager
+from utils.config_loader import get_settings
+
+MB = 1024 * 1024
+
 
 class S3ReadUpload:
+    """
+    S3 transfers through one cached, pooled boto3 client per process.
+
+    Single-file calls keep their original signatures. Batch uploads/downloads and submit_upload
+    run on a shared thread pool, so callers can overlap S3 latency with other work, and large
+    files go through multipart transfers tuned by the AWS-S3 block in config.yaml.
+    """
+
+    _lock = threading.Lock()
+    _clients = {}
+    _executor = None
+
     def __init__(self):
         api_key_mgr = APIKeyManager(['AWS_ACCESS_KEY_ID', 'AWS_SECRET_ACCESS_KEY', 'AWS_REGION'])
         self.aws_access_key_id = api_key_mgr.get('AWS_ACCESS_KEY_ID')
@@ -14,6 +36,50 @@ class S3ReadUpload:
         if not self.aws_access_key_id or not self.aws_secret_access_key or not self.region_name:
             raise ValueError("AWS credentials and region must be provided in the env file.")
 
+        s3_config = get_settings().s3
+        self.endpoint_url = s3_config.endpoint_url or None  # e.g. MinIO / moto server
+        self.max_pool_connections = s3_config.max_pool_connections
+        self.transfer_workers = s3_config.transfer_workers
+        self.transfer_config = TransferConfig(
+            multipart_threshold=s3_config.multipart_threshold_mb * MB,
+            multipart_chunksize=s3_config.multipart_chunksize_mb * MB,
+            max_concurrency=s3_config.multipart_concurrency,
+            use_threads=True,
+        )
+
+    @property
+    def client(self):
+        """Process-wide boto3 client (boto3 clients are thread-safe once created)."""
+        key = (self.aws_access_key_id, self.region_name, self.endpoint_url)
+        s3_client = S3ReadUpload._clients.get(key)
+        if s3_client is None:
+            with S3ReadUpload._lock:
+                s3_client = S3ReadUpload._clients.get(key)
+                if s3_client is None:
+                    s3_client = boto3.client(
+                        's3',
+                        aws_access_key_id=self.aws_access_key_id,
+                        aws_secret_access_key=self.aws_secret_access_key,
+                        region_name=self.region_name,
+                        endpoint_url=self.endpoint_url,
+                        config=Config(
+                            max_pool_connections=self.max_pool_connections,
+                            retries={"max_attempts": 5, "mode": "adaptive"},
+                        ),
+                    )
+                    S3ReadUpload._clients[key] = s3_client
+                    logger.info("S3 client created", region=self.region_name, endpoint_url=self.endpoint_url)
+        return s3_client
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if S3ReadUpload._executor is None:
+            with S3ReadUpload._lock:
+                if S3ReadUpload._executor is None:
+                    S3ReadUpload._executor = ThreadPoolExecutor(
+                        max_workers=self.transfer_workers, thread_name_prefix="s3-transfer"
+                    )
+        return S3ReadUpload._executor
+
     def upload_file_to_s3(self, file_name, bucket_name, object_name):
         """
         Upload a file to an S3 bucket.
@@ -21,26 +87,13 @@ class S3ReadUpload:
         :param file_name: File to upload
         :param bucket_name: S3 bucket name
         :param object_name: S3 object name. If not specified, file_name is used
-        :param aws_access_key: AWS access key ID (optional)
-        :param aws_secret_key: AWS secret access key (optional)
-        :param region_name: AWS region name (optional)
         :return: True if file was uploaded, else False
         """
 
         try:
-            if self.aws_access_key_id and self.aws_secret_access_key:
-                s3_client = boto3.client(
-                    's3',
-                    aws_access_key_id=self.aws_access_key_id,
-                    aws_secret_access_key=self.aws_secret_access_key,
-                    region_name=self.region_name
-                )
-            else:
-                s3_client = boto3.client('s3')
-
-            # Upload the file
-            s3_client.upload_file(file_name, bucket_name, object_name)
-            print(f"File {file_name} uploaded to {bucket_name}/{object_name}")
+            # Multipart (with parallel parts) kicks in above multipart_threshold
+            self.client.upload_file(file_name, bucket_name, object_name, Config=self.transfer_config)
+            logger.info(f"File {file_name} uploaded to {bucket_name}/{object_name}")
             return True
         except Exception as e:
             raise ProjectCustomException(f"Failed to upload {file_name} to S3", sys)
@@ -52,39 +105,107 @@ class S3ReadUpload:
 
         :param bucket_name: S3 bucket name
         :param object_name: S3 object name
-        :param aws_access_key: AWS access key ID (optional)
-        :param aws_secret_key: AWS secret access key (optional)
-        :param region_name: AWS region name (optional)
         :return: File content as bytes, or None if error occurs
         """
         try:
-            if self.aws_access_key_id and self.aws_secret_access_key:
-                s3_client = boto3.client(
-                    's3',
-                    aws_access_key_id=self.aws_access_key_id,
-                    aws_secret_access_key=self.aws_secret_access_key,
-                    region_name=self.region_name
-                )
-            else:
-                s3_client = boto3.client('s3')
-
-            response = s3_client.get_object(Bucket=bucket_name, Key=object_name)
-            file_content = response['Body'].read()
-            return file_content
+            # Ranged multipart GETs (multipart_concurrency in flight) above multipart_threshold
+            buffer = io.BytesIO()
+            self.client.download_fileobj(bucket_name, object_name, buffer, Config=self.transfer_config)
+            return buffer.getvalue()
         except Exception as e:
             raise ProjectCustomException(f"Failed to read {object_name} from S3", sys)
-    
+
+    def submit_upload(self, file_name, bucket_name, object_name) -> Future:
+        """Start an upload in the background and return its Future (resolves to True or raises)."""
+        return self._get_executor().submit(self.upload_file_to_s3, file_name, bucket_name, object_name)
+
+    def upload_files_batch(self, items: List[Tuple[str, str]], bucket_name) -> Dict[str, Optional[str]]:
+        """
+        Upload many files concurrently.
+
+        :param items: (file_name, object_name) pairs
+        :param bucket_name: S3 bucket name
+        :return: object_name -> None on success, or the error message
+        """
+        futures = {object_name: self.submit_upload(file_name, bucket_name, object_name)
+                   for file_name, object_name in items}
+        results = {}
+        for object_name, future in futures.items():
+            try:
+                future.result()
+                results[object_name] = None
+            except Exception as e:
+                logger.error("Batch upload failed", object_name=object_name, error=str(e))
+                results[object_name] = str(e)
+        return results
+
+    def download_files_batch(self, object_names: List[str], bucket_name) -> Dict[str, Optional[bytes]]:
+        """
+        Read many objects concurrently.
+
+        :param object_names: S3 object names
+        :param bucket_name: S3 bucket name
+        :return: object_name -> content bytes, or None if that object could not be read
+        """
+        executor = self._get_executor()
+        futures = {name: executor.submit(self.read_file_from_s3, bucket_name, name) for name in object_names}
+        results = {}
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                logger.error("Batch download failed", object_name=name, error=str(e))
+                results[name] = None
+        return results
+
+    def list_objects(self, bucket_name, prefix: str) -> Iterator[Dict]:
+        """
+        Yield {"key", "etag", "size", "last_modified"} for every object under prefix, page by page.
+
+        :param bucket_name: S3 bucket name
+        :param prefix: key prefix, e.g. "pre-index/<user>/"
+        """
+        try:
+            paginator = self.client.get_paginator("list_objects_v2")
+            for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix):
+                for obj in page.get("Contents", []):
+                    yield {"key": obj["Key"], "etag": obj["ETag"].strip('"'), "size": obj["Size"],
+                           "last_modified": obj["LastModified"].isoformat()}
+        except Exception as e:
+            raise ProjectCustomException(f"Failed to list {bucket_name}/{prefix}", sys)
+
+    def list_prefixes(self, bucket_name, prefix: str) -> List[str]:
+        """Immediate "sub-folders" of prefix (e.g. the user folders under "pre-index/")."""
+        try:
+            paginator = self.client.get_paginator("list_objects_v2")
+            return [p["Prefix"] for page in paginator.paginate(Bucket=bucket_name, Prefix=prefix, Delimiter="/")
+                    for p in page.get("CommonPrefixes", [])]
+        except Exception as e:
+            raise ProjectCustomException(f"Failed to list prefixes of {bucket_name}/{prefix}", sys)
+
+    def move_object(self, bucket_name, source_key, dest_key):
+        """
+        Move an object within the bucket: server-side (multipart for large objects) copy, then delete.
+        The copy is complete before the source is removed, so a crash in between leaves both copies.
+        """
+        try:
+            self.client.copy({"Bucket": bucket_name, "Key": source_key}, bucket_name, dest_key,
+                             Config=self.transfer_config)
+            self.client.delete_object(Bucket=bucket_name, Key=source_key)
+            logger.info("S3 object moved", source=source_key, destination=dest_key)
+            return True
+        except Exception as e:
+            raise ProjectCustomException(f"Failed to move {source_key} to {dest_key}", sys)
+
 
 if __name__ == "__main__":
     # Load Configuration:
-    from config_loader import load_config
-    config = load_config("config.yaml")
-    s3_config = config.get('AWS-S3', {})
-    bucket_name = s3_config.get('bucket_name')
-    object_prefix = s3_config.get('preindex_folder_name')
-    users = config.get('user_names', {})
+    settings = get_settings("config.yaml")
+    bucket_name = settings.s3.bucket_name
+    object_prefix = settings.s3.preindex_folder_name
+    users = settings.user_names
     usse = users.get('user1', 'default_user')
- 
+
     # Example usage
     file_name = "./data/Rudy-2025.pdf"
     object_name = f"{object_prefix}/{usse}/Rudy-2025.pdf"
@@ -93,4 +214,10 @@ if __name__ == "__main__":
     s3_ops.upload_file_to_s3(file_name, bucket_name, object_name)
 
     file_content = s3_ops.read_file_from_s3(bucket_name, object_name)
-    print(f"Read {len(file_content)} bytes from S3 object {object_name}")
\ No newline at end of file
+    print(f"Read {len(file_content)} bytes from S3 object {object_name}")
+
+    results = s3_ops.upload_files_batch(
+        [("./data/text.txt", f"{object_prefix}/{usse}/text.txt"), ("./data/SETUP.md", f"{object_prefix}/{usse}/SETUP.md")],
+        bucket_name,
+    )
+    print(f"Batch upload results: {results}")
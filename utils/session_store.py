@@ -0,0 +1,247 @@
+import os
+import json
+import asyncio
+import zlib
+import sqlite3
+import threading
+from collections import OrderedDict
+from contextlib import asynccontextmanager, contextmanager
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from langchain_core.messages import AIMessage, BaseMessage, HumanMessage, SystemMessage
+from langchain_core.output_parsers import StrOutputParser
+from logger import GLOBAL_LOGGER as logger
+from prompt.prompt_library import PROMPT_REGISTRY
+from prompt.prompt_metadata import PromptType
+
+HUMAN, AI = "h", "a"
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return max(1, len(text) // 4)
+
+
+@dataclass
+class SessionState:
+    summary: str = ""
+    turns: List[Tuple[str, str]] = field(default_factory=list)  # (HUMAN | AI, content)
+
+    def to_messages(self) -> List[BaseMessage]:
+        messages: List[BaseMessage] = []
+        if self.summary:
+            messages.append(SystemMessage(f"Summary of the earlier conversation: {self.summary}"))
+        for role, content in self.turns:
+            messages.append(HumanMessage(content) if role == HUMAN else AIMessage(content))
+        return messages
+
+
+class InMemorySessionStore:
+    """Process-local session store, LRU-bounded by number of sessions."""
+
+    def __init__(self, max_sessions: int = 10000):
+        self.max_sessions = max_sessions
+        self._sessions: "OrderedDict[Tuple[str, str], SessionState]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, user_name: str, session_id: str) -> SessionState:
+        with self._lock:
+            state = self._sessions.get((user_name, session_id))
+            if state is None:
+                return SessionState()
+            self._sessions.move_to_end((user_name, session_id))
+            return SessionState(summary=state.summary, turns=list(state.turns))
+
+    def save(self, user_name: str, session_id: str, state: SessionState) -> None:
+        with self._lock:
+            self._sessions[(user_name, session_id)] = state
+            self._sessions.move_to_end((user_name, session_id))
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+
+    def delete(self, user_name: str, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop((user_name, session_id), None)
+
+
+class SQLiteSessionStore:
+    """Durable session store; turns are kept as zlib-compressed compact JSON."""
+
+    def __init__(self, path: str = "sessions/sessions.db"):
+        parent = os.path.dirname(path)
+        if parent:
+            os.makedirs(parent, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            """
+            CREATE TABLE IF NOT EXISTS sessions (
+                user_name TEXT NOT NULL,
+                session_id TEXT NOT NULL,
+                summary TEXT NOT NULL,
+                turns BLOB NOT NULL,
+                updated_at TEXT NOT NULL,
+                PRIMARY KEY (user_name, session_id)
+            )
+            """
+        )
+        self._conn.commit()
+
+    def load(self, user_name: str, session_id: str) -> SessionState:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT summary, turns FROM sessions WHERE user_name = ? AND session_id = ?",
+                (user_name, session_id),
+            ).fetchone()
+        if row is None:
+            return SessionState()
+        turns = [tuple(t) for t in json.loads(zlib.decompress(row[1]))]
+        return SessionState(summary=row[0], turns=turns)
+
+    def save(self, user_name: str, session_id: str, state: SessionState) -> None:
+        blob = zlib.compress(json.dumps(state.turns, separators=(",", ":")).encode("utf-8"))
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sessions (user_name, session_id, summary, turns, updated_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (user_name, session_id, state.summary, blob, datetime.now(timezone.utc).isoformat()),
+            )
+            self._conn.commit()
+
+    def delete(self, user_name: str, session_id: str) -> None:
+        with self._lock:
+            self._conn.execute("DELETE FROM sessions WHERE user_name = ? AND session_id = ?", (user_name, session_id))
+            self._conn.commit()
+
+
+class SessionManager:
+    """
+    Chat history per (user, session) with a fixed token budget.
+
+    The most recent turns are kept verbatim while they fit in max_history_tokens; older turns
+    are rolled into a running summary by the LLM (or simply dropped when no LLM is given), so
+    prompt size stays constant however long the conversation runs. Once over budget, history is
+    trimmed down to trim_to of it, so the summarizer runs every few turns rather than on each one.
+    The latest question/answer pair is always kept verbatim.
+
+    Updates of one session are serialized (load, summarize, save), across threads and coroutines,
+    so concurrent requests on the same session_id cannot overwrite each other's turns or summary.
+    """
+
+    LOCK_STRIPES = 64
+
+    def __init__(self, store, llm=None, max_history_tokens: int = 1500, summary_max_tokens: int = 300,
+                 trim_to: float = 0.5):
+        self.store = store
+        self.max_history_tokens = max_history_tokens
+        self.summary_max_tokens = summary_max_tokens
+        self.trim_to = trim_to
+        # Sessions hash onto a fixed set of locks; an async update holds both locks of its stripe
+        self._locks = [threading.Lock() for _ in range(self.LOCK_STRIPES)]
+        self._alocks = [asyncio.Lock() for _ in range(self.LOCK_STRIPES)]
+        self.summarizer = None
+        if llm is not None:
+            self.summarizer = PROMPT_REGISTRY[PromptType.SUMMARIZE_HISTORY.value] | llm | StrOutputParser()
+
+    @classmethod
+    def from_config(cls, session_config, llm=None) -> "SessionManager":
+        """Build from the validated `session` settings block (utils.config_loader.SessionSettings)."""
+        if session_config.backend == "sqlite":
+            store = SQLiteSessionStore(session_config.sqlite_path)
+        else:
+            store = InMemorySessionStore(session_config.max_sessions)
+        return cls(
+            store,
+            llm=llm if session_config.summarize else None,
+            max_history_tokens=session_config.max_history_tokens,
+            summary_max_tokens=session_config.summary_max_tokens,
+            trim_to=session_config.trim_to,
+        )
+
+    def get_history(self, user_name: str, session_id: str) -> List[BaseMessage]:
+        return self.store.load(user_name, session_id).to_messages()
+
+    async def aget_history(self, user_name: str, session_id: str) -> List[BaseMessage]:
+        # Store I/O (SQLite) runs off the event loop
+        return await asyncio.to_thread(self.get_history, user_name, session_id)
+
+    def _split_overflow(self, state: SessionState) -> List[Tuple[str, str]]:
+        """
+        Once the turns exceed the budget, drop the oldest (whole question/answer pairs) until they fit
+        in trim_to of it; return what was dropped. The latest pair is never dropped, even if oversized.
+        """
+        budget = self.max_history_tokens - estimate_tokens(state.summary)
+        used = sum(estimate_tokens(content) for _, content in state.turns)
+        if used <= budget:
+            return []
+        target = budget * self.trim_to
+        keep_from = max(0, len(state.turns) - 2)
+        cut = 0
+        while used > target and cut < keep_from:
+            for _ in range(2):
+                if cut < keep_from:
+                    used -= estimate_tokens(state.turns[cut][1])
+                    cut += 1
+        overflow, state.turns = state.turns[:cut], state.turns[cut:]
+        return overflow
+
+    def _summary_inputs(self, state: SessionState, overflow: List[Tuple[str, str]]) -> dict:
+        turns = "\n".join(f"{'User' if role == HUMAN else 'Assistant'}: {content}" for role, content in overflow)
+        return {"summary": state.summary or "(none)", "turns": turns,
+                "max_words": int(self.summary_max_tokens * 0.75)}
+
+    def _stripe(self, user_name: str, session_id: str) -> int:
+        return zlib.crc32(f"{user_name}\0{session_id}".encode("utf-8")) % self.LOCK_STRIPES
+
+    @contextmanager
+    def _session_lock(self, user_name: str, session_id: str):
+        with self._locks[self._stripe(user_name, session_id)]:
+            yield
+
+    @asynccontextmanager
+    async def _asession_lock(self, user_name: str, session_id: str):
+        stripe = self._stripe(user_name, session_id)
+        lock = self._locks[stripe]
+        # The asyncio lock queues this loop's updates without blocking it; the thread lock, taken on a
+        # worker thread, also excludes sync callers (e.g. stream() iterated in a threadpool)
+        async with self._alocks[stripe]:
+            acquire = asyncio.ensure_future(asyncio.to_thread(lock.acquire))
+            try:
+                await asyncio.shield(acquire)
+            except asyncio.CancelledError:
+                acquire.add_done_callback(lambda _: lock.release())
+                raise
+            try:
+                yield
+            finally:
+                lock.release()
+
+    def append_turn(self, user_name: str, session_id: str, question: str, answer: str) -> None:
+        with self._session_lock(user_name, session_id):
+            state = self.store.load(user_name, session_id)
+            state.turns.extend([(HUMAN, question), (AI, answer)])
+            overflow = self._split_overflow(state)
+            if overflow and self.summarizer is not None:
+                try:
+                    state.summary = self.summarizer.invoke(self._summary_inputs(state, overflow))
+                except Exception as e:
+                    # Keep the old summary rather than failing the user's request
+                    logger.error("Failed to summarize chat history", session_id=session_id, error=str(e))
+            self.store.save(user_name, session_id, state)
+
+    async def aappend_turn(self, user_name: str, session_id: str, question: str, answer: str) -> None:
+        async with self._asession_lock(user_name, session_id):
+            state = await asyncio.to_thread(self.store.load, user_name, session_id)
+            state.turns.extend([(HUMAN, question), (AI, answer)])
+            overflow = self._split_overflow(state)
+            if overflow and self.summarizer is not None:
+                try:
+                    state.summary = await self.summarizer.ainvoke(self._summary_inputs(state, overflow))
+                except Exception as e:
+                    logger.error("Failed to summarize chat history", session_id=session_id, error=str(e))
+            await asyncio.to_thread(self.store.save, user_name, session_id, state)
+
+    def clear(self, user_name: str, session_id: str) -> None:
+        self.store.delete(user_name, session_id)